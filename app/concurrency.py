@@ -0,0 +1,113 @@
+# app/concurrency.py - Адаптивный (AIMD) лимит параллельности и частоты запросов к сайту
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from .metrics import SITE_CONCURRENCY_LIMIT, SITE_REQUEST_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Статусы, которыми порталы просят притормозить
+CONGESTION_STATUSES = {429, 503}
+
+
+class AIMDController:
+    """
+    Additive increase / multiplicative decrease для одного сайта:
+    - пока латентность стабильна, лимит параллельных запросов растёт на ~1
+      за "окно" (limit успешных ответов), а интервал между запросами
+      возвращается к rate_limit_ms;
+    - на 429/503/таймаут лимит делится пополам, интервал удваивается.
+    Интервал никогда не меньше rate_limit_ms из sites_config.json (и
+    Crawl-delay из robots.txt, если он строже).
+    """
+
+    def __init__(
+        self,
+        site: str,
+        min_interval: float,
+        max_limit: int = 4,
+        max_interval: Optional[float] = None,
+        latency_tolerance: float = 1.5,
+    ):
+        self.site = site
+        self.base_interval = min_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval or max(min_interval * 16, 30.0)
+        self.max_limit = max(1, max_limit)
+        self.latency_tolerance = latency_tolerance
+
+        self.limit = 1.0
+        self.interval = min_interval
+        self.latency_baseline: Optional[float] = None
+        self._in_flight = 0
+        self._next_allowed = 0.0
+        self._condition = asyncio.Condition()
+        self._spacing_lock = asyncio.Lock()
+        self._export()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        try:
+            async with self._spacing_lock:
+                now = time.monotonic()
+                wait = self._next_allowed - now
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    now = time.monotonic()
+                self._next_allowed = now + self.interval
+            yield self
+        finally:
+            async with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def record_success(self, latency: float):
+        if self.latency_baseline is None:
+            self.latency_baseline = latency
+        stable = latency <= self.latency_baseline * self.latency_tolerance
+        # Медленная EWMA: базовая линия не должна догонять деградацию сразу
+        self.latency_baseline = 0.9 * self.latency_baseline + 0.1 * latency
+
+        if stable:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self.interval = max(self.min_interval, self.interval * 0.9)
+        self._export()
+
+    def record_congestion(self, reason: str):
+        previous = int(self.limit)
+        self.limit = max(1.0, self.limit / 2)
+        self.interval = min(self.max_interval, self.interval * 2)
+        logger.warning(
+            f"{self.site}: {reason}, concurrency {previous} -> {int(self.limit)}, "
+            f"interval {self.interval:.1f}s"
+        )
+        self._export()
+
+    def record_status(self, status_code: Optional[int], latency: float):
+        if status_code in CONGESTION_STATUSES:
+            self.record_congestion(f"HTTP {status_code}")
+        elif status_code is None or status_code < 400:
+            self.record_success(latency)
+        # Прочие ошибки (404, 500) о перегрузке не говорят - лимит не трогаем
+
+    def set_crawl_delay(self, delay: Optional[float]):
+        """Crawl-delay из robots.txt как нижняя граница интервала; None - снова rate_limit_ms"""
+        floor = max(self.base_interval, delay or 0.0)
+        if floor == self.min_interval:
+            return
+        logger.info(f"{self.site}: request interval floor {self.min_interval:.1f}s -> {floor:.1f}s (Crawl-delay)")
+        self.min_interval = floor
+        self.max_interval = max(self.max_interval, floor)
+        # Поднятый порог действует сразу; опущенный - интервал сам сойдёт за успехами
+        self.interval = max(self.interval, floor)
+        self._export()
+
+    def _export(self):
+        SITE_CONCURRENCY_LIMIT.labels(site=self.site).set(int(self.limit))
+        SITE_REQUEST_INTERVAL.labels(site=self.site).set(self.interval)
@@ -20,12 +20,24 @@ class Settings(BaseSettings):
     # Настройки Crawl4AI
     CRAWL4AI_URL: str = "http://crawl4ai:11235"
     CRAWL4AI_API_TOKEN: Optional[str] = None
+    CRAWL4AI_MAX_CONNECTIONS: int = 10
+    # Страницы выдачи пачками через /crawl/job вместо POST /crawl на каждую
+    CRAWL4AI_BATCH_JOBS: bool = True
+    CRAWL4AI_JOB_MAX_URLS: int = 20  # URL в одной задаче
+    CRAWL4AI_MAX_INFLIGHT_JOBS: int = 4  # задач одновременно на процесс
+    CRAWL4AI_POLL_INTERVAL: float = 0.5  # первый опрос статуса, дальше x1.5 до POLL_MAX
+    CRAWL4AI_POLL_MAX_INTERVAL: float = 5.0
+    CRAWL4AI_JOB_TIMEOUT: float = 600.0
     
     # Настройки Ollama
     OLLAMA_URL: str = "http://ollama:11434"
     AI_MODEL: str = "qwen2.5:7b"
     AI_TEMPERATURE: float = 0.7
     AI_MAX_TOKENS: int = 2048
+    OLLAMA_MAX_CONNECTIONS: int = 4
+    AI_CACHE_MAX_ITEMS: int = 10000  # Размер LRU кеша извлечения в процессе
+    AI_CHUNK_TOKEN_BUDGET: int = 1500  # Токенов сырых данных на один запрос к LLM
+    AI_CONCURRENCY: int = 2  # Параллельных запросов к Ollama
     
     # Настройки API сервера
     API_SERVER_URL: str = "http://api-server:8000"
@@ -34,9 +46,53 @@ class Settings(BaseSettings):
     
     # Настройки парсинга
     SCRAPE_INTERVAL_SECONDS: int = 3600  # 1 час
+    # Границы интервала отдельной ленты при адаптивном перепарсинге (средний - SCRAPE_INTERVAL_SECONDS)
+    RECRAWL_MIN_INTERVAL_SECONDS: int = 600
+    RECRAWL_MAX_INTERVAL_SECONDS: int = 14400
     SCRAPE_TIMEOUT_SECONDS: int = 60
     SCRAPE_MAX_RETRIES: int = 3
+    # robots.txt (global_settings.respect_robots_txt): токен в группах User-agent и срок кеша
+    ROBOTS_USER_AGENT: str = "PropertyBot"
+    ROBOTS_TXT_TTL_SECONDS: int = 86400
+    ROBOTS_TXT_ERROR_TTL_SECONDS: int = 600  # повтор после 5xx/сетевой ошибки
+    ROBOTS_MAX_CRAWL_DELAY_SECONDS: float = 60.0  # больший Crawl-delay урезается до этого
+    
+    # Повторы и circuit breaker для Crawl4AI / Ollama
+    UPSTREAM_RETRY_BUDGET_RATIO: float = 0.2  # повторов не больше 20% от запросов
+    UPSTREAM_BACKOFF_BASE_SECONDS: float = 0.5
+    UPSTREAM_BACKOFF_MAX_SECONDS: float = 10.0
+    UPSTREAM_FAILURE_THRESHOLD: int = 5  # ошибок подряд до размыкания цепи
+    UPSTREAM_RESET_TIMEOUT_SECONDS: int = 30
     SCRAPE_BATCH_SIZE: int = 10
+    SCRAPE_SITE_MAX_CONCURRENCY: int = 4  # потолок AIMD-лимита параллельных запросов к сайту
+    # С этого размера пачки пишем через COPY; конвейер сбрасывает по SCRAPE_BATCH_SIZE,
+    # так что для потоковой записи COPY включается SCRAPE_BATCH_SIZE >= порога
+    SCRAPE_COPY_THRESHOLD: int = 500
+    SCRAPE_MISSED_CYCLES_TO_DEACTIVATE: int = 3  # столько полных обходов без объявления - is_active = false
+    SCRAPE_NATIVE_EXTRACTION: bool = True  # сайты без requires_js разбирать по selectors, минуя Crawl4AI
+    
+    # Конвейер crawl → extract → persist (воркеров на стадию для одного сайта)
+    PIPELINE_CRAWL_WORKERS: int = 4
+    PIPELINE_EXTRACT_WORKERS: int = 2
+    PIPELINE_PERSIST_WORKERS: int = 1
+    PIPELINE_QUEUE_SIZE: int = 8  # Страниц в очереди перед extract
+    
+    # Офлайн-геокодер: справочник улиц/баррио CABA и LRU результатов в процессе
+    GEOCODER_GAZETTEER_PATH: str = "/app/configs/caba_gazetteer.json"
+    GEOCODER_CACHE_MAX_ITEMS: int = 50000
+    
+    # Разбор HTML/JSON, regex, сигнатуры дублей и геокодирование - в отдельных процессах
+    CPU_POOL_WORKERS: int = 2  # 0 - всё в event loop
+    CPU_POOL_CHUNK_SIZE: int = 64  # объявлений на одну задачу пула
+    
+    # Распределённая очередь задач (Redis Streams)
+    SCRAPER_MODE: str = "embedded"  # embedded - парсит сам API, queue - только воркеры app.worker
+    SCRAPE_QUEUE_STREAM: str = "scrape:jobs"
+    SCRAPE_QUEUE_GROUP: str = "scrapers"
+    SCRAPE_QUEUE_CLAIM_IDLE_MS: int = 300000  # Через 5 минут без heartbeat задача считается зависшей
+    SCRAPE_QUEUE_MAX_DELIVERIES: int = 5
+    SCRAPE_QUEUE_MAXLEN: int = 10000
+    SCRAPE_WORKER_CONCURRENCY: int = 2  # Сайтов одновременно на один воркер
     
     # Настройки Telegram бота
     TELEGRAM_BOT_TOKEN: str
@@ -85,7 +141,10 @@ class Settings(BaseSettings):
     
     # Настройки валют
     DEFAULT_CURRENCY: str = "ARS"
-    USD_TO_ARS_RATE: float = 1000.0  # Обновлять регулярно
+    # Курсы к USD: файл загружается в exchange_rates при старте, новые - POST /admin/exchange-rates
+    EXCHANGE_RATES_PATH: str = "/app/configs/exchange_rates.json"
+    EXCHANGE_RATES_REFRESH_SECONDS: int = 600  # воркеры перечитывают таблицу не чаще
+    ADMIN_API_TOKEN: Optional[str] = None  # X-Admin-Token для /admin/*; None - /admin/* закрыт
     
     # Лимиты и ограничения
     MAX_PROPERTIES_PER_SEARCH: int = 100
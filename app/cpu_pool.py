@@ -0,0 +1,140 @@
+# app/cpu_pool.py - Пул процессов для CPU-bound разбора (HTML, regex, сигнатуры дублей, геокодирование)
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .dedup import DuplicateIndex, listing_tokens
+from .geocoder import Gazetteer, GeoPoint, Geocoder
+from .html_extractor import HTMLExtractor
+from .metrics import CPU_POOL_TASK_SECONDS
+from .regex_extractor import RegexExtractor
+
+logger = logging.getLogger(__name__)
+
+# Состояние процесса-воркера: скомпилированные селекторы и паттерны.
+# В режиме без пула (workers=0) те же функции работают в основном процессе.
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(config: Dict, native_sites: List[str], gazetteer_path: Optional[str] = None):
+    sites = config.get("sites", {})
+    _worker["regex"] = RegexExtractor(config.get("data_processing", {}))
+    _worker["html"] = {name: HTMLExtractor(name, sites[name]["selectors"]) for name in native_sites}
+    # Перестановки MinHash зависят только от seed - сигнатуры совпадают с индексом в API
+    _worker["dedup"] = DuplicateIndex()
+    _worker["geocoder"] = Geocoder(Gazetteer.load(gazetteer_path)) if gazetteer_path else None
+
+
+def _parse_html(site: str, html: str, base_url: str) -> List[Dict]:
+    return _worker["html"][site].extract(html, base_url)
+
+
+def _regex_split(items: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, Dict]]]:
+    return _worker["regex"].split(items)
+
+
+def _signatures(rows: List[Dict]) -> list:
+    dedup = _worker["dedup"]
+    return [dedup.signature(listing_tokens(row)) for row in rows]
+
+
+def _geocode(keys: List[str]) -> List[Optional[GeoPoint]]:
+    return _worker["geocoder"].geocode_many(keys)
+
+
+class CPUPool:
+    """
+    Выносит CPU-bound шаги из event loop, который обслуживает и FastAPI.
+    Списки режутся на пачки по chunk_size: одна задача на пачку, а не на
+    объявление, иначе pickle/IPC съедает выигрыш. workers=0 - всё inline.
+    """
+
+    def __init__(
+        self,
+        config: Dict,
+        native_sites: List[str],
+        gazetteer_path: Optional[str] = None,
+        workers: int = 2,
+        chunk_size: int = 64,
+    ):
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+        self._initargs = (config, list(native_sites), gazetteer_path)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Inline-режим и fallback после падения воркера
+        _init_worker(*self._initargs)
+
+    def start(self):
+        if self.workers <= 0 or self._executor:
+            return
+        # spawn: форк процесса с работающим event loop и потоками небезопасен
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+        logger.info(f"CPU pool started: {self.workers} processes, chunk size {self.chunk_size}")
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, task: str, fn: Callable, *args):
+        started = time.perf_counter()
+        try:
+            executor = self._executor
+            if executor is None:
+                return fn(*args)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # Воркер убит (OOM и т.п.) - пересоздаём пул, задачу досчитываем здесь.
+                # Сломанный пул видят все задачи, что были в нём; пересоздаёт первая,
+                # остальные уже застанут новый executor
+                if self._executor is executor:
+                    logger.error(f"CPU pool broken during {task}, restarting")
+                    self._executor = None
+                    # Без ожидания: процессы мертвы, join не должен стопорить event loop
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.start()
+                return fn(*args)
+        finally:
+            CPU_POOL_TASK_SECONDS.labels(task=task).observe(time.perf_counter() - started)
+
+    def _chunks(self, items: List) -> List[List]:
+        return [items[i:i + self.chunk_size] for i in range(0, len(items), self.chunk_size)]
+
+    async def parse_html(self, site: str, html: str, base_url: str) -> List[Dict]:
+        return await self._run("parse_html", _parse_html, site, html, base_url)
+
+    async def regex_split(self, items: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, Dict]]]:
+        """То же, что RegexExtractor.split, пачками параллельно"""
+        parts = await asyncio.gather(*(
+            self._run("regex", _regex_split, chunk) for chunk in self._chunks(items)
+        ))
+        records: List[Dict] = []
+        incomplete: List[Tuple[int, Dict]] = []
+        for chunk_records, chunk_incomplete in parts:
+            incomplete.extend((len(records) + index, record) for index, record in chunk_incomplete)
+            records.extend(chunk_records)
+        return records, incomplete
+
+    async def signatures(self, rows: List[Dict]) -> list:
+        """MinHash-сигнатуры для DuplicateIndex.link (unidecode + numpy)"""
+        parts = await asyncio.gather(*(
+            self._run("signatures", _signatures, chunk) for chunk in self._chunks(rows)
+        ))
+        return [signature for part in parts for signature in part]
+
+    async def geocode(self, keys: List[str]) -> List[Optional[GeoPoint]]:
+        """Нормализованные адреса -> координаты (нужен gazetteer_path)"""
+        parts = await asyncio.gather(*(
+            self._run("geocode", _geocode, chunk) for chunk in self._chunks(keys)
+        ))
+        return [point for part in parts for point in part]
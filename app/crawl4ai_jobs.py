@@ -0,0 +1,109 @@
+# app/crawl4ai_jobs.py - Пакетные задачи Crawl4AI: POST /crawl/job + опрос статуса
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Dict, List
+
+from .http_clients import HTTPClientRegistry
+from .metrics import CRAWL4AI_JOBS_IN_FLIGHT, CRAWL4AI_JOB_SECONDS
+from .streaming import CrawlResultStreamParser
+
+logger = logging.getLogger(__name__)
+
+JOB_DONE_STATUSES = {"completed", "failed"}
+
+
+class CrawlJobFailed(Exception):
+    pass
+
+
+class Crawl4AIJobClient:
+    """
+    Много URL одной задачей вместо POST /crawl на каждую страницу: Crawl4AI
+    сам раскладывает их по своему пулу браузеров, а мы опрашиваем статус
+    с растущим интервалом. Результаты отдаются по мере появления (если
+    сервер показывает частичные), одновременно в работе не больше
+    max_in_flight задач на весь процесс. crawl() держит слот между yield,
+    поэтому итерировать его нужно внутри contextlib.aclosing.
+    """
+
+    def __init__(
+        self,
+        http: HTTPClientRegistry,
+        max_in_flight: int = 4,
+        poll_interval: float = 0.5,
+        poll_max_interval: float = 5.0,
+        job_timeout: float = 600.0,
+    ):
+        self.http = http
+        self.poll_interval = poll_interval
+        self.poll_max_interval = poll_max_interval
+        self.job_timeout = job_timeout
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        self._in_flight = 0
+
+    async def crawl(self, urls: List[str], crawler_config: Dict) -> AsyncIterator[Dict]:
+        """Результаты Crawl4AI (с полями CRAWL_RESULT_FIELDS) по одному на URL"""
+        async with self._slots:
+            self._in_flight += 1
+            CRAWL4AI_JOBS_IN_FLIGHT.set(self._in_flight)
+            started = time.monotonic()
+            try:
+                task_id = await self._submit(urls, crawler_config)
+                async with aclosing(self._poll(task_id, len(urls), started)) as results:
+                    async for result in results:
+                        yield result
+            finally:
+                self._in_flight -= 1
+                CRAWL4AI_JOBS_IN_FLIGHT.set(self._in_flight)
+                CRAWL4AI_JOB_SECONDS.observe(time.monotonic() - started)
+
+    async def _submit(self, urls: List[str], crawler_config: Dict) -> str:
+        self.http.ensure_available("crawl4ai")
+        response = await self.http.request(
+            "crawl4ai", "POST", "/crawl/job",
+            json={"urls": urls, "crawler_config": crawler_config},
+        )
+        if response.status_code not in (200, 202):
+            raise CrawlJobFailed(f"Crawl4AI job submit failed: HTTP {response.status_code} {response.text[:200]}")
+        task_id = response.json().get("task_id")
+        if not task_id:
+            raise CrawlJobFailed(f"Crawl4AI job submit returned no task_id: {response.text[:200]}")
+        logger.debug(f"Crawl4AI job {task_id}: {len(urls)} URLs")
+        return task_id
+
+    async def _poll(self, task_id: str, expected: int, started: float) -> AsyncIterator[Dict]:
+        interval = self.poll_interval
+        seen = set()
+        # Crawl4AI дописывает результаты в конец списка: разобранные в прошлых
+        # опросах парсер проматывает, не разбирая их extracted_content заново
+        parsed = 0
+        while True:
+            await asyncio.sleep(interval)
+            # Готовый статус несёт html/markdown всех страниц - читаем потоком,
+            # разбор на loop'е по куску, как и в PropertyScraper._crawl_page
+            parser = CrawlResultStreamParser(skip_results=parsed)
+            async with self.http.stream("crawl4ai", "GET", f"/crawl/job/{task_id}") as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise CrawlJobFailed(f"Crawl4AI job {task_id}: HTTP {response.status_code}")
+                async for chunk in response.aiter_bytes():
+                    parser.feed(chunk)
+            parser.close()
+
+            for index, result in enumerate(parser.results, start=parsed):
+                key = result.get("url") or index
+                if key not in seen:
+                    seen.add(key)
+                    yield result
+            parsed += len(parser.results)
+
+            status = str(parser.job.get("status", "")).lower()
+            if status == "failed":
+                raise CrawlJobFailed(f"Crawl4AI job {task_id} failed: {parser.job.get('error')}")
+            if status in JOB_DONE_STATUSES or len(seen) >= expected:
+                return
+            if time.monotonic() - started > self.job_timeout:
+                raise CrawlJobFailed(f"Crawl4AI job {task_id} timed out ({len(seen)}/{expected} URLs done)")
+            interval = min(self.poll_max_interval, interval * 1.5)
@@ -0,0 +1,243 @@
+# app/crawl_planner.py - Планировщик обхода страниц поиска (search_urls × max_pages)
+import asyncio
+import json
+import logging
+import os
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+
+from .robots import RobotsPolicy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CrawlJob:
+    site: str
+    search_key: str
+    url: str
+    page: int = 1
+
+
+def build_page_url(search_url: str, page: int, pagination: Optional[Dict] = None) -> str:
+    """
+    URL страницы выдачи. Шаблон из sites_config.json поддерживает
+    {url}, {stem}, {ext}, {page} и {offset} (смещение для page_size).
+    """
+    if page <= 1:
+        return search_url
+
+    pagination = pagination or {}
+    template = pagination.get("template", "{url}?page={page}")
+    page_size = pagination.get("page_size", 1)
+
+    path = urlsplit(search_url).path
+    ext = os.path.splitext(path)[1] if "?" not in search_url else ""
+    stem = search_url[: -len(ext)] if ext else search_url
+
+    return template.format(
+        url=search_url,
+        stem=stem,
+        ext=ext,
+        page=page,
+        offset=(page - 1) * page_size + 1,
+    )
+
+
+def listing_key(item: Dict) -> str:
+    """Ключ объявления для определения "новых" записей на странице"""
+    if isinstance(item, dict):
+        key = item.get("external_id") or item.get("url")
+        if key:
+            return str(key)
+    return json.dumps(item, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class CrawlPlanner:
+    """
+    Разворачивает сайт в задачи (search_url × page) и выполняет их пулом воркеров.
+    Следующая страница ленты ставится в очередь только если текущая дала
+    новые объявления, поэтому пагинация останавливается сама. Страницы,
+    закрытые robots.txt, в задачи не попадают (правила сайта должны быть
+    загружены robots.refresh() до plan).
+    """
+
+    def __init__(self, sites_config: Dict[str, Dict], max_workers: int = 4, robots: Optional[RobotsPolicy] = None):
+        self.sites_config = sites_config
+        self.max_workers = max(1, max_workers)
+        self.robots = robots
+
+    def allowed(self, job: CrawlJob) -> bool:
+        if self.robots is None or self.robots.allowed(job.site, job.url):
+            return True
+        logger.warning(f"Skipping {job.url}: disallowed by robots.txt")
+        return False
+
+    def plan(self, site_name: str, search_keys: List[str] = None) -> List[CrawlJob]:
+        """Первые страницы всех (или выбранных) лент сайта"""
+        search_urls = self.sites_config[site_name].get("search_urls", {})
+        keys = search_keys if search_keys is not None else list(search_urls)
+        jobs = [
+            CrawlJob(site=site_name, search_key=key, url=search_urls[key], page=1)
+            for key in keys
+            if key in search_urls
+        ]
+        return [job for job in jobs if self.allowed(job)]
+
+    def next_job(self, job: CrawlJob) -> Optional[CrawlJob]:
+        config = self.sites_config[job.site]
+        next_page = job.page + 1
+        if next_page > config.get("max_pages", 1):
+            return None
+        search_url = config["search_urls"][job.search_key]
+        next_job = CrawlJob(
+            site=job.site,
+            search_key=job.search_key,
+            url=build_page_url(search_url, next_page, config.get("pagination")),
+            page=next_page,
+        )
+        # Закрытая страница обрывает ленту: дальше по пагинации не идём
+        return next_job if self.allowed(next_job) else None
+
+    async def run(
+        self,
+        jobs: List[CrawlJob],
+        fetch_page: Callable[[CrawlJob], Awaitable[List[Dict]]],
+        on_page: Callable[[CrawlJob, List[Dict]], Awaitable[None]] = None,
+        on_error: Callable[[CrawlJob, Exception], None] = None,
+    ) -> List[Dict]:
+        """
+        Обойти все страницы. Новые объявления каждой страницы передаются в
+        on_page (следующей стадии конвейера); без on_page они копятся и
+        возвращаются списком в порядке обхода.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        for job in jobs:
+            queue.put_nowait(job)
+
+        seen = set()
+        collected: List[Dict] = []
+        pages = 0
+
+        async def worker():
+            nonlocal pages
+            while True:
+                job = await queue.get()
+                try:
+                    items = await fetch_page(job)
+                    pages += 1
+                    new_items = []
+                    for item in items or []:
+                        key = listing_key(item)
+                        if key not in seen:
+                            seen.add(key)
+                            new_items.append(item)
+                    if on_page:
+                        await on_page(job, new_items)
+                    else:
+                        collected.extend(new_items)
+
+                    # Пустая или повторная страница - конец ленты
+                    if new_items:
+                        next_job = self.next_job(job)
+                        if next_job:
+                            queue.put_nowait(next_job)
+                except Exception as e:
+                    logger.error(f"Error crawling {job.url}: {e}")
+                    if on_error:
+                        on_error(job, e)
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.max_workers)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        logger.info(f"Crawled {pages} pages, {len(seen)} unique listings")
+        return collected
+
+    async def run_batches(
+        self,
+        jobs: List[CrawlJob],
+        fetch_batch: Callable[[List[CrawlJob]], AsyncIterator[Tuple[CrawlJob, List[Dict]]]],
+        on_page: Callable[[CrawlJob, List[Dict]], Awaitable[None]] = None,
+        on_error: Callable[[CrawlJob, Exception], None] = None,
+        batch_size: int = 20,
+        max_batches: int = 2,
+    ) -> List[Dict]:
+        """
+        То же, что run, но страницы уходят пачками: fetch_batch(jobs) отдаёт
+        (job, items) по мере готовности каждой страницы. В пачку попадают все
+        ждущие страницы (до batch_size), в работе не больше max_batches пачек;
+        следующие страницы лент копятся, пока слоты заняты.
+        """
+        pending: List[CrawlJob] = list(jobs)
+        seen = set()
+        collected: List[Dict] = []
+        pages = 0
+        wake = asyncio.Event()
+
+        async def accept(job: CrawlJob, items: List[Dict]):
+            nonlocal pages
+            pages += 1
+            new_items = []
+            for item in items or []:
+                key = listing_key(item)
+                if key not in seen:
+                    seen.add(key)
+                    new_items.append(item)
+            if on_page:
+                await on_page(job, new_items)
+            else:
+                collected.extend(new_items)
+            # Пустая или повторная страница - конец ленты
+            next_job = self.next_job(job) if new_items else None
+            if next_job:
+                pending.append(next_job)
+                wake.set()
+
+        async def run_batch(batch: List[CrawlJob]):
+            done: Set[CrawlJob] = set()
+            try:
+                async with aclosing(fetch_batch(batch)) as pages:
+                    async for job, items in pages:
+                        done.add(job)
+                        try:
+                            await accept(job, items)
+                        except Exception as e:
+                            logger.error(f"Error crawling {job.url}: {e}")
+                            if on_error:
+                                on_error(job, e)
+                error: Exception = RuntimeError("no result in batch")
+            except Exception as e:
+                error = e
+            for job in batch:
+                if job not in done:
+                    logger.error(f"Error crawling {job.url}: {error}")
+                    if on_error:
+                        on_error(job, error)
+
+        in_flight: Set[asyncio.Task] = set()
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < max(1, max_batches):
+                    batch, pending[:] = pending[:batch_size], pending[batch_size:]
+                    in_flight.add(asyncio.create_task(run_batch(batch)))
+                wake.clear()
+                waiter = asyncio.create_task(wake.wait())
+                finished, _ = await asyncio.wait([*in_flight, waiter], return_when=asyncio.FIRST_COMPLETED)
+                waiter.cancel()
+                in_flight -= finished
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
+
+        logger.info(f"Crawled {pages} pages in batches, {len(seen)} unique listings")
+        return collected
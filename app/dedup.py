@@ -0,0 +1,232 @@
+# app/dedup.py - Поиск дублей между сайтами: MinHash + LSH в памяти
+import logging
+import math
+import re
+import time
+import uuid
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from unidecode import unidecode
+
+from .metrics import DEDUP_INDEX_SIZE, DEDUP_LINKED
+from .models import Property, database
+
+logger = logging.getLogger(__name__)
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+# Временные id строк пачки в индексе на время link(): у них ещё нет UUID из БД
+BATCH_PREFIX = "batch:"
+
+
+def normalize_text(value) -> str:
+    """'Depto. 3 amb. en Núñez' -> 'depto 3 amb en nunez'"""
+    if not value:
+        return ""
+    return NON_ALNUM_RE.sub(" ", unidecode(str(value)).lower()).strip()
+
+
+def _buckets(prefix: str, value: Optional[float], step: float) -> List[str]:
+    # Значение попадает в свою корзину и ближайшую соседнюю,
+    # чтобы 99.6 и 100.4 м² не разошлись на границе
+    if not value or value <= 0:
+        return []
+    position = value / step
+    nearest = int(position)
+    neighbour = nearest + 1 if position - nearest >= 0.5 else nearest - 1
+    return [f"{prefix}:{nearest}", f"{prefix}:{neighbour}"]
+
+
+def listing_tokens(row: Dict) -> Set[str]:
+    """Шинглы объявления: биграммы заголовка, слова адреса, корзины площади и цены"""
+    title = normalize_text(row.get("title")).split()
+    tokens = {f"t:{a} {b}" for a, b in zip(title, title[1:])} or {f"t:{word}" for word in title}
+    tokens.update(f"a:{word}" for word in normalize_text(row.get("address")).split())
+
+    tokens.update(_buckets("area", row.get("area"), 5.0))
+    price_usd = row.get("price_usd")
+    if price_usd:
+        # Лог-шкала: корзины по ~5% цены
+        tokens.update(_buckets("usd", math.log(float(price_usd)), math.log(1.05)))
+    elif row.get("price"):
+        tokens.update(_buckets(f"price_{row.get('currency') or ''}", math.log(float(row["price"])), math.log(1.05)))
+    return tokens
+
+
+@dataclass
+class IndexedListing:
+    property_id: str
+    canonical_id: str
+    site: str
+    external_id: str
+    signature: np.ndarray
+    area: Optional[float]
+    price_usd: Optional[float]
+
+
+def _close(a: Optional[float], b: Optional[float], tolerance: float) -> bool:
+    if not a or not b:
+        return True
+    return abs(float(a) - float(b)) / max(float(a), float(b)) <= tolerance
+
+
+class DuplicateIndex:
+    """
+    MinHash-сигнатуры (num_perm хешей) активных объявлений, разбитые на
+    bands полос для LSH. Кандидаты из общих корзин проверяются по оценке
+    Жаккара и близости площади/цены; найденному дублю проставляется
+    canonical_id первого объявления группы. Индекс живёт в процессе:
+    строится из БД при старте и пополняется при каждой записи.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 16,
+        threshold: float = 0.6,
+        numeric_tolerance: float = 0.1,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.numeric_tolerance = numeric_tolerance
+
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, MAX_HASH, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+        self._listings: Dict[str, IndexedListing] = {}
+        self._keys: Dict[Tuple[str, str], str] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    def signature(self, tokens: Set[str]) -> np.ndarray:
+        if not tokens:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        hashes = np.array([zlib.crc32(token.encode()) for token in tokens], dtype=np.uint64)
+        permuted = (np.outer(hashes, self._a) + self._b) % np.uint64(MERSENNE_PRIME) & np.uint64(MAX_HASH)
+        return permuted.min(axis=0)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def match(self, row: Dict, signature: np.ndarray = None) -> Optional[str]:
+        """canonical_id похожего объявления (другого site/external_id) или None"""
+        if signature is None:
+            signature = self.signature(listing_tokens(row))
+        own = self._keys.get((row["site"], row["external_id"]))
+
+        candidates: Set[str] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        candidates.discard(own)
+
+        best, best_score = None, self.threshold
+        for property_id in candidates:
+            listing = self._listings[property_id]
+            if not (
+                _close(row.get("area"), listing.area, self.numeric_tolerance)
+                and _close(row.get("price_usd"), listing.price_usd, self.numeric_tolerance)
+            ):
+                continue
+            score = float(np.mean(signature == listing.signature))
+            if score >= best_score:
+                best, best_score = listing, score
+        # Группа, в которой это объявление само каноническое, - не дубль
+        if best is None or best.canonical_id == own:
+            return None
+        return best.canonical_id
+
+    def add(self, property_id: str, row: Dict, canonical_id: Optional[str] = None, signature: np.ndarray = None):
+        property_id = str(property_id)
+        self.remove(property_id)
+        if signature is None:
+            signature = self.signature(listing_tokens(row))
+
+        listing = IndexedListing(
+            property_id=property_id,
+            canonical_id=str(canonical_id) if canonical_id else property_id,
+            site=row["site"],
+            external_id=row["external_id"],
+            signature=signature,
+            area=row.get("area"),
+            price_usd=row.get("price_usd"),
+        )
+        self._listings[property_id] = listing
+        self._keys[(listing.site, listing.external_id)] = property_id
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band].setdefault(key, set()).add(property_id)
+        DEDUP_INDEX_SIZE.set(len(self._listings))
+
+    def remove(self, property_id: str):
+        listing = self._listings.pop(str(property_id), None)
+        if listing is None:
+            return
+        self._keys.pop((listing.site, listing.external_id), None)
+        for band, key in enumerate(self._band_keys(listing.signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket:
+                bucket.discard(listing.property_id)
+                if not bucket:
+                    del self._buckets[band][key]
+        DEDUP_INDEX_SIZE.set(len(self._listings))
+
+    def link(
+        self, rows: List[Dict], signatures: List[np.ndarray] = None
+    ) -> Tuple[List[np.ndarray], Dict[int, int]]:
+        """
+        Проставить rows[i]["canonical_id"] перед записью; сигнатуры пригодятся для add().
+        signatures можно посчитать заранее (CPUPool.signatures), иначе считаются здесь.
+        Дубли внутри самой пачки ещё без id: они возвращаются как {i: j} - строка i
+        дублирует более раннюю строку j, canonical_id ей проставят после записи.
+        """
+        if signatures is None:
+            signatures = [self.signature(listing_tokens(row)) for row in rows]
+        batch_links: Dict[int, int] = {}
+        pending: List[str] = []
+        try:
+            for index, (row, signature) in enumerate(zip(rows, signatures)):
+                canonical_id = self.match(row, signature)
+                row["canonical_id"] = None
+                if canonical_id and canonical_id.startswith(BATCH_PREFIX):
+                    batch_links[index] = int(canonical_id[len(BATCH_PREFIX):])
+                elif canonical_id:
+                    row["canonical_id"] = uuid.UUID(canonical_id)
+                if canonical_id:
+                    DEDUP_LINKED.labels(site=row["site"]).inc()
+                # Новые строки видны следующим строкам пачки; уже проиндексированные
+                # (повторный обход) и так в индексе под своим id
+                if (row["site"], row["external_id"]) not in self._keys:
+                    temporary_id = f"{BATCH_PREFIX}{index}"
+                    self.add(temporary_id, row, canonical_id, signature)
+                    pending.append(temporary_id)
+        finally:
+            for temporary_id in pending:
+                self.remove(temporary_id)
+        return signatures, batch_links
+
+    async def load(self):
+        """Построить индекс по активным объявлениям"""
+        started = time.monotonic()
+        query = select(
+            Property.id, Property.canonical_id, Property.site, Property.external_id,
+            Property.title, Property.address, Property.area,
+            Property.price, Property.currency, Property.price_usd,
+        ).where(Property.is_active.is_(True))
+        for record in await database.fetch_all(query):
+            row = dict(record._mapping)
+            self.add(row["id"], row, row["canonical_id"])
+        logger.info(f"Duplicate index: {len(self)} active listings in {time.monotonic() - started:.1f}s")
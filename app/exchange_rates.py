@@ -0,0 +1,148 @@
+# app/exchange_rates.py - Курсы валют к USD и price_usd объявлений
+import json
+import logging
+import os
+import time
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Numeric, cast, func, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .config import settings
+from .models import ExchangeRate, Property, database
+
+logger = logging.getLogger(__name__)
+
+
+class ExchangeRates:
+    """
+    Последний курс по каждой валюте (единиц валюты за 1 USD). price_usd
+    считается при записи объявления (fill), а при новом курсе пересчитывается
+    одним UPDATE по всем объявлениям валюты (recompute) - чтение и фильтры
+    по цене работают с обычной индексированной колонкой, без convert_to_usd.
+    """
+
+    def __init__(self, path: str = None, refresh_seconds: int = None):
+        self.path = path or settings.EXCHANGE_RATES_PATH
+        self.refresh_seconds = refresh_seconds or settings.EXCHANGE_RATES_REFRESH_SECONDS
+        self.rates: Dict[str, Tuple[date, float]] = {}
+        self._loaded_at: Optional[float] = None
+        self._table = ExchangeRate.__table__
+
+    def to_usd(self, amount: Optional[float], currency: Optional[str]) -> Optional[float]:
+        if amount is None or not currency:
+            return None
+        currency = currency.upper()
+        if currency == "USD":
+            return amount
+        rate = self.rates.get(currency)
+        return round(amount / rate[1], 2) if rate else None
+
+    def fill(self, rows: List[Dict]):
+        """price_usd по текущему курсу; без курса остаётся цена в USD с сайта"""
+        for row in rows:
+            row["price_usd"] = self.to_usd(row["price"], row["currency"]) or row["price_usd"]
+
+    async def load(self):
+        """Последние курсы из БД, затем курсы из файла (новые сразу пересчитываются)"""
+        table = self._table
+        records = await database.fetch_all(
+            select(table.c.currency, table.c.rate_date, table.c.units_per_usd)
+            .distinct(table.c.currency)
+            .order_by(table.c.currency, table.c.rate_date.desc())
+        )
+        previous = self.rates if self._loaded_at is not None else None
+        self.rates = {r["currency"]: (r["rate_date"], float(r["units_per_usd"])) for r in records}
+        self._loaded_at = time.monotonic()
+        if previous is not None:
+            # Курс добавил другой процесс и уже пересчитал price_usd, но до этого
+            # reload мы писали объявления по старому курсу - досчитываем их
+            for currency in sorted(c for c, rate in self.rates.items() if previous.get(c) != rate):
+                recomputed = await self.recompute(currency)
+                logger.info(f"Exchange rate {currency} reloaded: {recomputed} listings written at the old rate recomputed")
+        if self.path and os.path.exists(self.path):
+            await self.add(self.read_file(self.path), source="file")
+
+    async def refresh(self):
+        """Курсы, добавленные другим процессом (API), доходят до воркеров не позже refresh_seconds"""
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds:
+            return
+        try:
+            await self.load()
+        except Exception as e:
+            self._loaded_at = time.monotonic()
+            logger.warning(f"Exchange rates: reload failed, keeping {self.rates}: {e}")
+
+    @staticmethod
+    def read_file(path: str) -> List[Dict]:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return [
+            {
+                "currency": entry["currency"],
+                "rate_date": date.fromisoformat(entry["date"]),
+                "units_per_usd": float(entry["units_per_usd"]),
+            }
+            for entry in data.get("rates", [])
+        ]
+
+    async def add(self, rates: List[Dict], source: str) -> Dict[str, int]:
+        """
+        Записывает курсы (currency, rate_date, units_per_usd) и пересчитывает
+        price_usd валют, у которых сменился последний курс. Возвращает
+        {валюта: сколько объявлений пересчитано}.
+        """
+        rows = [
+            {
+                "currency": rate["currency"].upper(),
+                "rate_date": rate.get("rate_date") or date.today(),
+                "units_per_usd": float(rate["units_per_usd"]),
+                "source": source,
+            }
+            for rate in rates
+        ]
+        rows = [row for row in rows if row["currency"] != "USD" and row["units_per_usd"] > 0]
+        if not rows:
+            return {}
+
+        insert = pg_insert(self._table).values(rows)
+        await database.execute(insert.on_conflict_do_update(
+            index_elements=["currency", "rate_date"],
+            set_={"units_per_usd": insert.excluded.units_per_usd, "source": insert.excluded.source},
+        ))
+
+        changed = set()
+        for row in sorted(rows, key=lambda r: r["rate_date"]):
+            current = self.rates.get(row["currency"])
+            if current is None or row["rate_date"] >= current[0]:
+                if current != (row["rate_date"], row["units_per_usd"]):
+                    changed.add(row["currency"])
+                self.rates[row["currency"]] = (row["rate_date"], row["units_per_usd"])
+
+        recomputed = {}
+        for currency in sorted(changed):
+            recomputed[currency] = await self.recompute(currency)
+            logger.info(
+                f"Exchange rate {currency} = {self.rates[currency][1]} ({self.rates[currency][0]}, {source}): "
+                f"{recomputed[currency]} listings recomputed"
+            )
+        return recomputed
+
+    async def recompute(self, currency: str) -> int:
+        """Один UPDATE по всем объявлениям валюты; строки с тем же значением не трогаем"""
+        table = Property.__table__
+        price_usd = func.round(cast(table.c.price, Numeric) / self.rates[currency][1], 2)
+        updated = (
+            update(table)
+            .where(
+                table.c.currency == currency,
+                table.c.price.isnot(None),
+                table.c.price_usd.is_distinct_from(price_usd),
+            )
+            # Смена курса - не изменение объявления: updated_at не трогаем
+            .values(price_usd=price_usd, updated_at=table.c.updated_at)
+            .returning(literal_column("1"))
+            .cte("updated")
+        )
+        return await database.fetch_val(select(func.count()).select_from(updated))
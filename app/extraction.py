@@ -0,0 +1,144 @@
+# app/extraction.py - Разбиение объявлений на чанки и параллельное LLM-извлечение
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+from .metrics import AI_CHUNK_LATENCY, AI_ITEMS_EXTRACTED, AI_ITEMS_PER_SECOND
+
+logger = logging.getLogger(__name__)
+
+# Грубая оценка: ~4 символа JSON на токен
+CHARS_PER_TOKEN = 4
+# Сколько токенов ответа занимает одно извлечённое объявление
+OUTPUT_TOKENS_PER_ITEM = 150
+
+# emit(позиция в чанке, результат) - объявление готово раньше, чем весь чанк
+Emit = Callable[[int, Dict], Awaitable[None]]
+ChunkExtractor = Callable[[List[Dict], str, Emit], Awaitable[List[Optional[Dict]]]]
+Fallback = Callable[[List[Dict]], List[Dict]]
+# on_item(индекс во входе, результат, from_llm)
+ItemCallback = Callable[[int, Dict, bool], Awaitable[None]]
+
+
+def estimate_tokens(item: Dict) -> int:
+    return len(json.dumps(item, ensure_ascii=False, default=str)) // CHARS_PER_TOKEN + 1
+
+
+def chunk_items(items: List[Dict], token_budget: int, max_items: int) -> List[List[Dict]]:
+    """Режет список на чанки, каждый укладывается в бюджет токенов промпта"""
+    chunks: List[List[Dict]] = []
+    current: List[Dict] = []
+    used = 0
+    for item in items:
+        cost = estimate_tokens(item)
+        if current and (used + cost > token_budget or len(current) >= max_items):
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class ExtractionEngine:
+    """
+    Отправляет все объявления в LLM чанками с ограниченной параллельностью.
+    Порядок результатов совпадает с порядком входа; если чанк не удался,
+    его объявления обрабатываются fallback'ом, остальные чанки не страдают.
+    """
+
+    def __init__(
+        self,
+        extract_chunk: ChunkExtractor,
+        fallback: Fallback,
+        token_budget: int = None,
+        concurrency: int = None,
+    ):
+        self.extract_chunk = extract_chunk
+        self.fallback = fallback
+        self.token_budget = token_budget or settings.AI_CHUNK_TOKEN_BUDGET
+        self.max_items = max(1, settings.AI_MAX_TOKENS // OUTPUT_TOKENS_PER_ITEM)
+        self._semaphore = asyncio.Semaphore(concurrency or settings.AI_CONCURRENCY)
+
+    async def extract(
+        self, items: List[Dict], site_name: str, on_item: ItemCallback = None
+    ) -> Tuple[List[Optional[Dict]], List[bool]]:
+        """
+        Возвращает (результаты, from_llm), выровненные по items: from_llm[i] == False,
+        если объявление обработано fallback'ом (такие результаты не кешируем).
+        on_item вызывается для каждого объявления сразу, как только оно готово.
+        """
+        if not items:
+            return [], []
+
+        started = time.monotonic()
+        chunks = chunk_items(items, self.token_budget, self.max_items)
+        offsets = [0]
+        for chunk in chunks[:-1]:
+            offsets.append(offsets[-1] + len(chunk))
+        outcomes = await asyncio.gather(
+            *(
+                self._run_chunk(index, offset, chunk, site_name, on_item)
+                for index, (offset, chunk) in enumerate(zip(offsets, chunks))
+            )
+        )
+
+        results: List[Optional[Dict]] = []
+        from_llm: List[bool] = []
+        for chunk_results, chunk_flags in outcomes:
+            results.extend(chunk_results)
+            from_llm.extend(chunk_flags)
+
+        elapsed = time.monotonic() - started
+        rate = len(items) / elapsed if elapsed > 0 else 0.0
+        AI_ITEMS_PER_SECOND.labels(site=site_name).set(rate)
+        logger.info(
+            f"Extracted {len(items)} items from {site_name} in {len(chunks)} chunks, "
+            f"{elapsed:.1f}s ({rate:.1f} items/s, {sum(from_llm)} via LLM)"
+        )
+        return results, from_llm
+
+    async def _run_chunk(
+        self, index: int, offset: int, chunk: List[Dict], site_name: str, on_item: ItemCallback = None
+    ) -> Tuple[List[Optional[Dict]], List[bool]]:
+        emitted = set()
+
+        async def emit(position: int, result: Dict):
+            emitted.add(position)
+            if on_item:
+                await on_item(offset + position, result, True)
+
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                extracted = await self.extract_chunk(chunk, site_name, emit)
+            except Exception as e:
+                logger.error(f"LLM chunk {index} for {site_name} failed: {e}")
+                extracted = [None] * len(chunk)
+            AI_CHUNK_LATENCY.observe(time.monotonic() - started)
+
+        # Fallback только для объявлений этого чанка, которые LLM не вернул
+        missing = [
+            item for item, result in zip(chunk, extracted)
+            if result is None and isinstance(item, dict)
+        ]
+        fallback_results = iter(self.fallback(missing) if missing else [])
+
+        results: List[Optional[Dict]] = []
+        flags: List[bool] = []
+        for position, (item, result) in enumerate(zip(chunk, extracted)):
+            from_llm = result is not None
+            if not from_llm and isinstance(item, dict):
+                result = next(fallback_results, None)
+            results.append(result)
+            flags.append(from_llm)
+            if on_item and result is not None and position not in emitted:
+                await on_item(offset + position, result, from_llm)
+
+        AI_ITEMS_EXTRACTED.labels(source="llm").inc(sum(flags))
+        AI_ITEMS_EXTRACTED.labels(source="fallback").inc(len(missing))
+        return results, flags
@@ -0,0 +1,144 @@
+# app/extraction_cache.py - Кеш результатов LLM-извлечения по содержимому объявления
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from .config import settings
+from .metrics import AI_CACHE_HITS, AI_CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые меняются от краулинга к краулингу и не влияют на результат
+VOLATILE_FIELDS = {"scraped_at", "crawled_at", "timestamp", "position", "index"}
+
+
+def normalize_item(item: Any) -> Any:
+    """Каноничная форма сырого объявления: без шума в пробелах и порядке ключей"""
+    if isinstance(item, dict):
+        return {
+            key: normalize_item(value)
+            for key, value in sorted(item.items())
+            if key not in VOLATILE_FIELDS
+        }
+    if isinstance(item, list):
+        return [normalize_item(value) for value in item]
+    if isinstance(item, str):
+        return " ".join(item.split())
+    return item
+
+
+def item_cache_key(item: Any, model: str, prompt_version: str) -> str:
+    payload = json.dumps(normalize_item(item), ensure_ascii=False, sort_keys=True, default=str)
+    digest = hashlib.sha256(f"{model}\x00{prompt_version}\x00{payload}".encode()).hexdigest()
+    return f"extract:{digest}"
+
+
+class ExtractionCache:
+    """
+    Двухуровневый кеш: LRU в процессе + Redis (REDIS_URL, TTL = REDIS_CACHE_TTL).
+    Если Redis недоступен - работаем только на LRU.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        prompt_version: str,
+        max_items: int = None,
+        redis_url: Optional[str] = None,
+        ttl: int = None,
+    ):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_items = max_items or settings.AI_CACHE_MAX_ITEMS
+        self.redis_url = redis_url if redis_url is not None else settings.REDIS_URL
+        self.ttl = ttl or settings.REDIS_CACHE_TTL
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self._redis = None
+        self.hits = {"memory": 0, "redis": 0}
+        self.misses = 0
+
+    async def connect(self):
+        if not self.redis_url:
+            return
+        try:
+            import redis.asyncio as aioredis
+
+            self._redis = aioredis.from_url(self.redis_url, decode_responses=True)
+            await self._redis.ping()
+        except Exception as e:
+            logger.warning(f"Extraction cache: Redis unavailable, using memory only: {e}")
+            self._redis = None
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+            self._redis = None
+
+    def key(self, item: Any) -> str:
+        return item_cache_key(item, self.model, self.prompt_version)
+
+    def _remember(self, key: str, value: Dict):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Dict]:
+        found: Dict[str, Dict] = {}
+        remote: List[str] = []
+        for key in dict.fromkeys(keys):
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+            else:
+                remote.append(key)
+        self._count("memory", len(found))
+
+        redis_hits = 0
+        if remote and self._redis is not None:
+            try:
+                values = await self._redis.mget(remote)
+            except Exception as e:
+                logger.warning(f"Extraction cache: Redis MGET failed: {e}")
+                values = [None] * len(remote)
+            for key, value in zip(remote, values):
+                if value is not None:
+                    found[key] = json.loads(value)
+                    self._remember(key, found[key])
+                    redis_hits += 1
+            self._count("redis", redis_hits)
+
+        missed = len(remote) - redis_hits
+        self.misses += missed
+        AI_CACHE_MISSES.inc(missed)
+        return found
+
+    async def set_many(self, results: Dict[str, Dict]):
+        for key, value in results.items():
+            self._remember(key, value)
+
+        if results and self._redis is not None:
+            try:
+                async with self._redis.pipeline(transaction=False) as pipe:
+                    for key, value in results.items():
+                        pipe.set(key, json.dumps(value, ensure_ascii=False, default=str), ex=self.ttl)
+                    await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Extraction cache: Redis write failed: {e}")
+
+    def _count(self, tier: str, amount: int):
+        if amount:
+            self.hits[tier] += amount
+            AI_CACHE_HITS.labels(tier=tier).inc(amount)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits["memory"] + self.hits["redis"] + self.misses
+        return {
+            "hits_memory": self.hits["memory"],
+            "hits_redis": self.hits["redis"],
+            "misses": self.misses,
+            "hit_rate": (total - self.misses) / total if total else 0.0,
+            "memory_items": len(self._memory),
+        }
@@ -0,0 +1,342 @@
+# app/geocoder.py - Офлайн-геокодер адресов CABA по встроенному справочнику улиц и баррио
+import bisect
+import json
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .config import settings
+from .metrics import GEOCODE_CACHE_HITS, GEOCODE_RESULTS
+from .models import GeocodedAddress, database
+from .name_index import NameIndex, fold
+
+logger = logging.getLogger(__name__)
+
+ABBREVIATIONS = {
+    "av": "avenida", "avda": "avenida", "avd": "avenida", "avenue": "avenida",
+    "gral": "general", "cnel": "coronel", "tte": "teniente", "pte": "presidente",
+    "dr": "doctor", "ing": "ingeniero", "sta": "santa", "pje": "pasaje", "psje": "pasaje",
+}
+# Тип улицы в начале названия для поиска не нужен
+STREET_PREFIXES = {"avenida", "calle", "pasaje"}
+# "Santa Fe al 3200", "Corrientes N° 1500"
+NUMBER_WORDS = {"al", "n", "nro", "numero", "no"}
+# Сегменты адреса, которые ничего не уточняют внутри CABA
+ADMIN_SEGMENTS = {
+    "caba", "capital", "capital federal", "ciudad de buenos aires", "ciudad autonoma de buenos aires",
+    "buenos aires", "bs as", "argentina", "c a b a",
+}
+# Партидо и города вне CABA: справочник только столичный, и "Sarmiento 400, Quilmes"
+# иначе получил бы точку на одноимённой улице CABA. Названия баррио CABA
+# ("Parque Avellaneda") проверяются раньше и сюда не попадают
+OUTSIDE_CABA = {
+    "gba", "gran buenos aires", "conurbano", "provincia de buenos aires", "pcia de buenos aires",
+    "zona norte", "zona sur", "zona oeste",
+    "almirante brown", "avellaneda", "berazategui", "berisso", "canuelas", "ensenada", "escobar",
+    "esteban echeverria", "ezeiza", "florencio varela", "general rodriguez", "general san martin",
+    "san martin", "hurlingham", "ituzaingo", "jose c paz", "la matanza", "la plata", "lanus",
+    "lomas de zamora", "malvinas argentinas", "marcos paz", "merlo", "moreno", "moron", "pilar",
+    "presidente peron", "quilmes", "san fernando", "san isidro", "san miguel", "tigre",
+    "tres de febrero", "vicente lopez",
+    "acassuso", "adrogue", "banfield", "beccar", "bernal", "boulogne", "caseros", "castelar",
+    "ciudadela", "don torcuato", "haedo", "lomas del mirador", "martinez", "munro", "nordelta",
+    "olivos", "ramos mejia", "remedios de escalada", "san justo", "sarandi", "temperley",
+    "valentin alsina", "villa ballester", "wilde",
+}
+# "Quilmes Oeste", "Bernal Este"
+CARDINAL_SUFFIXES = {"norte", "sur", "este", "oeste", "centro"}
+# Квартира/этаж: "piso 3", "3 b", "dto 4", "depto a", "uf 12", "pb" - вырезается только
+# сам токен: в "departamento 3 ambientes en recoleta" после него идёт баррио
+UNIT_RE = re.compile(
+    r"\b(?:piso \w+|(?:dto|dpto|depto|departamento|unidad|uf|of|oficina) (?:\d+[a-z]?|[a-z])|pb|\d{1,2} [a-h])\b"
+)
+# "entre Gorriti y Honduras"
+BETWEEN_RE = re.compile(r"\bentre\b.*$")
+
+# Меняется вместе с логикой normalize_address/geocode: старые записи кеша - промах
+GEOCODER_VERSION = "2"
+
+# Номер вне диапазона опорных точек улицы больше чем на это - скорее не та улица
+NUMBER_SLACK = 500
+
+
+def normalize_address(text: Optional[str]) -> str:
+    """
+    Ключ адреса для индекса и кеша: 'Av. Santa Fe al 3.200, 4°B, Palermo, CABA'
+    -> 'avenida santa fe 3200, palermo'.
+    """
+    if not text:
+        return ""
+    segments: List[str] = []
+    for raw in str(text).split(","):
+        # 3.200 -> 3200 до свёртки, иначе номер развалится на два; unidecode('°') == 'deg'
+        words = fold(re.sub(r"(?<=\d)\.(?=\d{3}\b)", "", raw).replace("°", " ").replace("º", " ")).split()
+        words = [ABBREVIATIONS.get(word, word) for word in words]
+        # "santa fe al 3200" и "santa fe 3200" - один ключ
+        words = [
+            word for position, word in enumerate(words)
+            if not (position and word in NUMBER_WORDS and position + 1 < len(words) and words[position + 1].isdigit())
+        ]
+        segment = " ".join(BETWEEN_RE.sub("", UNIT_RE.sub(" ", " ".join(words))).split())
+        if segment and segment not in ADMIN_SEGMENTS and segment not in segments:
+            segments.append(segment)
+    return ", ".join(segments)
+
+
+def geocode_query(row: Dict) -> str:
+    """Ключ геокодирования строки properties: адрес (или location) + баррио"""
+    parts = [row.get("address") or row.get("location") or "", row.get("neighborhood") or ""]
+    return normalize_address(", ".join(part for part in parts if part))
+
+
+@dataclass
+class GeoPoint:
+    latitude: float
+    longitude: float
+    precision: str  # address - улица и номер дома, neighborhood - центроид баррио
+    neighborhood: Optional[str] = None
+
+
+@dataclass
+class Street:
+    name: str
+    numbers: List[int]
+    points: List[Tuple[float, float]]
+
+    def locate(self, number: int) -> Optional[Tuple[float, float]]:
+        """Линейная интерполяция между опорными точками оси улицы"""
+        if number < self.numbers[0] - NUMBER_SLACK or number > self.numbers[-1] + NUMBER_SLACK:
+            return None
+        if number <= self.numbers[0]:
+            return self.points[0]
+        if number >= self.numbers[-1]:
+            return self.points[-1]
+        right = bisect.bisect_right(self.numbers, number)
+        left = right - 1
+        share = (number - self.numbers[left]) / (self.numbers[right] - self.numbers[left])
+        (lat1, lon1), (lat2, lon2) = self.points[left], self.points[right]
+        return lat1 + (lat2 - lat1) * share, lon1 + (lon2 - lon1) * share
+
+
+class Gazetteer:
+    """Справочник configs/caba_gazetteer.json: баррио с центроидами и оси улиц"""
+
+    def __init__(self, data: Dict):
+        self.version = str(data.get("version", "0"))
+        self.neighborhoods: Dict[str, Tuple[float, float]] = {}
+        self.neighborhood_aliases: Dict[str, List[str]] = {}
+        self.neighborhood_index = NameIndex()
+        for entry in data.get("neighborhoods", []):
+            self.neighborhoods[entry["name"]] = (entry["lat"], entry["lon"])
+            self.neighborhood_aliases[entry["name"]] = list(entry.get("aliases", []))
+            for name in [entry["name"], *entry.get("aliases", [])]:
+                self.neighborhood_index.add(name, entry["name"])
+
+        self.streets: Dict[str, Street] = {}
+        self.street_index = NameIndex()
+        for entry in data.get("streets", []):
+            anchors = sorted(entry["anchors"])
+            street = Street(entry["name"], [a[0] for a in anchors], [(a[1], a[2]) for a in anchors])
+            self.streets[street.name] = street
+            for name in [entry["name"], *entry.get("aliases", [])]:
+                self.street_index.add(_street_key(fold(name)), street.name)
+
+    @classmethod
+    def load(cls, path: str) -> "Gazetteer":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+
+def _street_key(name: str) -> str:
+    words = name.split()
+    while words and words[0] in STREET_PREFIXES:
+        words = words[1:]
+    return " ".join(words)
+
+
+class Geocoder:
+    """
+    Нормализованный адрес -> координаты без сети. Улица ищется в trie
+    (точно или с опечатками), номер дома интерполируется по оси улицы.
+    Если улицу или номер не нашли - центроид баррио из остальных частей адреса.
+    """
+
+    def __init__(self, gazetteer: Gazetteer):
+        self.gazetteer = gazetteer
+
+    def _street_point(self, segment: str) -> Optional[Tuple[float, float]]:
+        words = segment.split()
+        for position, word in enumerate(words):
+            if position and word.isdigit() and len(word) <= 5:
+                name_words = [w for w in words[:position] if w not in NUMBER_WORDS]
+                name = _street_key(" ".join(name_words))
+                street_name = self.gazetteer.street_index.lookup(name) if name else None
+                if street_name:
+                    return self.gazetteer.streets[street_name].locate(int(word))
+                return None
+        return None
+
+    def _neighborhood(self, segments: List[str]) -> Optional[str]:
+        index = self.gazetteer.neighborhood_index
+        # Сначала дешёвые точные проверки по всем сегментам, нечёткий поиск - последним
+        for segment in segments:
+            name = index.get(segment)
+            if name:
+                return name
+            # "depto en palermo soho" - название внутри сегмента
+            words = segment.split()
+            for start in range(len(words)):
+                found = index.longest_prefix(words[start:])
+                if found:
+                    return found[0]
+        for segment in segments:
+            # Сегмент с номером дома - улица, а не баррио
+            if not any(char.isdigit() for char in segment):
+                name = index.lookup(segment)
+                if name:
+                    return name
+        return None
+
+    def _outside_caba(self, segment: str) -> bool:
+        if self.gazetteer.neighborhood_index.get(segment):
+            return False
+        words = segment.split()
+        if len(words) > 1 and words[-1] in CARDINAL_SUFFIXES:
+            segment = " ".join(words[:-1])
+        return segment in OUTSIDE_CABA
+
+    def geocode(self, key: str) -> Optional[GeoPoint]:
+        if not key:
+            return None
+        segments = key.split(", ")
+        if any(self._outside_caba(segment) for segment in segments):
+            return None
+        neighborhood = self._neighborhood(segments[1:]) or self._neighborhood(segments[:1])
+        point = self._street_point(segments[0])
+        if point:
+            return GeoPoint(point[0], point[1], "address", neighborhood)
+        if neighborhood:
+            lat, lon = self.gazetteer.neighborhoods[neighborhood]
+            return GeoPoint(lat, lon, "neighborhood", neighborhood)
+        return None
+
+    def geocode_many(self, keys: List[str]) -> List[Optional[GeoPoint]]:
+        return [self.geocode(key) for key in keys]
+
+
+class GeocodeCache:
+    """
+    Результаты по ключу нормализованного адреса: LRU в процессе + таблица
+    geocoded_addresses. Записи другой версии справочника считаются промахом.
+    Нераспознанные адреса тоже кешируются (precision = 'none').
+    """
+
+    def __init__(self, gazetteer_version: str, max_items: int = None):
+        self.version = f"{gazetteer_version}/{GEOCODER_VERSION}"
+        self.max_items = max_items or settings.GEOCODER_CACHE_MAX_ITEMS
+        self._memory: "OrderedDict[str, Optional[GeoPoint]]" = OrderedDict()
+        self._table = GeocodedAddress.__table__
+
+    def _remember(self, key: str, point: Optional[GeoPoint]):
+        self._memory[key] = point
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, Optional[GeoPoint]]:
+        found: Dict[str, Optional[GeoPoint]] = {}
+        remote = []
+        for key in keys:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                found[key] = self._memory[key]
+            else:
+                remote.append(key)
+        GEOCODE_CACHE_HITS.labels(tier="memory").inc(len(found))
+        if not remote:
+            return found
+
+        table = self._table
+        try:
+            records = await database.fetch_all(
+                select(table.c.address_key, table.c.latitude, table.c.longitude,
+                       table.c.precision, table.c.neighborhood)
+                .where(table.c.address_key.in_(remote), table.c.gazetteer_version == self.version)
+            )
+        except Exception as e:
+            logger.warning(f"Geocode cache: lookup failed: {e}")
+            return found
+        for record in records:
+            point = None
+            if record["precision"] != "none":
+                point = GeoPoint(record["latitude"], record["longitude"], record["precision"], record["neighborhood"])
+            found[record["address_key"]] = point
+            self._remember(record["address_key"], point)
+        GEOCODE_CACHE_HITS.labels(tier="db").inc(len(records))
+        return found
+
+    async def set_many(self, results: Dict[str, Optional[GeoPoint]]):
+        for key, point in results.items():
+            self._remember(key, point)
+        if not results:
+            return
+        rows = [
+            {
+                "address_key": key,
+                "latitude": point.latitude if point else None,
+                "longitude": point.longitude if point else None,
+                "precision": point.precision if point else "none",
+                "neighborhood": point.neighborhood if point else None,
+                "gazetteer_version": self.version,
+            }
+            for key, point in results.items()
+        ]
+        insert = pg_insert(self._table).values(rows)
+        try:
+            await database.execute(insert.on_conflict_do_update(
+                index_elements=["address_key"],
+                set_={name: insert.excluded[name] for name in rows[0] if name != "address_key"},
+            ))
+        except Exception as e:
+            logger.warning(f"Geocode cache: write failed: {e}")
+
+
+class BatchGeocoder:
+    """
+    Заполняет latitude/longitude пачки строк перед upsert: уникальные ключи,
+    затем кеш, затем геокодирование промахов одним вызовом compute
+    (CPUPool.geocode) или здесь же, если пула нет.
+    """
+
+    def __init__(
+        self,
+        geocoder: Geocoder,
+        cache: GeocodeCache,
+        compute: Callable[[List[str]], Awaitable[List[Optional[GeoPoint]]]] = None,
+    ):
+        self.geocoder = geocoder
+        self.cache = cache
+        self.compute = compute
+
+    async def fill(self, rows: List[Dict]):
+        keys = [geocode_query(row) for row in rows]
+        unique = [key for key in dict.fromkeys(keys) if key]
+        found = await self.cache.get_many(unique)
+        missing = [key for key in unique if key not in found]
+        if missing:
+            points = await self.compute(missing) if self.compute else self.geocoder.geocode_many(missing)
+            computed = dict(zip(missing, points))
+            for point in points:
+                GEOCODE_RESULTS.labels(precision=point.precision if point else "none").inc()
+            await self.cache.set_many(computed)
+            found.update(computed)
+
+        for row, key in zip(rows, keys):
+            point = found.get(key)
+            row["latitude"] = point.latitude if point else None
+            row["longitude"] = point.longitude if point else None
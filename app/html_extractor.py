@@ -0,0 +1,97 @@
+# app/html_extractor.py - Извлечение объявлений из статического HTML по selectors из sites_config.json
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import urljoin
+
+import lxml.html
+from cssselect import GenericTranslator, SelectorError
+from lxml.etree import XPath
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые берутся текстом элемента; url/image - атрибутами
+TEXT_FIELDS = ("title", "price", "location", "bedrooms", "bathrooms", "area", "description")
+IMAGE_ATTRIBUTES = ("data-src", "data-lazy", "src")
+
+
+def compile_selector(css: str) -> XPath:
+    """
+    CSS -> скомпилированный XPath. cssselect поддерживает :contains('текст'),
+    который используют конфиги zonaprop и mercadolibre.
+    """
+    return XPath(GenericTranslator().css_to_xpath(css))
+
+
+def _text(element) -> str:
+    # Соседние inline-теги (<span>USD</span><span>120.000</span>) не склеиваем
+    return " ".join(" ".join(element.itertext()).split())
+
+
+class HTMLExtractor:
+    """
+    Селекторы сайта компилируются один раз; extract() разбирает страницу
+    выдачи lxml-парсером и возвращает карточки в том же виде, что и
+    extracted_content Crawl4AI (сырые строки, числа достаёт RegexExtractor).
+    """
+
+    def __init__(self, site_name: str, selectors: Dict[str, str]):
+        self.site_name = site_name
+        self._selectors: Dict[str, XPath] = {}
+        for field, css in selectors.items():
+            try:
+                self._selectors[field] = compile_selector(css)
+            except SelectorError as e:
+                logger.error(f"{site_name}: invalid selector for {field} ({css}): {e}")
+        if "property_container" not in self._selectors:
+            raise ValueError(f"{site_name}: selectors.property_container is required for native extraction")
+
+    def _first(self, field: str, card) -> Optional[object]:
+        selector = self._selectors.get(field)
+        if selector is None:
+            return None
+        found = selector(card)
+        return found[0] if found else None
+
+    def _url(self, card, base_url: str) -> Optional[str]:
+        element = self._first("url", card)
+        if element is None:
+            return None
+        href = element.get("href")
+        if href is None:
+            # Селектор попал в обёртку - берём первую ссылку внутри
+            links = element.xpath(".//a[@href]")
+            href = links[0].get("href") if links else None
+        return urljoin(base_url, href) if href else None
+
+    def _image(self, card, base_url: str) -> Optional[str]:
+        element = self._first("image", card)
+        if element is None:
+            return None
+        for attribute in IMAGE_ATTRIBUTES:
+            value = element.get(attribute)
+            if value and not value.startswith("data:"):
+                return urljoin(base_url, value)
+        return None
+
+    def extract(self, html: str, base_url: str) -> List[Dict]:
+        if not html or not html.strip():
+            return []
+        document = lxml.html.fromstring(html)
+        items = []
+        for card in self._selectors["property_container"](document):
+            item: Dict = {}
+            for field in TEXT_FIELDS:
+                element = self._first(field, card)
+                if element is not None:
+                    text = _text(element)
+                    if text:
+                        item[field] = text
+            url = self._url(card, base_url)
+            if url:
+                item["url"] = url
+            image = self._image(card, base_url)
+            if image:
+                item["photos"] = [image]
+            if item.get("url") or item.get("title"):
+                items.append(item)
+        return items
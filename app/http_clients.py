@@ -0,0 +1,236 @@
+# app/http_clients.py - Долгоживущие пулы HTTP соединений к внешним сервисам
+import asyncio
+import importlib.util
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import httpx
+
+from .metrics import (
+    HTTP_POOL_IN_FLIGHT,
+    HTTP_POOL_MAX,
+    HTTP_POOL_SATURATION,
+    HTTP_POOL_TIMEOUTS,
+    UPSTREAM_RETRIES,
+    UPSTREAM_RETRY_BUDGET_EXHAUSTED,
+)
+from .resilience import CircuitBreaker, RetryBudget, UpstreamUnavailable, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 включаем только если установлен h2
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Ответы, после которых имеет смысл повторить запрос
+RETRY_STATUSES = {429, 502, 503, 504}
+
+
+@dataclass
+class UpstreamConfig:
+    base_url: str
+    max_connections: int
+    timeout: float
+    max_keepalive_connections: Optional[int] = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    max_retries: int = 0
+    retry_budget_ratio: float = 0.2
+    backoff_base: float = 0.5
+    backoff_max: float = 10.0
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+
+@dataclass
+class PoolStats:
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    requests: int = 0
+    pool_timeouts: int = 0
+
+
+class HTTPClientRegistry:
+    """
+    Реестр именованных httpx.AsyncClient (crawl4ai, ollama, ...).
+    Клиенты открываются один раз в lifespan и переиспользуют соединения.
+    request()/stream() повторяют сбои в пределах бюджета и не ходят
+    в сервис, пока его circuit breaker разомкнут.
+    """
+
+    def __init__(self):
+        self._configs: Dict[str, UpstreamConfig] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, PoolStats] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._budgets: Dict[str, RetryBudget] = {}
+
+    def register(self, name: str, config: UpstreamConfig):
+        self._configs[name] = config
+        self._stats[name] = PoolStats()
+        self._breakers[name] = CircuitBreaker(name, config.failure_threshold, config.reset_timeout)
+        self._budgets[name] = RetryBudget(config.retry_budget_ratio)
+        HTTP_POOL_MAX.labels(upstream=name).set(config.max_connections)
+
+    async def open(self):
+        for name, config in self._configs.items():
+            if name in self._clients:
+                continue
+            self._clients[name] = httpx.AsyncClient(
+                base_url=config.base_url,
+                headers=config.headers,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=config.max_connections,
+                    max_keepalive_connections=config.max_keepalive_connections or config.max_connections,
+                ),
+                timeout=httpx.Timeout(config.timeout, connect=min(config.timeout, 10.0)),
+            )
+        logger.info(f"HTTP clients opened: {', '.join(self._clients)} (http2={HTTP2_AVAILABLE})")
+
+    async def close(self):
+        for name, client in self._clients.items():
+            await client.aclose()
+        self._clients.clear()
+        logger.info("HTTP clients closed")
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        if name not in self._clients:
+            raise RuntimeError(f"HTTP client '{name}' is not open")
+        return self._clients[name]
+
+    @asynccontextmanager
+    async def track(self, name: str):
+        """Учёт занятости пула вокруг запроса (в т.ч. стримингового)"""
+        stats = self._stats[name]
+        stats.in_flight += 1
+        stats.requests += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        self._export(name)
+        try:
+            yield self.get(name)
+        except httpx.PoolTimeout:
+            stats.pool_timeouts += 1
+            HTTP_POOL_TIMEOUTS.labels(upstream=name).inc()
+            raise
+        finally:
+            stats.in_flight -= 1
+            self._export(name)
+
+    def available(self, name: str) -> bool:
+        return self._breakers[name].available()
+
+    def ensure_available(self, name: str):
+        """Бросить UpstreamUnavailable сразу, не дожидаясь очереди к пулу"""
+        breaker = self._breakers[name]
+        if not breaker.available():
+            raise UpstreamUnavailable(name, breaker.retry_in())
+
+    def breakers(self) -> Dict[str, Dict]:
+        return {name: breaker.snapshot() for name, breaker in self._breakers.items()}
+
+    def _can_retry(self, name: str, attempt: int) -> bool:
+        if attempt >= self._configs[name].max_retries or not self.available(name):
+            return False
+        if not self._budgets[name].withdraw():
+            UPSTREAM_RETRY_BUDGET_EXHAUSTED.labels(upstream=name).inc()
+            return False
+        UPSTREAM_RETRIES.labels(upstream=name).inc()
+        return True
+
+    async def _backoff(self, name: str, attempt: int, reason: str):
+        config = self._configs[name]
+        delay = backoff_delay(attempt, config.backoff_base, config.backoff_max)
+        logger.warning(f"{name}: {reason}, retry #{attempt + 1} in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+    def _record_status(self, name: str, status_code: int):
+        if status_code >= 500:
+            self._breakers[name].record_failure(f"HTTP {status_code}")
+        else:
+            self._breakers[name].record_success()
+
+    async def request(self, name: str, method: str, url: str, **kwargs) -> httpx.Response:
+        breaker = self._breakers[name]
+        self._budgets[name].deposit()
+        attempt = 0
+        while True:
+            probe = breaker.before_call()
+            try:
+                async with self.track(name) as client:
+                    started = time.monotonic()
+                    response = await client.request(method, url, **kwargs)
+                    logger.debug(f"{name} {method} {url} -> {response.status_code} in {time.monotonic() - started:.2f}s")
+            except httpx.PoolTimeout:
+                # Нехватка своих соединений - не повод считать сервис упавшим
+                raise
+            except httpx.TransportError as e:
+                breaker.record_failure(type(e).__name__)
+                if not self._can_retry(name, attempt):
+                    raise
+                reason = type(e).__name__
+            else:
+                self._record_status(name, response.status_code)
+                if response.status_code not in RETRY_STATUSES or not self._can_retry(name, attempt):
+                    return response
+                reason = f"HTTP {response.status_code}"
+            finally:
+                breaker.release(probe)
+            await self._backoff(name, attempt, reason)
+            attempt += 1
+
+    @asynccontextmanager
+    async def stream(self, name: str, method: str, url: str, **kwargs):
+        """
+        Стриминговый запрос. Повторяется только до начала чтения тела:
+        то, что уже отдано потребителю, переиграть нельзя.
+        """
+        breaker = self._breakers[name]
+        self._budgets[name].deposit()
+        attempt = 0
+        while True:
+            probe = breaker.before_call()
+            streaming = False
+            try:
+                async with self.track(name) as client:
+                    async with client.stream(method, url, **kwargs) as response:
+                        if response.status_code in RETRY_STATUSES and self._can_retry(name, attempt):
+                            self._record_status(name, response.status_code)
+                            reason = f"HTTP {response.status_code}"
+                        else:
+                            streaming = True
+                            yield response
+                            self._record_status(name, response.status_code)
+                            return
+            except httpx.PoolTimeout:
+                raise
+            except httpx.TransportError as e:
+                breaker.record_failure(type(e).__name__)
+                if streaming or not self._can_retry(name, attempt):
+                    raise
+                reason = type(e).__name__
+            finally:
+                breaker.release(probe)
+            await self._backoff(name, attempt, reason)
+            attempt += 1
+
+    def _export(self, name: str):
+        stats = self._stats[name]
+        HTTP_POOL_IN_FLIGHT.labels(upstream=name).set(stats.in_flight)
+        HTTP_POOL_SATURATION.labels(upstream=name).set(
+            stats.in_flight / self._configs[name].max_connections
+        )
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            name: {
+                "in_flight": stats.in_flight,
+                "peak_in_flight": stats.peak_in_flight,
+                "max_connections": self._configs[name].max_connections,
+                "saturation": stats.in_flight / self._configs[name].max_connections,
+                "requests": stats.requests,
+                "pool_timeouts": stats.pool_timeouts,
+            }
+            for name, stats in self._stats.items()
+        }
@@ -0,0 +1,164 @@
+# app/job_queue.py - Распределённая очередь задач парсинга на Redis Streams
+import json
+import logging
+import os
+import socket
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScrapeJob:
+    id: str
+    site: str
+    search_keys: Optional[List[str]] = None
+    enqueued_at: Optional[str] = None
+    fields: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def from_entry(cls, entry_id: str, fields: Dict[str, str]) -> "ScrapeJob":
+        search_keys = fields.get("search_keys")
+        return cls(
+            id=entry_id,
+            site=fields.get("site", ""),
+            search_keys=json.loads(search_keys) if search_keys else None,
+            enqueued_at=fields.get("enqueued_at"),
+            fields=fields,
+        )
+
+
+class ScrapeJobQueue:
+    """
+    Задачи "спарсить сайт" в Redis Stream с consumer group:
+    - XREADGROUP выдаёт задачу одному воркеру;
+    - XACK подтверждает выполнение;
+    - задачи, зависшие дольше claim_idle_ms (воркер упал), забирает
+      XAUTOCLAIM другой воркер; после max_deliveries - в dead-letter stream.
+    Работает с любым redis.asyncio-совместимым клиентом (в т.ч. fakeredis).
+    """
+
+    def __init__(
+        self,
+        redis,
+        stream: str = None,
+        group: str = None,
+        consumer: str = None,
+        claim_idle_ms: int = None,
+        max_deliveries: int = None,
+    ):
+        self.redis = redis
+        self.stream = stream or settings.SCRAPE_QUEUE_STREAM
+        self.group = group or settings.SCRAPE_QUEUE_GROUP
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.claim_idle_ms = claim_idle_ms or settings.SCRAPE_QUEUE_CLAIM_IDLE_MS
+        self.max_deliveries = max_deliveries or settings.SCRAPE_QUEUE_MAX_DELIVERIES
+        self.dead_letter_stream = f"{self.stream}:dead"
+
+    @classmethod
+    def from_url(cls, url: str = None, **kwargs) -> "ScrapeJobQueue":
+        import redis.asyncio as aioredis
+
+        return cls(aioredis.from_url(url or settings.REDIS_URL, decode_responses=True), **kwargs)
+
+    async def close(self):
+        await self.redis.close()
+
+    async def ensure_group(self):
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except Exception as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def enqueue(self, site: str, search_keys: List[str] = None) -> str:
+        fields = {"site": site, "enqueued_at": datetime.utcnow().isoformat()}
+        if search_keys is not None:
+            fields["search_keys"] = json.dumps(search_keys)
+        return await self.redis.xadd(self.stream, fields, maxlen=settings.SCRAPE_QUEUE_MAXLEN, approximate=True)
+
+    async def enqueue_cycle(self, sites: List[str], interval_seconds: int) -> bool:
+        """
+        Поставить цикл по всем сайтам. Если API запущен в нескольких
+        процессах, цикл ставит только тот, кто взял блокировку на интервал.
+        """
+        locked = await self.redis.set(
+            f"{self.stream}:cycle_lock", self.consumer, nx=True, px=int(interval_seconds * 1000)
+        )
+        if not locked:
+            return False
+        for site in sites:
+            await self.enqueue(site)
+        logger.info(f"Enqueued scraping cycle for {len(sites)} sites")
+        return True
+
+    async def claim(self, count: int = 1, block_ms: int = 5000) -> List[ScrapeJob]:
+        """Сначала забираем зависшие задачи, потом - новые"""
+        jobs = await self._claim_stuck(count)
+        if jobs:
+            return jobs
+
+        response = await self.redis.xreadgroup(
+            self.group, self.consumer, {self.stream: ">"}, count=count, block=block_ms
+        )
+        return [
+            ScrapeJob.from_entry(entry_id, fields)
+            for _, entries in response or []
+            for entry_id, fields in entries
+            if fields is not None
+        ]
+
+    async def _claim_stuck(self, count: int) -> List[ScrapeJob]:
+        result = await self.redis.xautoclaim(
+            self.stream, self.group, self.consumer, min_idle_time=self.claim_idle_ms, start_id="0-0", count=count
+        )
+        # redis >= 7 возвращает [next_id, entries, deleted_ids]
+        entries = result[1] if len(result) > 1 else []
+
+        jobs = []
+        for entry_id, fields in entries:
+            if fields is None:
+                # Запись удалена из stream (MAXLEN) - подтверждаем и забываем
+                await self.redis.xack(self.stream, self.group, entry_id)
+                continue
+            job = ScrapeJob.from_entry(entry_id, fields)
+            deliveries = await self._deliveries(entry_id)
+            if deliveries > self.max_deliveries:
+                await self._dead_letter(job, deliveries)
+                continue
+            logger.warning(f"Reclaimed stuck job {entry_id} ({job.site}), delivery #{deliveries}")
+            jobs.append(job)
+        return jobs
+
+    async def _deliveries(self, entry_id: str) -> int:
+        pending = await self.redis.xpending_range(self.stream, self.group, min=entry_id, max=entry_id, count=1)
+        return pending[0]["times_delivered"] if pending else 1
+
+    async def _dead_letter(self, job: ScrapeJob, deliveries: int):
+        logger.error(f"Job {job.id} ({job.site}) failed {deliveries} deliveries, moving to {self.dead_letter_stream}")
+        await self.redis.xadd(
+            self.dead_letter_stream,
+            {**job.fields, "original_id": job.id, "deliveries": str(deliveries)},
+            maxlen=settings.SCRAPE_QUEUE_MAXLEN,
+            approximate=True,
+        )
+        await self.ack(job)
+
+    async def touch(self, job: ScrapeJob):
+        """Heartbeat: сбросить idle у своей задачи, чтобы её не забрали как зависшую"""
+        await self.redis.xclaim(self.stream, self.group, self.consumer, min_idle_time=0, message_ids=[job.id], justid=True)
+
+    async def ack(self, job: ScrapeJob):
+        await self.redis.xack(self.stream, self.group, job.id)
+
+    async def stats(self) -> Dict[str, int]:
+        info = await self.redis.xpending(self.stream, self.group)
+        return {
+            "length": await self.redis.xlen(self.stream),
+            "pending": info.get("pending", 0) if isinstance(info, dict) else 0,
+            "dead": await self.redis.xlen(self.dead_letter_stream),
+        }
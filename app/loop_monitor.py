@@ -0,0 +1,55 @@
+# app/loop_monitor.py - Задержка event loop (насколько опаздывают корутины)
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from .metrics import EVENT_LOOP_LAG
+
+logger = logging.getLogger(__name__)
+
+
+class EventLoopMonitor:
+    """
+    Засыпает на interval и меряет, насколько позже проснулся. Опоздание -
+    время, которое loop был занят синхронной работой: ровно столько же ждал
+    бы и любой запрос к API. Последние window замеров держим для stats().
+    """
+
+    def __init__(self, interval: float = 0.1, window: int = 600, warn_after: float = 0.5):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.samples = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag > self.warn_after:
+                logger.warning(f"Event loop blocked for {lag:.2f}s")
+
+    def stats(self) -> Dict[str, float]:
+        if not self.samples:
+            return {"samples": 0}
+        ordered = sorted(self.samples)
+        return {
+            "samples": len(ordered),
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
@@ -1,12 +1,20 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from prometheus_client import generate_latest
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
+from datetime import date
+from pydantic import BaseModel, Field
 import asyncio
 import logging
-from typing import List, Dict, Any
+import secrets
+from typing import List, Dict, Any, Optional
 
 from .scraper import PropertyScraper
+from .job_queue import ScrapeJobQueue
+from .loop_monitor import EventLoopMonitor
 from .models import Property, database
 from .config import settings
 
@@ -17,20 +25,37 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Property Scraper API...")
+    # Запросы к API ждут event loop вместе с парсингом - следим, не блокируется ли он
+    app.state.loop_monitor = EventLoopMonitor()
+    app.state.loop_monitor.start()
     await database.connect()
     
     # Инициализация таблиц
     #async with engine.begin() as conn:
         #await conn.run_sync(Property.metadata.create_all)
     
-    # Запуск фонового парсинга
+    # Запуск фонового парсинга (пулы соединений живут всё время работы API)
     scraper = PropertyScraper()
-    asyncio.create_task(scraper.start_continuous_scraping())
+    await scraper.start()
+    app.state.scraper = scraper
+    app.state.job_queue = None
+    if settings.SCRAPER_MODE == "queue":
+        # Парсят отдельные воркеры (python -m app.worker), API только ставит задачи
+        app.state.job_queue = ScrapeJobQueue.from_url()
+        scraping_task = asyncio.create_task(scraper.start_continuous_enqueue(app.state.job_queue))
+    else:
+        scraping_task = asyncio.create_task(scraper.start_continuous_scraping())
     
     yield
     
     # Shutdown
+    scraping_task.cancel()
+    await asyncio.gather(scraping_task, return_exceptions=True)
+    if app.state.job_queue:
+        await app.state.job_queue.close()
+    await scraper.close()
     await database.disconnect()
+    await app.state.loop_monitor.stop()
     logger.info("Property Scraper API stopped")
 
 app = FastAPI(
@@ -54,15 +79,26 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    # Открытая цепь к Crawl4AI/Ollama - сервис жив, но работает деградированно
+    upstreams = app.state.scraper.http.breakers()
+    degraded = any(info["state"] != "closed" for info in upstreams.values())
+    return {
+        "status": "degraded" if degraded else "ok",
+        "upstreams": upstreams,
+        "event_loop_lag": app.state.loop_monitor.stats(),
+    }
 
 @app.post("/scrape/{site_name}")
 async def scrape_site(site_name: str, background_tasks: BackgroundTasks):
-    scraper = PropertyScraper()
+    scraper = app.state.scraper
     
     if site_name not in scraper.sites_config:
         raise HTTPException(status_code=404, detail=f"Site {site_name} not configured")
     
+    if app.state.job_queue:
+        job_id = await app.state.job_queue.enqueue(site_name)
+        return {"message": f"Scraping {site_name} queued", "site": site_name, "job_id": job_id}
+    
     background_tasks.add_task(scraper.scrape_single_site, site_name)
     
     return {"message": f"Scraping {site_name} started", "site": site_name}
@@ -73,18 +109,40 @@ async def get_properties(
     offset: int = 0,
     site: str = None,
     min_price: float = None,
-    max_price: float = None
+    max_price: float = None,
+    min_price_usd: float = None,
+    max_price_usd: float = None,
+    neighborhood: str = None,
+    location: str = None
 ):
-    query = Property.select()
+    properties_table = Property.__table__
+    query = select(properties_table)
     
     if site:
-        query = query.where(Property.site == site)
+        query = query.where(properties_table.c.site == site)
     
+    # Баррио в любом написании ("Palermo Soho", "Nunez") -> равенство по neighborhood_id
+    area = neighborhood or location
+    if area:
+        neighborhood_id = app.state.scraper.neighborhoods.resolve(area)
+        if neighborhood_id:
+            query = query.where(properties_table.c.neighborhood_id == neighborhood_id)
+        else:
+            query = query.where(properties_table.c.location.ilike(f"%{area}%"))
+    
+    # min_price/max_price - в валюте объявления (ARS и USD вперемешку)
     if min_price:
-        query = query.where(Property.price >= min_price)
+        query = query.where(properties_table.c.price >= min_price)
     
     if max_price:
-        query = query.where(Property.price <= max_price)
+        query = query.where(properties_table.c.price <= max_price)
+    
+    # price_usd пересчитывается при смене курса - сравнимо между ARS и USD
+    if min_price_usd:
+        query = query.where(properties_table.c.price_usd >= min_price_usd)
+    
+    if max_price_usd:
+        query = query.where(properties_table.c.price_usd <= max_price_usd)
     
     query = query.limit(limit).offset(offset)
     
@@ -97,7 +155,31 @@ async def get_properties(
         "offset": offset
     }
 
-@app.get("/metrics")
+class ExchangeRateIn(BaseModel):
+    currency: str = Field(..., min_length=3, max_length=3)
+    units_per_usd: float = Field(..., gt=0)  # единиц валюты за 1 USD
+    rate_date: Optional[date] = None  # по умолчанию сегодня
+
+@app.post("/admin/exchange-rates")
+async def add_exchange_rates(rates: List[ExchangeRateIn], x_admin_token: Optional[str] = Header(None)):
+    # Без ADMIN_API_TOKEN админка закрыта: курс меняет price_usd всех объявлений
+    if not settings.ADMIN_API_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin API disabled: ADMIN_API_TOKEN is not set")
+    if not secrets.compare_digest(x_admin_token or "", settings.ADMIN_API_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    
+    exchange_rates = app.state.scraper.exchange_rates
+    recomputed = await exchange_rates.add([rate.dict() for rate in rates], source="admin")
+    
+    return {
+        "rates": {
+            currency: {"rate_date": rate_date.isoformat(), "units_per_usd": units_per_usd}
+            for currency, (rate_date, units_per_usd) in exchange_rates.rates.items()
+        },
+        "recomputed": recomputed
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
 async def get_metrics():
     total_properties = await database.fetch_val("SELECT COUNT(*) FROM properties")
     
@@ -107,7 +189,8 @@ async def get_metrics():
         f"properties_total {total_properties}"
     ]
     
-    return "\n".join(metrics)
+    # Метрики парсера (пулы соединений и т.д.) из prometheus_client
+    return "\n".join(metrics) + "\n" + generate_latest().decode()
 
 if __name__ == "__main__":
     import uvicorn
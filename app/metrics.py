@@ -0,0 +1,103 @@
+# app/metrics.py - Prometheus метрики парсера (отдаются через /metrics)
+from prometheus_client import Counter, Gauge, Histogram
+
+# HTTP пулы соединений к Crawl4AI / Ollama
+HTTP_POOL_IN_FLIGHT = Gauge(
+    "scraper_http_pool_in_flight", "Requests currently using the upstream pool", ["upstream"]
+)
+HTTP_POOL_MAX = Gauge(
+    "scraper_http_pool_max_connections", "Configured pool size per upstream", ["upstream"]
+)
+HTTP_POOL_SATURATION = Gauge(
+    "scraper_http_pool_saturation", "In-flight requests / pool size", ["upstream"]
+)
+HTTP_POOL_TIMEOUTS = Counter(
+    "scraper_http_pool_timeouts_total", "Requests that timed out waiting for a pooled connection", ["upstream"]
+)
+
+# Кеш LLM-извлечения
+AI_CACHE_HITS = Counter("scraper_ai_cache_hits_total", "Extraction cache hits", ["tier"])
+AI_CACHE_MISSES = Counter("scraper_ai_cache_misses_total", "Extraction cache misses (sent to the LLM)")
+
+# LLM-извлечение чанками
+AI_CHUNK_LATENCY = Histogram(
+    "scraper_ai_chunk_latency_seconds", "Ollama latency per extraction chunk",
+    buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+AI_ITEMS_PER_SECOND = Gauge("scraper_ai_items_per_second", "Extraction throughput of the last batch", ["site"])
+AI_ITEMS_EXTRACTED = Counter("scraper_ai_items_extracted_total", "Items extracted, by source", ["source"])
+
+# Конвейер crawl → extract → persist
+PIPELINE_QUEUE_DEPTH = Gauge("scraper_pipeline_queue_depth", "Items waiting in front of a stage", ["site", "stage"])
+PIPELINE_ITEMS = Counter("scraper_pipeline_items_total", "Items processed by a pipeline stage", ["site", "stage"])
+PIPELINE_THROUGHPUT = Gauge("scraper_pipeline_throughput", "Items per second through a stage", ["site", "stage"])
+
+# Адаптивный (AIMD) лимит запросов к сайтам
+SITE_CONCURRENCY_LIMIT = Gauge("scraper_site_concurrency_limit", "Current AIMD concurrency limit per site", ["site"])
+SITE_REQUEST_INTERVAL = Gauge("scraper_site_request_interval_seconds", "Current AIMD spacing between requests", ["site"])
+
+# Устойчивость к падениям Crawl4AI / Ollama
+UPSTREAM_CIRCUIT_STATE = Gauge(
+    "scraper_upstream_circuit_state", "Circuit breaker state: 0 closed, 1 half-open, 2 open", ["upstream"]
+)
+UPSTREAM_CIRCUIT_REJECTIONS = Counter(
+    "scraper_upstream_circuit_rejections_total", "Calls rejected because the circuit was open", ["upstream"]
+)
+UPSTREAM_RETRIES = Counter("scraper_upstream_retries_total", "Retried upstream calls", ["upstream"])
+UPSTREAM_RETRY_BUDGET_EXHAUSTED = Counter(
+    "scraper_upstream_retry_budget_exhausted_total", "Retries skipped because the retry budget was empty", ["upstream"]
+)
+
+# Пул прокси
+PROXY_HEALTH_SCORE = Gauge("scraper_proxy_health_score", "Proxy selection weight (success rate / latency)", ["proxy"])
+PROXY_QUARANTINED = Gauge("scraper_proxy_quarantined", "1 while the proxy is in cool-off", ["proxy"])
+PROXY_REQUESTS = Counter("scraper_proxy_requests_total", "Crawl requests by proxy and outcome", ["proxy", "outcome"])
+
+# Поиск дублей между сайтами
+DEDUP_INDEX_SIZE = Gauge("scraper_dedup_index_size", "Active listings in the in-memory MinHash index")
+DEDUP_LINKED = Counter("scraper_dedup_linked_total", "Listings linked to a canonical property", ["site"])
+
+# Итоги прохода по сайту (то же, что пишется в scraping_stats)
+SCRAPE_RUN_SECONDS = Histogram(
+    "scraper_run_seconds", "Per-run duration: total wall time and summed crawl/llm/db stage time",
+    ["site", "phase"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 1800, 3600),
+)
+SCRAPE_RUN_PAGES = Counter("scraper_run_pages_total", "Search result pages crawled", ["site"])
+SCRAPE_RUN_LISTINGS = Counter("scraper_run_listings_total", "Listings per run by kind (found/new/updated/removed)", ["site", "kind"])
+SCRAPE_RUN_ERRORS = Counter("scraper_run_errors_total", "Errors during scraping runs", ["site"])
+
+# Адаптивный перепарсинг лент
+RECRAWL_FEED_INTERVAL = Gauge("scraper_recrawl_feed_interval_seconds", "Current recrawl interval per search feed", ["site", "feed"])
+RECRAWL_FEED_RATE = Gauge("scraper_recrawl_feed_new_per_hour", "Observed new listings per hour per search feed", ["site", "feed"])
+RECRAWL_EXPECTED_DETECTION_SECONDS = Gauge(
+    "scraper_recrawl_expected_detection_seconds", "Rate-weighted mean delay before a new listing is crawled"
+)
+
+# CPU-bound разбор вне event loop
+CPU_POOL_TASK_SECONDS = Histogram(
+    "scraper_cpu_pool_task_seconds", "CPU-bound task time including IPC (parse_html/regex/signatures/geocode)",
+    ["task"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+EVENT_LOOP_LAG = Histogram(
+    "scraper_event_loop_lag_seconds", "How late the event loop wakes up a sleeping coroutine",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+# Офлайн-геокодер
+GEOCODE_RESULTS = Counter(
+    "scraper_geocode_results_total", "Geocoded addresses by precision (address/neighborhood/none)", ["precision"]
+)
+GEOCODE_CACHE_HITS = Counter("scraper_geocode_cache_hits_total", "Geocode cache hits by tier", ["tier"])
+
+# Пакетные задачи Crawl4AI (/crawl/job)
+CRAWL4AI_JOBS_IN_FLIGHT = Gauge("scraper_crawl4ai_jobs_in_flight", "Crawl4AI batch jobs submitted and not finished")
+CRAWL4AI_JOB_SECONDS = Histogram(
+    "scraper_crawl4ai_job_seconds", "Crawl4AI batch job time from submit to last result",
+    buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+
+# robots.txt
+ROBOTS_FETCHES = Counter("scraper_robots_fetches_total", "robots.txt fetches by outcome (ok/missing/error)", ["site", "outcome"])
+ROBOTS_DISALLOWED_PAGES = Counter("scraper_robots_disallowed_pages_total", "Pages skipped at planning as disallowed by robots.txt", ["site"])
@@ -1,10 +1,10 @@
 # app/models.py - Полные модели для системы парсинга недвижимости
 from sqlalchemy import (
-    Column, Integer, String, Text, DateTime, Boolean, 
+    Column, Integer, String, Text, Date, DateTime, Boolean, 
     ARRAY, JSON, Float, ForeignKey, Enum, Table,
     UniqueConstraint, Index
 )
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -113,6 +113,7 @@ class Property(Base):
     # Местоположение
     location = Column(String(200))
     neighborhood = Column(String(100))
+    neighborhood_id = Column(String(50))  # каноническое баррио (app/neighborhoods.py)
     address = Column(Text)
     latitude = Column(Float)
     longitude = Column(Float)
@@ -123,12 +124,12 @@ class Property(Base):
     url = Column(String(1000))
     
     # Медиа
-    images = Column(ARRAY(String))  # массив URL изображений
+    images = Column(JSONB)  # массив URL изображений (JSONB, как в init.sql)
     virtual_tour_url = Column(String(500))
     
     # Дополнительные характеристики
-    features = Column(ARRAY(String))  # гараж, терраса, лифт и т.д.
-    amenities = Column(ARRAY(String))  # удобства: бассейн, спортзал и т.д.
+    features = Column(JSONB)  # гараж, терраса, лифт и т.д.
+    amenities = Column(JSONB)  # удобства: бассейн, спортзал и т.д.
     floor = Column(String(20))
     total_floors = Column(Integer)
     building_age = Column(Integer)
@@ -137,6 +138,9 @@ class Property(Base):
     is_active = Column(Boolean, default=True)
     is_featured = Column(Boolean, default=False)
     views_count = Column(Integer, default=0)
+    missed_cycles = Column(Integer, default=0)  # обходов подряд, в которых объявления не было
+    # Тот же объект на другом сайте: id первого объявления группы (NULL - само каноническое)
+    canonical_id = Column(UUID(as_uuid=True), ForeignKey('properties.id', ondelete='SET NULL'))
     
     # Временные метки
     first_seen_at = Column(DateTime, default=func.now())
@@ -157,6 +161,9 @@ class Property(Base):
         UniqueConstraint('site', 'external_id', name='_site_external_id_uc'),
         Index('idx_property_search', 'price', 'bedrooms', 'neighborhood', 'property_type'),
         Index('idx_property_created', 'created_at'),
+        Index('idx_property_canonical', 'canonical_id'),
+        Index('idx_property_neighborhood_id', 'neighborhood_id', 'price_usd'),
+        Index('idx_property_price_usd', 'price_usd'),
     )
 
 
@@ -263,6 +270,30 @@ class PriceHistory(Base):
     property = relationship("Property", back_populates="price_history")
 
 
+class GeocodedAddress(Base):
+    __tablename__ = "geocoded_addresses"
+    
+    address_key = Column(Text, primary_key=True)  # нормализованный адрес (geocoder.normalize_address)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    precision = Column(String(20))  # address, neighborhood, none
+    neighborhood = Column(String(100))
+    gazetteer_version = Column(String(20), nullable=False)
+    
+    created_at = Column(DateTime, server_default=func.now())
+
+
+class ExchangeRate(Base):
+    __tablename__ = "exchange_rates"
+    
+    currency = Column(String(3), primary_key=True)
+    rate_date = Column(Date, primary_key=True)
+    units_per_usd = Column(Float, nullable=False)  # сколько единиц валюты за 1 USD
+    source = Column(String(50))  # file, admin
+    
+    created_at = Column(DateTime, server_default=func.now())
+
+
 class ScrapingStats(Base):
     __tablename__ = "scraping_stats"
     
@@ -280,6 +311,9 @@ class ScrapingStats(Base):
     
     # Производительность
     duration_seconds = Column(Integer)
+    crawl_seconds = Column(Float)  # суммарное время стадий: Crawl4AI
+    llm_seconds = Column(Float)  # Ollama
+    db_seconds = Column(Float)  # upsert'ы в Postgres
     errors_count = Column(Integer, default=0)
     success_rate = Column(Float)
     
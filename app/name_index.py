@@ -0,0 +1,123 @@
+# app/name_index.py - Префиксное дерево названий с нечётким поиском (улицы, баррио)
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from unidecode import unidecode
+
+NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+# Ключ значения в узле дерева (символы названий - только [a-z0-9 ])
+_VALUE = "$"
+
+
+def fold(value) -> str:
+    """'Av. Núñez  3°B' -> 'av nunez 3 b': без диакритики, регистра и пунктуации"""
+    if not value:
+        return ""
+    return NON_ALNUM_RE.sub(" ", unidecode(str(value)).lower()).strip()
+
+
+def max_typos(name: str) -> int:
+    """Сколько опечаток допускаем: в коротких названиях одна буква - это уже другое слово"""
+    length = len(name.replace(" ", ""))
+    if length <= 4:
+        return 0
+    return 1 if length <= 8 else 2
+
+
+class NameIndex:
+    """
+    Trie по свёрнутым (fold) названиям. get - точное совпадение,
+    longest_prefix - самое длинное название в начале списка слов,
+    fuzzy - ближайшее по Левенштейну в пределах max_distance: строки
+    DP-таблицы считаются по мере спуска, ветка отсекается, как только
+    минимум строки превысил порог.
+    """
+
+    def __init__(self):
+        self._root: Dict[str, Any] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, name: str, value: Any):
+        key = fold(name)
+        if not key:
+            return
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        if _VALUE not in node:
+            self._size += 1
+        # Первое добавленное значение приоритетнее (официальное название до алиасов)
+        node.setdefault(_VALUE, value)
+
+    def get(self, key: str) -> Optional[Any]:
+        node = self._root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node.get(_VALUE)
+
+    def longest_prefix(self, tokens: List[str]) -> Optional[Tuple[Any, int]]:
+        """(значение, сколько слов заняло название) для самого длинного совпадения с начала"""
+        node = self._root
+        best = None
+        for position, token in enumerate(tokens):
+            if position:
+                node = node.get(" ")
+                if node is None:
+                    break
+            for char in token:
+                node = node.get(char)
+                if node is None:
+                    return best
+            if _VALUE in node:
+                best = (node[_VALUE], position + 1)
+        return best
+
+    def fuzzy(self, key: str, max_distance: int) -> Optional[Tuple[Any, int]]:
+        """(значение, расстояние) ближайшего названия; при равенстве - первое найденное"""
+        if max_distance <= 0:
+            value = self.get(key)
+            return (value, 0) if value is not None else None
+
+        best: List = [None, max_distance + 1]
+        first_row = list(range(len(key) + 1))
+        columns = range(1, len(key) + 1)
+
+        def walk(node: Dict[str, Any], previous: List[int]):
+            for char, child in node.items():
+                if char == _VALUE:
+                    continue
+                # Без вызовов min() в цикле: это самое горячее место геокодера
+                left = lowest = previous[0] + 1
+                row = [left]
+                for column in columns:
+                    cost = previous[column - 1] + (key[column - 1] != char)
+                    above = previous[column] + 1
+                    if above < cost:
+                        cost = above
+                    if left + 1 < cost:
+                        cost = left + 1
+                    if cost < lowest:
+                        lowest = cost
+                    row.append(cost)
+                    left = cost
+                if _VALUE in child and left < best[1]:
+                    best[0], best[1] = child[_VALUE], left
+                if lowest < best[1]:
+                    walk(child, row)
+
+        walk(self._root, first_row)
+        return (best[0], best[1]) if best[0] is not None else None
+
+    def lookup(self, key: str) -> Optional[Any]:
+        """Точное совпадение, иначе нечёткое с порогом по длине названия"""
+        value = self.get(key)
+        if value is not None:
+            return value
+        found = self.fuzzy(key, max_typos(key))
+        return found[0] if found else None
@@ -0,0 +1,77 @@
+# app/neighborhoods.py - Канонические баррио: сырое название с сайта -> neighborhood_id
+from functools import lru_cache
+from typing import Dict, Iterable, Optional
+
+from .geocoder import Gazetteer
+from .name_index import NameIndex, fold
+
+
+def neighborhood_id(name: str) -> str:
+    """'Villa Crespo' -> 'villa_crespo' (как callback_data в боте)"""
+    return fold(name).replace(" ", "_")
+
+
+class NeighborhoodIndex:
+    """
+    Сводит написания баррио с разных порталов ("Palermo Soho", "Nuñez",
+    "Villa Crick") к одному id. Источники: neighborhoods и neighborhood_aliases
+    из sites_config.json, затем справочник геокодера. Разбор сырой строки:
+    точное совпадение сегмента, название внутри сегмента (префикс в trie),
+    и только потом нечёткий поиск с опечатками. Результаты кешируются:
+    одних и тех же строк на порталах немного.
+    """
+
+    def __init__(self, cache_size: int = 10000):
+        self.names: Dict[str, str] = {}  # id -> каноническое название
+        self._index = NameIndex()
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def add(self, name: str, aliases: Iterable[str] = ()):
+        # Алиас, уже закреплённый за другим баррио, не переопределяется (первый выигрывает)
+        canonical = self._index.get(fold(name)) or neighborhood_id(name)
+        self.names.setdefault(canonical, name)
+        for value in [name, *aliases]:
+            self._index.add(value, canonical)
+
+    @classmethod
+    def from_config(cls, config: Dict, gazetteer: Optional[Gazetteer] = None) -> "NeighborhoodIndex":
+        index = cls()
+        for name, aliases in config.get("neighborhood_aliases", {}).items():
+            index.add(name, aliases)
+        for names in config.get("neighborhoods", {}).values():
+            for name in names:
+                index.add(name)
+        if gazetteer:
+            for name, aliases in gazetteer.neighborhood_aliases.items():
+                index.add(name, aliases)
+        return index
+
+    def _resolve(self, text: Optional[str]) -> Optional[str]:
+        if not text:
+            return None
+        segments = [segment for segment in (fold(part) for part in str(text).split(",")) if segment]
+        for segment in segments:
+            found = self._index.get(segment)
+            if found:
+                return found
+        for segment in segments:
+            words = segment.split()
+            for start in range(len(words)):
+                found = self._index.longest_prefix(words[start:])
+                if found:
+                    return found[0]
+        for segment in segments:
+            # Сегмент с цифрами - адрес, а не название баррио
+            if not any(char.isdigit() for char in segment):
+                found = self._index.lookup(segment)
+                if found:
+                    return found
+        return None
+
+    def resolve_row(self, row: Dict) -> Optional[str]:
+        """neighborhood, затем location, затем address строки properties"""
+        for field in ("neighborhood", "location", "address"):
+            found = self.resolve(row.get(field))
+            if found:
+                return found
+        return None
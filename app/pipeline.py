@@ -0,0 +1,197 @@
+# app/pipeline.py - Конвейер crawl → extract → persist с ограниченными очередями
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .crawl_planner import CrawlJob, CrawlPlanner
+from .metrics import PIPELINE_ITEMS, PIPELINE_QUEUE_DEPTH, PIPELINE_THROUGHPUT
+from .storage import PropertyWriter, UpsertResult
+
+logger = logging.getLogger(__name__)
+
+# Маркер конца потока для воркеров стадии
+_DONE = object()
+
+CrawlPage = Callable[[CrawlJob], Awaitable[List[Dict]]]
+CrawlBatch = Callable[[List[CrawlJob]], AsyncIterator[Tuple[CrawlJob, List[Dict]]]]
+Extract = Callable[..., Awaitable[List[Dict]]]
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    processed: int = 0
+    errors: int = 0
+    busy_seconds: float = 0.0
+    started_at: float = field(default_factory=time.monotonic)
+    error_messages: List[str] = field(default_factory=list)
+
+    def record_error(self, message: str, keep: int = 10):
+        self.errors += 1
+        if len(self.error_messages) < keep:
+            self.error_messages.append(message)
+
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self.started_at
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+
+@dataclass
+class PipelineResult:
+    records: List[Dict]
+    saved: UpsertResult
+    stages: Dict[str, StageStats]
+    duration_seconds: float = 0.0
+    db_seconds: float = 0.0  # время upsert'ов в Postgres (внутри persist)
+
+
+class ScrapePipeline:
+    """
+    Три стадии со своими пулами воркеров, связанные ограниченными очередями.
+    Пока Ollama занят, страницы копятся в очереди extract; когда она заполнена,
+    краулер ждёт (backpressure), а БД пишет уже готовые записи параллельно.
+    """
+
+    def __init__(
+        self,
+        planner: CrawlPlanner,
+        crawl_page: CrawlPage,
+        extract: Extract,
+        writer: PropertyWriter,
+        extract_workers: int,
+        persist_workers: int,
+        queue_size: int,
+        crawl_batch: Optional[CrawlBatch] = None,
+        batch_size: int = 20,
+        max_batches: int = 2,
+    ):
+        self.planner = planner
+        self.crawl_page = crawl_page
+        self.extract = extract
+        self.writer = writer
+        self.extract_workers = max(1, extract_workers)
+        self.persist_workers = max(1, persist_workers)
+        self.queue_size = max(1, queue_size)
+        self.crawl_batch = crawl_batch
+        self.batch_size = max(1, batch_size)
+        self.max_batches = max(1, max_batches)
+
+    async def run(self, site_name: str, jobs: List[CrawlJob], batched: bool = False) -> PipelineResult:
+        """batched=True - страницы уходят в crawl_batch пачками, а не по одной в crawl_page"""
+        batched = batched and self.crawl_batch is not None
+        started_at = time.monotonic()
+        extract_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        persist_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size * self.writer.batch_size)
+        stages = {
+            "crawl": StageStats("crawl", self.max_batches if batched else self.planner.max_workers),
+            "extract": StageStats("extract", self.extract_workers),
+            "persist": StageStats("persist", self.persist_workers),
+        }
+        queues = {"extract": extract_queue, "persist": persist_queue}
+        records: List[Dict] = []
+
+        def observe(stage: str, items: int, busy: float):
+            stats = stages[stage]
+            stats.processed += items
+            stats.busy_seconds += busy
+            PIPELINE_ITEMS.labels(site=site_name, stage=stage).inc(items)
+            PIPELINE_THROUGHPUT.labels(site=site_name, stage=stage).set(stats.throughput())
+            for name, queue in queues.items():
+                PIPELINE_QUEUE_DEPTH.labels(site=site_name, stage=name).set(queue.qsize())
+
+        async def on_page(job: CrawlJob, items: List[Dict]):
+            observe("crawl", 1, 0.0)
+            if items:
+                # Блокируется, если extract не успевает - краулер притормаживает
+                await extract_queue.put(items)
+
+        async def crawl_page(job: CrawlJob) -> List[Dict]:
+            started = time.monotonic()
+            try:
+                return await self.crawl_page(job)
+            finally:
+                stages["crawl"].busy_seconds += time.monotonic() - started
+
+        async def crawl_batch(batch: List[CrawlJob]):
+            # Время ожидания страниц, без on_page (он может ждать очередь extract)
+            async with aclosing(self.crawl_batch(batch)) as results:
+                while True:
+                    started = time.monotonic()
+                    try:
+                        page = await results.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        stages["crawl"].busy_seconds += time.monotonic() - started
+                    yield page
+
+        def on_crawl_error(job: CrawlJob, error: Exception):
+            stages["crawl"].record_error(f"{job.url}: {error}")
+
+        async def extract_worker():
+            while True:
+                items = await extract_queue.get()
+                if items is _DONE:
+                    return
+                started = time.monotonic()
+                try:
+                    await self.extract(items, site_name, on_record=persist_queue.put)
+                except Exception as e:
+                    stages["extract"].record_error(str(e))
+                    logger.error(f"Extract stage error for {site_name}: {e}")
+                observe("extract", len(items), time.monotonic() - started)
+
+        async def persist_worker(batch):
+            while True:
+                record = await persist_queue.get()
+                if record is _DONE:
+                    return
+                started = time.monotonic()
+                try:
+                    await batch.add(record)
+                    records.append(record)
+                except Exception as e:
+                    stages["persist"].record_error(str(e))
+                    logger.error(f"Persist stage error for {site_name}: {e}")
+                observe("persist", 1, time.monotonic() - started)
+
+        async with self.writer.batch(site_name) as batch:
+            extractors = [asyncio.create_task(extract_worker()) for _ in range(self.extract_workers)]
+            persisters = [asyncio.create_task(persist_worker(batch)) for _ in range(self.persist_workers)]
+            try:
+                if batched:
+                    await self.planner.run_batches(
+                        jobs, crawl_batch, on_page=on_page, on_error=on_crawl_error,
+                        batch_size=self.batch_size, max_batches=self.max_batches,
+                    )
+                else:
+                    await self.planner.run(jobs, crawl_page, on_page=on_page, on_error=on_crawl_error)
+
+                for _ in extractors:
+                    await extract_queue.put(_DONE)
+                await asyncio.gather(*extractors)
+
+                for _ in persisters:
+                    await persist_queue.put(_DONE)
+                await asyncio.gather(*persisters)
+            finally:
+                for task in extractors + persisters:
+                    task.cancel()
+                await asyncio.gather(*extractors, *persisters, return_exceptions=True)
+
+        for stats in stages.values():
+            logger.info(
+                f"Pipeline {site_name}/{stats.name}: {stats.processed} items, "
+                f"{stats.throughput():.1f}/s, busy {stats.busy_seconds:.1f}s, {stats.errors} errors"
+            )
+        return PipelineResult(
+            records=records,
+            saved=batch.result,
+            stages=stages,
+            duration_seconds=time.monotonic() - started_at,
+            db_seconds=batch.db_seconds,
+        )
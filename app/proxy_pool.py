@@ -0,0 +1,184 @@
+# app/proxy_pool.py - Пул прокси для краулинга с оценкой здоровья
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .config import settings
+from .metrics import PROXY_HEALTH_SCORE, PROXY_QUARANTINED, PROXY_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# Ответы портала, которые говорят о проблеме с выходным IP
+PROXY_FAILURE_STATUSES = {403, 407, 429}
+
+
+def crawl_succeeded(result: Dict[str, Any]) -> bool:
+    """Исход запроса через прокси по результату Crawl4AI"""
+    status_code = result.get("status_code")
+    if status_code in PROXY_FAILURE_STATUSES or (status_code or 0) >= 500:
+        return False
+    return bool(result.get("success", True))
+
+
+def normalize_proxy(proxy: str) -> str:
+    """'host:port' -> 'http://host:port'; полные URL оставляем как есть"""
+    return proxy if "://" in proxy else f"http://{proxy}"
+
+
+@dataclass
+class ProxyState:
+    server: str
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    latency: Optional[float] = None  # EWMA, секунды
+    in_flight: int = 0
+    quarantined_until: float = 0.0
+
+    @property
+    def label(self) -> str:
+        # В метках метрик - только host:port, без логина/пароля
+        return urlsplit(self.server).netloc.rpartition("@")[2]
+
+    def score(self, latency_reference: float) -> float:
+        """Доля успехов (со сглаживанием) с поправкой на латентность и текущую загрузку"""
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        latency_penalty = 1 + (self.latency or latency_reference) / latency_reference
+        return success_rate / latency_penalty / (1 + self.in_flight)
+
+    def quarantined(self, now: float) -> bool:
+        return now < self.quarantined_until
+
+
+class ProxyPool:
+    """
+    Выдаёт прокси под задачи краулинга: случайный выбор, взвешенный по
+    здоровью (успешность, латентность, сколько запросов уже идёт через прокси).
+    После quarantine_after ошибок подряд прокси уходит на cool_off секунд;
+    после карантина одной ошибки достаточно, чтобы вернуть его обратно.
+    Сайт может ограничиться своим подмножеством через "proxies" в sites_config.json.
+    """
+
+    def __init__(
+        self,
+        proxies: List[str],
+        site_pins: Dict[str, List[str]] = None,
+        username: str = "",
+        password: str = "",
+        quarantine_after: int = 3,
+        cool_off: float = 300.0,
+        latency_reference: float = 5.0,
+    ):
+        self.proxies = {normalize_proxy(p): ProxyState(normalize_proxy(p)) for p in proxies}
+        self.site_pins = {
+            site: [normalize_proxy(p) for p in pinned]
+            for site, pinned in (site_pins or {}).items()
+        }
+        self.username = username
+        self.password = password
+        self.quarantine_after = max(1, quarantine_after)
+        self.cool_off = cool_off
+        self.latency_reference = latency_reference
+        for state in self.proxies.values():
+            self._export(state)
+
+    @classmethod
+    def from_config(cls, proxy_settings: Dict[str, Any], sites_config: Dict[str, Dict]) -> Optional["ProxyPool"]:
+        """Пул из Settings (USE_PROXY/PROXY_LIST) и proxy_settings; None если прокси выключены"""
+        if not (settings.USE_PROXY or proxy_settings.get("enabled")):
+            return None
+        proxies = settings.PROXY_LIST or proxy_settings.get("providers", [])
+        if not proxies:
+            logger.warning("Proxy usage enabled but no proxies configured")
+            return None
+
+        auth = proxy_settings.get("authentication", {})
+        pool = cls(
+            proxies,
+            site_pins={
+                name: config["proxies"] for name, config in sites_config.items() if config.get("proxies")
+            },
+            username=auth.get("username", ""),
+            password=auth.get("password", ""),
+            quarantine_after=proxy_settings.get("quarantine_after_failures", 3),
+            cool_off=proxy_settings.get("cool_off_seconds", 300),
+        )
+        logger.info(f"Proxy pool: {len(pool.proxies)} proxies, {len(pool.site_pins)} pinned sites")
+        return pool
+
+    def _candidates(self, site: str) -> List[ProxyState]:
+        pinned = self.site_pins.get(site)
+        if pinned:
+            return [self.proxies[p] for p in pinned if p in self.proxies]
+        return list(self.proxies.values())
+
+    def acquire(self, site: str) -> Optional[ProxyState]:
+        now = time.monotonic()
+        candidates = []
+        for proxy in self._candidates(site):
+            if proxy.quarantined(now):
+                continue
+            if proxy.quarantined_until:
+                proxy.quarantined_until = 0.0
+                logger.info(f"Proxy {proxy.label} back from quarantine")
+                self._export(proxy)
+            candidates.append(proxy)
+        if not candidates:
+            logger.warning(f"{site}: all proxies are quarantined, crawling without proxy")
+            return None
+        weights = [p.score(self.latency_reference) for p in candidates]
+        proxy = random.choices(candidates, weights=weights)[0]
+        proxy.in_flight += 1
+        return proxy
+
+    def release(self, proxy: Optional[ProxyState], success: Optional[bool], latency: float = 0.0):
+        """success=None - исход не зависит от прокси (ошибка на нашей стороне)"""
+        if proxy is None:
+            return
+        proxy.in_flight -= 1
+        if success is None:
+            return
+
+        if success:
+            proxy.successes += 1
+            proxy.consecutive_failures = 0
+            proxy.latency = latency if proxy.latency is None else 0.8 * proxy.latency + 0.2 * latency
+            PROXY_REQUESTS.labels(proxy=proxy.label, outcome="success").inc()
+        else:
+            proxy.failures += 1
+            proxy.consecutive_failures += 1
+            PROXY_REQUESTS.labels(proxy=proxy.label, outcome="failure").inc()
+            if proxy.consecutive_failures >= self.quarantine_after:
+                proxy.quarantined_until = time.monotonic() + self.cool_off
+                # После карантина прокси получает один шанс
+                proxy.consecutive_failures = self.quarantine_after - 1
+                logger.warning(f"Proxy {proxy.label} quarantined for {self.cool_off:.0f}s")
+        self._export(proxy)
+
+    def crawler_proxy_config(self, proxy: ProxyState) -> Dict[str, str]:
+        """proxy_config для Crawl4AI"""
+        config = {"server": proxy.server}
+        if self.username:
+            config["username"] = self.username
+            config["password"] = self.password
+        return config
+
+    def _export(self, proxy: ProxyState):
+        PROXY_HEALTH_SCORE.labels(proxy=proxy.label).set(proxy.score(self.latency_reference))
+        PROXY_QUARANTINED.labels(proxy=proxy.label).set(int(proxy.quarantined(time.monotonic())))
+
+    def stats(self) -> Dict[str, Dict]:
+        now = time.monotonic()
+        return {
+            proxy.label: {
+                "score": round(proxy.score(self.latency_reference), 3),
+                "successes": proxy.successes,
+                "failures": proxy.failures,
+                "latency": proxy.latency,
+                "quarantined": proxy.quarantined(now),
+            }
+            for proxy in self.proxies.values()
+        }
@@ -0,0 +1,175 @@
+# app/recrawl.py - Адаптивный график перепарсинга лент поиска (search_urls)
+import heapq
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import RECRAWL_EXPECTED_DETECTION_SECONDS, RECRAWL_FEED_INTERVAL, RECRAWL_FEED_RATE
+
+logger = logging.getLogger(__name__)
+
+FeedKey = Tuple[str, str]  # (site, search_key)
+
+
+@dataclass
+class FeedState:
+    site: str
+    search_key: str
+    rate: Optional[float] = None  # EWMA новых объявлений в час
+    interval: float = 0.0
+    last_crawled: Optional[float] = None
+    next_due: float = 0.0
+
+
+class RecrawlScheduler:
+    """
+    Очередь лент по времени следующего обхода. Бюджет фиксирован: в среднем
+    столько же обходов лент, сколько при обходе всех лент раз в interval_seconds.
+    Бюджет делится пропорционально sqrt(частоты новых объявлений) - при
+    пуассоновском потоке это минимизирует среднее время до обнаружения
+    нового объявления. Интервал каждой ленты ограничен [min_interval, max_interval].
+    """
+
+    def __init__(
+        self,
+        sites_config: Dict[str, Dict],
+        interval_seconds: float,
+        min_interval: float,
+        max_interval: float,
+        smoothing: float = 0.3,
+        now: float = None,
+    ):
+        self.interval_seconds = interval_seconds
+        self.min_interval = min(min_interval, interval_seconds)
+        self.max_interval = max(max_interval, interval_seconds)
+        self.smoothing = smoothing
+        self.feeds: Dict[FeedKey, FeedState] = {
+            (site, key): FeedState(site, key, interval=interval_seconds)
+            for site, config in sites_config.items()
+            for key in config.get("search_urls", {})
+        }
+        # Обходов лент в секунду - как у фиксированного цикла
+        self.budget = len(self.feeds) / interval_seconds if self.feeds else 0.0
+
+        # Все ленты сайта, успешно обойдённые с последней проверки пропавших
+        self._round: Dict[str, Dict[str, datetime]] = {}
+
+        now = time.monotonic() if now is None else now
+        self._heap: List[Tuple[float, FeedKey]] = [(now, key) for key in self.feeds]
+        heapq.heapify(self._heap)
+
+    def _weights(self) -> Dict[FeedKey, float]:
+        observed = [feed.rate for feed in self.feeds.values() if feed.rate is not None]
+        # Ещё не измеренные ленты считаем средними
+        prior = sum(observed) / len(observed) if observed else 1.0
+        return {
+            key: math.sqrt((feed.rate if feed.rate is not None else prior) + 0.01)
+            for key, feed in self.feeds.items()
+        }
+
+    def _rebalance(self):
+        """Интервалы лент под бюджет: 1/T_i ~ sqrt(rate_i), с учётом ограничений"""
+        weights = self._weights()
+        fixed: Dict[FeedKey, float] = {}
+        while True:
+            free = [key for key in self.feeds if key not in fixed]
+            if not free:
+                break
+            remaining = self.budget - sum(1 / interval for interval in fixed.values())
+            total = sum(weights[key] for key in free)
+            clamped = False
+            for key in free:
+                interval = total / (remaining * weights[key]) if remaining > 0 else self.max_interval
+                if interval < self.min_interval or interval > self.max_interval:
+                    fixed[key] = min(max(interval, self.min_interval), self.max_interval)
+                    clamped = True
+            if not clamped:
+                for key in free:
+                    fixed[key] = total / (remaining * weights[key])
+                break
+
+        for key, interval in fixed.items():
+            self.feeds[key].interval = interval
+        self._export()
+
+    def pop_due(self, now: float = None) -> Dict[str, List[str]]:
+        """Ленты, которым пора в обход, сгруппированные по сайту"""
+        now = time.monotonic() if now is None else now
+        due: Dict[str, List[str]] = {}
+        while self._heap and self._heap[0][0] <= now:
+            _, (site, key) = heapq.heappop(self._heap)
+            due.setdefault(site, []).append(key)
+        return due
+
+    def seconds_until_next(self, now: float = None) -> float:
+        if not self._heap:
+            return self.interval_seconds
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._heap[0][0] - now)
+
+    def record(
+        self,
+        site: str,
+        search_key: str,
+        new_listings: int,
+        started_at: datetime,
+        complete: bool,
+        now: float = None,
+    ) -> Optional[datetime]:
+        """
+        Учесть обход ленты и поставить её обратно в очередь.
+        Возвращает seen_since для проверки пропавших, когда все ленты сайта
+        успешно обойдены с прошлой проверки, иначе None.
+        """
+        now = time.monotonic() if now is None else now
+        feed = self.feeds.get((site, search_key))
+        if feed is None:
+            return None
+        if feed.last_crawled is not None and complete:
+            hours = max(now - feed.last_crawled, 1.0) / 3600
+            observed = new_listings / hours
+            feed.rate = observed if feed.rate is None else (
+                self.smoothing * observed + (1 - self.smoothing) * feed.rate
+            )
+        feed.last_crawled = now
+
+        self._rebalance()
+        feed.next_due = now + feed.interval
+        heapq.heappush(self._heap, (feed.next_due, (site, search_key)))
+
+        if not complete:
+            return None
+        site_round = self._round.setdefault(site, {})
+        site_round.setdefault(search_key, started_at)
+        if any(s == site and key not in site_round for s, key in self.feeds):
+            return None
+        # Объявление, не виденное с начала самого раннего из последних обходов,
+        # не нашлось ни в одной ленте сайта
+        seen_since = min(site_round.values())
+        del self._round[site]
+        return seen_since
+
+    def _export(self):
+        weighted_delay = total_rate = 0.0
+        for feed in self.feeds.values():
+            labels = dict(site=feed.site, feed=feed.search_key)
+            RECRAWL_FEED_INTERVAL.labels(**labels).set(feed.interval)
+            if feed.rate is not None:
+                RECRAWL_FEED_RATE.labels(**labels).set(feed.rate)
+                # Новое объявление ждёт в среднем половину интервала ленты
+                weighted_delay += feed.rate * feed.interval / 2
+                total_rate += feed.rate
+        if total_rate:
+            RECRAWL_EXPECTED_DETECTION_SECONDS.set(weighted_delay / total_rate)
+
+    def stats(self) -> Dict[str, Dict]:
+        return {
+            f"{feed.site}/{feed.search_key}": {
+                "new_per_hour": round(feed.rate, 2) if feed.rate is not None else None,
+                "interval_seconds": round(feed.interval),
+            }
+            for feed in self.feeds.values()
+        }
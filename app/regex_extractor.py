@@ -0,0 +1,150 @@
+# app/regex_extractor.py - Детерминированное извлечение цены/площади/комнат по data_processing
+import logging
+import re
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Поля, которые заполняет regex; при слиянии с LLM они приоритетнее
+REGEX_FIELDS = ("price_usd", "price_ars", "area", "bedrooms", "bathrooms")
+
+# 1.200.000 / 1,200,000 - разделители тысяч; 45,5 / 45.5 - десятичная часть
+THOUSANDS_RE = re.compile(r"^\d{1,3}(?:([.,])\d{3})(?:\1\d{3})*$")
+
+
+def parse_number(raw: str) -> Optional[float]:
+    """Число в аргентинском или американском формате"""
+    raw = raw.strip().strip(".,")
+    if not raw:
+        return None
+    if THOUSANDS_RE.match(raw):
+        return float(re.sub(r"[.,]", "", raw))
+    if "," in raw and "." in raw:
+        # Последний разделитель - десятичный
+        decimal = "," if raw.rfind(",") > raw.rfind(".") else "."
+        thousands = "." if decimal == "," else ","
+        raw = raw.replace(thousands, "").replace(decimal, ".")
+    else:
+        raw = raw.replace(",", ".")
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def item_text(item: Dict) -> str:
+    """Весь текст сырого объявления одной строкой"""
+    parts: List[str] = []
+
+    def walk(value: Any):
+        if isinstance(value, str):
+            parts.append(value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            parts.append(str(value))
+        elif isinstance(value, dict):
+            for nested in value.values():
+                walk(nested)
+        elif isinstance(value, list):
+            for nested in value:
+                walk(nested)
+
+    walk(item)
+    return " | ".join(parts)
+
+
+class RegexExtractor:
+    """
+    Паттерны из data_processing компилируются один раз при загрузке конфига.
+    Заполняет price_usd / price_ars, area, bedrooms и bathrooms, не трогая
+    поля, которые уже есть в сыром объявлении.
+    """
+
+    def __init__(self, data_processing: Dict):
+        price_patterns = data_processing.get("price_patterns", {})
+        self.dollar = self._compile(price_patterns.get("dollar", []))
+        self.peso = self._compile(price_patterns.get("peso", []))
+        self.area = self._compile(data_processing.get("area_patterns", []))
+        self.rooms = self._compile(data_processing.get("room_patterns", []))
+        self.bathrooms = self._compile(data_processing.get("bathroom_patterns", []))
+
+    @staticmethod
+    def _compile(patterns: List[str]) -> List[Pattern]:
+        compiled = []
+        for pattern in patterns:
+            try:
+                compiled.append(re.compile(pattern, re.IGNORECASE))
+            except re.error as e:
+                logger.error(f"Invalid data_processing pattern {pattern!r}: {e}")
+        return compiled
+
+    @staticmethod
+    def _search(patterns: List[Pattern], text: str) -> Optional[float]:
+        for pattern in patterns:
+            for match in pattern.finditer(text):
+                value = parse_number(match.group(1))
+                if value is not None:
+                    return value
+        return None
+
+    def extract(self, item: Dict) -> Dict:
+        record = dict(item)
+        text = item_text(item)
+        # CSS-селекторы отдают сырой текст ("66 m² totales") - такие поля разбираем заново
+        for field in ("area", "bedrooms", "bathrooms"):
+            if isinstance(record.get(field), str):
+                del record[field]
+
+        if not record.get("price_usd") and not record.get("price_ars"):
+            usd = self._search(self.dollar, text)
+            if usd:
+                record["price_usd"] = usd
+            else:
+                # "$" встречается и внутри "U$S", поэтому песо ищем только без доллара
+                ars = self._search(self.peso, text)
+                if ars:
+                    record["price_ars"] = ars
+
+        if not record.get("area"):
+            area = self._search(self.area, text)
+            if area:
+                record["area"] = area
+
+        if record.get("bedrooms") is None:
+            bedrooms = self._search(self.rooms, text)
+            if bedrooms is not None:
+                record["bedrooms"] = int(bedrooms)
+
+        if record.get("bathrooms") is None:
+            bathrooms = self._search(self.bathrooms, text)
+            if bathrooms is not None:
+                record["bathrooms"] = int(bathrooms)
+
+        return record
+
+    @staticmethod
+    def missing_fields(record: Dict) -> List[str]:
+        missing = []
+        if not record.get("price_usd") and not record.get("price_ars"):
+            missing.append("price")
+        if not record.get("area"):
+            missing.append("area")
+        for field in ("bedrooms", "bathrooms"):
+            if record.get(field) is None:
+                missing.append(field)
+        return missing
+
+    def split(self, items: List[Dict]) -> Tuple[List[Dict], List[Tuple[int, Dict]]]:
+        """
+        Прогоняет все объявления через regex. Возвращает записи в исходном
+        порядке и список (индекс, запись) тех, кому ещё нужен LLM.
+        """
+        records: List[Dict] = []
+        incomplete: List[Tuple[int, Dict]] = []
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            record = self.extract(item)
+            if self.missing_fields(record):
+                incomplete.append((len(records), record))
+            records.append(record)
+        return records, incomplete
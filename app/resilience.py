@@ -0,0 +1,134 @@
+# app/resilience.py - Повторы с бюджетом и circuit breaker для внешних сервисов
+import logging
+import random
+import time
+from typing import Dict
+
+from .metrics import UPSTREAM_CIRCUIT_REJECTIONS, UPSTREAM_CIRCUIT_STATE
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Значения gauge scraper_upstream_circuit_state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(Exception):
+    """Цепь разомкнута: сервис недавно падал, запрос не отправляем"""
+
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"{upstream} unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Экспоненциальная задержка с полным jitter: uniform(0, min(cap, base * 2^attempt))"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    Повторы не больше ratio от числа запросов: каждый запрос пополняет
+    бюджет на ratio, каждый повтор тратит 1. Когда сервис лежит целиком,
+    повторы быстро заканчиваются и не умножают нагрузку.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+
+class CircuitBreaker:
+    """
+    closed -> open после failure_threshold ошибок подряд;
+    open -> half_open через reset_timeout, пропускаем один пробный запрос;
+    удачная проба замыкает цепь, неудачная - снова размыкает.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._export()
+
+    def retry_in(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def available(self) -> bool:
+        """Можно ли сейчас отправить запрос (без изменения состояния)"""
+        if self.state == OPEN:
+            return self.retry_in() == 0
+        if self.state == HALF_OPEN:
+            return not self._probe_in_flight
+        return True
+
+    def before_call(self) -> bool:
+        """Пропустить вызов или бросить UpstreamUnavailable; True - это пробный запрос"""
+        if self.state == OPEN:
+            if self.retry_in() > 0:
+                UPSTREAM_CIRCUIT_REJECTIONS.labels(upstream=self.name).inc()
+                raise UpstreamUnavailable(self.name, self.retry_in())
+            self._set_state(HALF_OPEN)
+
+        if self.state == HALF_OPEN:
+            if self._probe_in_flight:
+                UPSTREAM_CIRCUIT_REJECTIONS.labels(upstream=self.name).inc()
+                raise UpstreamUnavailable(self.name, self.reset_timeout)
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release(self, probe: bool):
+        """Проба завершилась без вердикта (отмена, ошибка на нашей стороне)"""
+        if probe:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self._probe_in_flight = False
+        if self.state != CLOSED:
+            logger.info(f"{self.name}: circuit closed, upstream recovered")
+            self._set_state(CLOSED)
+
+    def record_failure(self, reason: str):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+            logger.error(
+                f"{self.name}: circuit opened after {self.failures} failures ({reason}), "
+                f"failing fast for {self.reset_timeout:.0f}s"
+            )
+            self.opened_at = time.monotonic()
+            self._set_state(OPEN)
+
+    def _set_state(self, state: str):
+        self.state = state
+        self._export()
+
+    def _export(self):
+        UPSTREAM_CIRCUIT_STATE.labels(upstream=self.name).set(STATE_VALUES[self.state])
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in_seconds": round(self.retry_in(), 1) if self.state == OPEN else 0,
+        }
@@ -0,0 +1,204 @@
+# app/robots.py - Кеш robots.txt по сайтам: разрешённые пути и Crawl-delay
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from .http_clients import HTTPClientRegistry
+from .metrics import ROBOTS_DISALLOWED_PAGES, ROBOTS_FETCHES
+from .resilience import UpstreamUnavailable
+
+logger = logging.getLogger(__name__)
+
+# Больше RFC 9309 читать не требует; хвост отбрасываем
+MAX_ROBOTS_BYTES = 500 * 1024
+
+
+class RobotsRules:
+    """
+    Правила одной группы robots.txt, скомпилированные в одно регулярное
+    выражение: альтернативы отсортированы по убыванию длины шаблона (Allow
+    раньше Disallow той же длины), поэтому первая совпавшая - та, что
+    выигрывает по RFC 9309. Проверка URL - один re.match.
+    """
+
+    def __init__(self, rules: List[Tuple[bool, str]] = (), crawl_delay: Optional[float] = None):
+        # Пустой Disallow ничего не запрещает
+        self.rules = sorted(
+            ((allow, pattern) for allow, pattern in rules if pattern),
+            key=lambda rule: (-len(rule[1]), not rule[0]),
+        )
+        self.crawl_delay = crawl_delay
+        self._allow = [allow for allow, _ in self.rules]
+        self._matcher = re.compile(
+            "|".join(f"({self._pattern_regex(pattern)})" for _, pattern in self.rules)
+        ) if self.rules else None
+
+    @staticmethod
+    def _pattern_regex(pattern: str) -> str:
+        anchored = pattern.endswith("$")
+        if anchored:
+            pattern = pattern[:-1]
+        regex = ".*".join(re.escape(part) for part in pattern.split("*"))
+        return regex + (r"\Z" if anchored else "")
+
+    @classmethod
+    def parse(cls, text: str, user_agent: str) -> "RobotsRules":
+        """Группы для user_agent (без учёта регистра), иначе группы "*" """
+        token = user_agent.lower()
+        groups: List[Tuple[List[str], List[Tuple[bool, str]], List[float]]] = []
+        agents: List[str] = []
+        rules: List[Tuple[bool, str]] = []
+        delays: List[float] = []
+        for line in text.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if ":" not in line:
+                continue
+            key, value = (part.strip() for part in line.split(":", 1))
+            key = key.lower()
+            if key == "user-agent":
+                if rules or delays:
+                    # Агент после правил начинает новую группу
+                    agents, rules, delays = [], [], []
+                if not agents:
+                    groups.append((agents, rules, delays))
+                agents.append(value.split("/", 1)[0].lower())
+            elif not agents:
+                continue
+            elif key in ("allow", "disallow"):
+                rules.append((key == "allow", value))
+            elif key == "crawl-delay":
+                try:
+                    delays.append(float(value))
+                except ValueError:
+                    pass
+
+        for wanted in (token, "*"):
+            matched = [group for group in groups if wanted in group[0]]
+            if matched:
+                delays = [delay for group in matched for delay in group[2]]
+                return cls(
+                    [rule for group in matched for rule in group[1]],
+                    crawl_delay=max(delays) if delays else None,
+                )
+        return cls()
+
+    def allows(self, url: str) -> bool:
+        if self._matcher is None:
+            return True
+        parts = urlsplit(url)
+        path = parts.path or "/"
+        if path == "/robots.txt":
+            return True
+        match = self._matcher.match(f"{path}?{parts.query}" if parts.query else path)
+        return match is None or self._allow[match.lastindex - 1]
+
+
+ALLOW_ALL = RobotsRules()
+DISALLOW_ALL = RobotsRules([(False, "/")])
+
+
+@dataclass
+class _CachedRobots:
+    rules: RobotsRules
+    expires_at: float
+
+
+class RobotsPolicy:
+    """
+    robots.txt каждого сайта скачивается не чаще раза в ttl и разбирается
+    один раз; allowed() после refresh() - синхронная проверка по кешу, её
+    зовёт планировщик для каждой страницы. Ответ 4xx - ограничений нет,
+    5xx/429/сеть - всё запрещено (RFC 9309), но ранее скачанные правила
+    остаются в силе; повторная попытка через error_ttl.
+    """
+
+    def __init__(
+        self,
+        http: HTTPClientRegistry,
+        sites_config: Dict[str, Dict],
+        user_agent: str,
+        ttl: float = 86400.0,
+        error_ttl: float = 600.0,
+        enabled: bool = True,
+    ):
+        self.http = http
+        self.sites_config = sites_config
+        self.user_agent = user_agent
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.enabled = enabled
+        self._cache: Dict[str, _CachedRobots] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def respects(self, site: str) -> bool:
+        return self.enabled and self.sites_config.get(site, {}).get("respect_robots_txt", True)
+
+    @staticmethod
+    def upstream(site: str) -> str:
+        return f"robots:{site}"
+
+    def allowed(self, site: str, url: str) -> bool:
+        if not self.respects(site):
+            return True
+        cached = self._cache.get(site)
+        if cached is None or cached.rules.allows(url):
+            return True
+        ROBOTS_DISALLOWED_PAGES.labels(site=site).inc()
+        return False
+
+    async def refresh(self, site: str) -> RobotsRules:
+        """Правила сайта из кеша; скачивает robots.txt, если запись устарела"""
+        if not self.respects(site):
+            return ALLOW_ALL
+        cached = self._cache.get(site)
+        if cached and cached.expires_at > time.monotonic():
+            return cached.rules
+        async with self._locks.setdefault(site, asyncio.Lock()):
+            # Пока ждали lock, правила мог скачать соседний проход
+            cached = self._cache.get(site)
+            if cached and cached.expires_at > time.monotonic():
+                return cached.rules
+            rules, ttl = await self._fetch(site, cached.rules if cached else None)
+            self._cache[site] = _CachedRobots(rules, time.monotonic() + ttl)
+            return rules
+
+    async def _fetch(self, site: str, previous: Optional[RobotsRules]) -> Tuple[RobotsRules, float]:
+        upstream = self.upstream(site)
+        try:
+            self.http.ensure_available(upstream)
+            response = await self.http.request(upstream, "GET", "/robots.txt", follow_redirects=True)
+        except (httpx.HTTPError, UpstreamUnavailable) as e:
+            return self._unreachable(site, previous, type(e).__name__)
+
+        status = response.status_code
+        if status == 429 or status >= 500:
+            return self._unreachable(site, previous, f"HTTP {status}")
+        if status >= 400:
+            ROBOTS_FETCHES.labels(site=site, outcome="missing").inc()
+            logger.info(f"{site}: robots.txt HTTP {status}, no restrictions")
+            return ALLOW_ALL, self.ttl
+        if status >= 300:
+            # Редиректы, на которые httpx не пошёл (слишком много и т.п.)
+            return self._unreachable(site, previous, f"HTTP {status}")
+
+        rules = RobotsRules.parse(response.content[:MAX_ROBOTS_BYTES].decode("utf-8", "replace"), self.user_agent)
+        ROBOTS_FETCHES.labels(site=site, outcome="ok").inc()
+        logger.info(
+            f"{site}: robots.txt {len(rules.rules)} rules for {self.user_agent}"
+            + (f", Crawl-delay {rules.crawl_delay}s" if rules.crawl_delay else "")
+        )
+        return rules, self.ttl
+
+    def _unreachable(self, site: str, previous: Optional[RobotsRules], reason: str) -> Tuple[RobotsRules, float]:
+        ROBOTS_FETCHES.labels(site=site, outcome="error").inc()
+        if previous is not None:
+            logger.warning(f"{site}: robots.txt unavailable ({reason}), keeping cached rules")
+            return previous, self.error_ttl
+        logger.warning(f"{site}: robots.txt unavailable ({reason}), site disallowed for {self.error_ttl:.0f}s")
+        return DISALLOW_ALL, self.error_ttl
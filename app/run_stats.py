@@ -0,0 +1,121 @@
+# app/run_stats.py - Статистика одного прохода по сайту (scraping_stats + Prometheus)
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict
+
+from sqlalchemy import insert
+
+from .metrics import SCRAPE_RUN_ERRORS, SCRAPE_RUN_LISTINGS, SCRAPE_RUN_PAGES, SCRAPE_RUN_SECONDS
+from .models import ScrapingStats, database
+from .pipeline import PipelineResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ScrapeRunStats:
+    """
+    Строка scraping_stats. crawl/llm/db - суммарное время воркеров стадии
+    (при нескольких воркерах может быть больше duration_seconds).
+    """
+
+    site: str
+    pages_scraped: int = 0
+    pages_failed: int = 0
+    properties_found: int = 0
+    properties_new: int = 0
+    properties_updated: int = 0
+    properties_removed: int = 0
+    errors_count: int = 0
+    duration_seconds: float = 0.0
+    crawl_seconds: float = 0.0
+    llm_seconds: float = 0.0
+    db_seconds: float = 0.0
+    error_details: Dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_pipeline(cls, site: str, result: PipelineResult, removed: int = 0) -> "ScrapeRunStats":
+        stages = result.stages
+        return cls(
+            site=site,
+            pages_scraped=stages["crawl"].processed,
+            pages_failed=stages["crawl"].errors,
+            properties_found=len(result.records),
+            properties_new=result.saved.new,
+            properties_updated=result.saved.updated,
+            properties_removed=removed,
+            errors_count=sum(stats.errors for stats in stages.values()),
+            duration_seconds=result.duration_seconds,
+            crawl_seconds=stages["crawl"].busy_seconds,
+            # extract - это в основном ожидание Ollama (regex и кеш на порядки быстрее)
+            llm_seconds=stages["extract"].busy_seconds,
+            db_seconds=result.db_seconds,
+            error_details={
+                name: stats.error_messages for name, stats in stages.items() if stats.error_messages
+            },
+        )
+
+    @classmethod
+    def failed(cls, site: str, error: Exception, duration_seconds: float) -> "ScrapeRunStats":
+        return cls(
+            site=site,
+            errors_count=1,
+            duration_seconds=duration_seconds,
+            error_details={"run": [str(error)]},
+        )
+
+    @property
+    def aborted(self) -> bool:
+        """Проход упал целиком (а не отдельные страницы)"""
+        return "run" in self.error_details
+
+    @property
+    def success_rate(self) -> float:
+        """Доля успешно скачанных страниц, %"""
+        attempted = self.pages_scraped + self.pages_failed
+        return round(self.pages_scraped / attempted * 100, 2) if attempted else 0.0
+
+    def export(self):
+        for phase, seconds in (
+            ("total", self.duration_seconds),
+            ("crawl", self.crawl_seconds),
+            ("llm", self.llm_seconds),
+            ("db", self.db_seconds),
+        ):
+            SCRAPE_RUN_SECONDS.labels(site=self.site, phase=phase).observe(seconds)
+        SCRAPE_RUN_PAGES.labels(site=self.site).inc(self.pages_scraped)
+        for kind, count in (
+            ("found", self.properties_found),
+            ("new", self.properties_new),
+            ("updated", self.properties_updated),
+            ("removed", self.properties_removed),
+        ):
+            SCRAPE_RUN_LISTINGS.labels(site=self.site, kind=kind).inc(count)
+        SCRAPE_RUN_ERRORS.labels(site=self.site).inc(self.errors_count)
+
+    async def save(self):
+        await database.execute(
+            insert(ScrapingStats.__table__).values(
+                site=self.site,
+                pages_scraped=self.pages_scraped,
+                properties_found=self.properties_found,
+                properties_new=self.properties_new,
+                properties_updated=self.properties_updated,
+                properties_removed=self.properties_removed,
+                duration_seconds=round(self.duration_seconds),
+                crawl_seconds=round(self.crawl_seconds, 2),
+                llm_seconds=round(self.llm_seconds, 2),
+                db_seconds=round(self.db_seconds, 2),
+                errors_count=self.errors_count,
+                success_rate=self.success_rate,
+                error_details=self.error_details or None,
+            )
+        )
+
+    async def record(self):
+        """Метрики + строка в scraping_stats; сбой записи не должен ронять парсинг"""
+        self.export()
+        try:
+            await self.save()
+        except Exception as e:
+            logger.error(f"Failed to save scraping stats for {self.site}: {e}")
@@ -0,0 +1,85 @@
+# app/scheduler.py - Параллельный планировщик парсинга сайтов
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+from urllib.parse import urlparse
+
+from .concurrency import AIMDController
+
+logger = logging.getLogger(__name__)
+
+
+class SiteScheduler:
+    """
+    Запускает сайты параллельно: не больше concurrent_requests одновременно,
+    старты разнесены на min_delay_between_sites, а запросы к каждому домену
+    идут через AIMD-контроллер, для которого rate_limit_ms - нижняя граница.
+    """
+
+    def __init__(
+        self,
+        sites_config: Dict[str, Dict],
+        global_settings: Dict[str, Any],
+        max_site_concurrency: int = 4,
+    ):
+        self.sites_config = sites_config
+        self.max_concurrent = max(1, int(global_settings.get("concurrent_requests", 2)))
+        self.min_delay_between_sites = float(global_settings.get("min_delay_between_sites", 0))
+        self._controllers: Dict[str, AIMDController] = {}
+
+        for site_name, config in sites_config.items():
+            domain = self._domain(site_name)
+            interval = config.get("rate_limit_ms", 0) / 1000
+            # Если несколько сайтов делят домен - берём самый строгий лимит
+            controller = self._controllers.get(domain)
+            if controller is None or controller.base_interval < interval:
+                self._controllers[domain] = AIMDController(site_name, interval, max_limit=max_site_concurrency)
+
+    def _domain(self, site_name: str) -> str:
+        config = self.sites_config.get(site_name, {})
+        return urlparse(config.get("base_url", "")).netloc or site_name
+
+    def controller(self, site_name: str) -> AIMDController:
+        domain = self._domain(site_name)
+        if domain not in self._controllers:
+            self._controllers[domain] = AIMDController(site_name, 0.0)
+        return self._controllers[domain]
+
+    def slot(self, site_name: str):
+        """
+        Слот для очередного запроса к домену сайта:
+        async with scheduler.slot(site) as controller: ...; controller.record_status(...)
+        """
+        return self.controller(site_name).slot()
+
+    async def run_cycle(
+        self,
+        scrape_site: Callable[[str], Awaitable[List[Dict]]],
+        site_names: List[str] = None,
+    ) -> Dict[str, Any]:
+        """Один цикл по всем сайтам; время цикла ~ самый медленный сайт"""
+        site_names = list(site_names or self.sites_config.keys())
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def run_site(index: int, site_name: str):
+            # Разносим старты, чтобы не ударить по всем порталам одновременно
+            await asyncio.sleep(index * self.min_delay_between_sites)
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    return await scrape_site(site_name)
+                finally:
+                    logger.info(f"Site {site_name} finished in {time.monotonic() - started:.1f}s")
+
+        results = await asyncio.gather(
+            *(run_site(i, name) for i, name in enumerate(site_names)),
+            return_exceptions=True,
+        )
+
+        cycle_results = {}
+        for site_name, result in zip(site_names, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error in continuous scraping {site_name}: {result}")
+            cycle_results[site_name] = result
+        return cycle_results
@@ -1,84 +1,549 @@
 import asyncio
 import json
 import logging
-from datetime import datetime
-from typing import Dict, List, Any
+import time
 import httpx
-from sqlalchemy import insert
+from contextlib import aclosing
+from datetime import datetime
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Any, Optional, Tuple
 
-from .models import Property, database
 from .config import settings
+from .scheduler import SiteScheduler
+from .cpu_pool import CPUPool
+from .crawl4ai_jobs import Crawl4AIJobClient
+from .crawl_planner import CrawlJob, CrawlPlanner
+from .dedup import DuplicateIndex
+from .extraction import Emit, ExtractionEngine
+from .extraction_cache import ExtractionCache
+from .exchange_rates import ExchangeRates
+from .geocoder import BatchGeocoder, Gazetteer, GeocodeCache, Geocoder
+from .neighborhoods import NeighborhoodIndex
+from .html_extractor import HTMLExtractor
+from .regex_extractor import REGEX_FIELDS
+from .http_clients import HTTPClientRegistry, UpstreamConfig
+from .job_queue import ScrapeJobQueue
+from .pipeline import ScrapePipeline
+from .proxy_pool import ProxyPool, crawl_succeeded
+from .recrawl import RecrawlScheduler
+from .robots import RobotsPolicy
+from .run_stats import ScrapeRunStats
+from .storage import PropertyWriter
+from .streaming import CrawlResultStreamParser, JSONArrayStreamParser
 
 logger = logging.getLogger(__name__)
 
+# Версия промпта извлечения: менять при любой правке _generate_ai_prompt,
+# иначе кеш будет отдавать результаты старого промпта
+AI_PROMPT_VERSION = "2"
+
+RecordCallback = Callable[[Dict], Awaitable[None]]
+ResultCallback = Callable[[int, Dict], Awaitable[None]]
+
 class PropertyScraper:
     def __init__(self):
-        self.sites_config = self._load_sites_config()
+        self.config = self._load_sites_config()
+        self.sites_config = self.config.get('sites', {})
+        self.global_settings = self.config.get('global_settings', {})
         self.crawl4ai_url = settings.CRAWL4AI_URL
         self.ollama_url = settings.OLLAMA_URL
+        self.scheduler = SiteScheduler(
+            self.sites_config, self.global_settings,
+            max_site_concurrency=settings.SCRAPE_SITE_MAX_CONCURRENCY,
+        )
+        self.recrawl = RecrawlScheduler(
+            self.sites_config,
+            interval_seconds=settings.SCRAPE_INTERVAL_SECONDS,
+            min_interval=settings.RECRAWL_MIN_INTERVAL_SECONDS,
+            max_interval=settings.RECRAWL_MAX_INTERVAL_SECONDS,
+        )
+        self.proxies = ProxyPool.from_config(self.config.get('proxy_settings', {}), self.sites_config)
+        self.html_extractors = self._build_html_extractors()
+        self.http = self._build_http_registry()
+        self.robots = RobotsPolicy(
+            self.http, self.sites_config,
+            user_agent=settings.ROBOTS_USER_AGENT,
+            ttl=settings.ROBOTS_TXT_TTL_SECONDS,
+            error_ttl=settings.ROBOTS_TXT_ERROR_TTL_SECONDS,
+            enabled=bool(self.global_settings.get("respect_robots_txt", False)),
+        )
+        self.planner = CrawlPlanner(
+            self.sites_config, max_workers=settings.PIPELINE_CRAWL_WORKERS, robots=self.robots
+        )
+        self.crawl4ai_jobs = Crawl4AIJobClient(
+            self.http,
+            max_in_flight=settings.CRAWL4AI_MAX_INFLIGHT_JOBS,
+            poll_interval=settings.CRAWL4AI_POLL_INTERVAL,
+            poll_max_interval=settings.CRAWL4AI_POLL_MAX_INTERVAL,
+            job_timeout=settings.CRAWL4AI_JOB_TIMEOUT,
+        )
+        gazetteer = self._load_gazetteer()
+        # Паттерны data_processing, селекторы и справочник адресов загружаются один раз в каждом процессе пула
+        self.cpu_pool = CPUPool(
+            self.config, list(self.html_extractors),
+            gazetteer_path=settings.GEOCODER_GAZETTEER_PATH if gazetteer else None,
+            workers=settings.CPU_POOL_WORKERS,
+            chunk_size=settings.CPU_POOL_CHUNK_SIZE,
+        )
+        self.geocoder = BatchGeocoder(
+            Geocoder(gazetteer), GeocodeCache(gazetteer.version), compute=self.cpu_pool.geocode
+        ) if gazetteer else None
+        self.neighborhoods = NeighborhoodIndex.from_config(self.config, gazetteer)
+        self.exchange_rates = ExchangeRates()
+        self.dedup = DuplicateIndex()
+        self.writer = PropertyWriter(
+            dedup=self.dedup, cpu_pool=self.cpu_pool, geocoder=self.geocoder,
+            neighborhoods=self.neighborhoods, exchange_rates=self.exchange_rates,
+        )
+        self.extraction_cache = ExtractionCache(settings.AI_MODEL, AI_PROMPT_VERSION)
+        self.extraction_engine = ExtractionEngine(self._extract_with_llm, self._simple_process)
+        self.pipeline = ScrapePipeline(
+            self.planner,
+            crawl_page=self._crawl_page,
+            extract=self._extract_properties,
+            writer=self.writer,
+            extract_workers=settings.PIPELINE_EXTRACT_WORKERS,
+            persist_workers=settings.PIPELINE_PERSIST_WORKERS,
+            queue_size=settings.PIPELINE_QUEUE_SIZE,
+            crawl_batch=self._crawl_batch,
+            batch_size=settings.CRAWL4AI_JOB_MAX_URLS,
+            # Одна задача на сайт: она рендерит controller.limit страниц сразу,
+            # вторая задача того же сайта удвоила бы нагрузку на портал
+            max_batches=1,
+        )
+    
+    def _build_html_extractors(self) -> Dict[str, HTMLExtractor]:
+        """
+        Сайты со статической выдачей качаем сами и разбираем по selectors,
+        без headless-браузера. Ротация прокси есть только в Crawl4AI,
+        поэтому с включённым пулом прокси все сайты идут через него.
+        """
+        if not settings.SCRAPE_NATIVE_EXTRACTION or self.proxies:
+            return {}
+        extractors = {}
+        for name, config in self.sites_config.items():
+            if config.get("requires_js") or not config.get("selectors"):
+                continue
+            try:
+                extractors[name] = HTMLExtractor(name, config["selectors"])
+            except ValueError as e:
+                logger.error(f"Native extraction disabled for {name}: {e}")
+        if extractors:
+            logger.info(f"Native HTML extraction: {', '.join(extractors)}")
+        return extractors
+    
+    def _build_http_registry(self) -> HTTPClientRegistry:
+        registry = HTTPClientRegistry()
+        resilience = dict(
+            max_retries=settings.SCRAPE_MAX_RETRIES,
+            retry_budget_ratio=settings.UPSTREAM_RETRY_BUDGET_RATIO,
+            backoff_base=settings.UPSTREAM_BACKOFF_BASE_SECONDS,
+            backoff_max=settings.UPSTREAM_BACKOFF_MAX_SECONDS,
+            failure_threshold=settings.UPSTREAM_FAILURE_THRESHOLD,
+            reset_timeout=settings.UPSTREAM_RESET_TIMEOUT_SECONDS,
+        )
+        crawl4ai_headers = {}
+        if settings.CRAWL4AI_API_TOKEN:
+            crawl4ai_headers["Authorization"] = f"Bearer {settings.CRAWL4AI_API_TOKEN}"
+        registry.register("crawl4ai", UpstreamConfig(
+            base_url=self.crawl4ai_url,
+            max_connections=settings.CRAWL4AI_MAX_CONNECTIONS,
+            timeout=settings.SCRAPE_TIMEOUT_SECONDS,
+            headers=crawl4ai_headers,
+            **resilience,
+        ))
+        registry.register("ollama", UpstreamConfig(
+            base_url=self.ollama_url,
+            max_connections=settings.OLLAMA_MAX_CONNECTIONS,
+            timeout=settings.SCRAPE_TIMEOUT_SECONDS,
+            **resilience,
+        ))
+        for name in self.html_extractors:
+            config = self.sites_config[name]
+            # Accept-Encoding выставляет httpx - под те декодеры, что установлены
+            headers = {k: v for k, v in config.get("headers", {}).items() if k.lower() != "accept-encoding"}
+            if config.get("user_agent"):
+                headers["User-Agent"] = config["user_agent"]
+            registry.register(f"site:{name}", UpstreamConfig(
+                base_url=config["base_url"],
+                max_connections=settings.SCRAPE_SITE_MAX_CONCURRENCY,
+                timeout=settings.SCRAPE_TIMEOUT_SECONDS,
+                headers=headers,
+                **resilience,
+            ))
+        if self.global_settings.get("respect_robots_txt", False):
+            # robots.txt - отдельная цепь на сайт: сбой одного домена не закрывает остальные
+            for name, config in self.sites_config.items():
+                registry.register(RobotsPolicy.upstream(name), UpstreamConfig(
+                    base_url=config["base_url"],
+                    max_connections=1,
+                    timeout=settings.SCRAPE_TIMEOUT_SECONDS,
+                    headers={"User-Agent": config["user_agent"]} if config.get("user_agent") else {},
+                    **resilience,
+                ))
+        return registry
+    
+    async def start(self):
+        """Открыть пулы соединений и построить индекс дублей (вызывается из lifespan)"""
+        await self.http.open()
+        self.cpu_pool.start()
+        await self.extraction_cache.connect()
+        try:
+            await self.exchange_rates.load()
+        except Exception as e:
+            # refresh() при записи попробует ещё раз; до тех пор price_usd - как на сайте
+            logger.error(f"Failed to load exchange rates: {e}")
+        try:
+            await self.dedup.load()
+        except Exception as e:
+            # Без индекса дубли просто не связываются до следующего старта
+            logger.error(f"Failed to build duplicate index: {e}")
+    
+    async def close(self):
+        await self.extraction_cache.close()
+        await self.http.close()
+        self.cpu_pool.close()
         
+    def _load_gazetteer(self) -> Optional[Gazetteer]:
+        try:
+            gazetteer = Gazetteer.load(settings.GEOCODER_GAZETTEER_PATH)
+        except Exception as e:
+            logger.error(f"Failed to load gazetteer, geocoding disabled: {e}")
+            return None
+        logger.info(
+            f"Gazetteer {gazetteer.version}: {len(gazetteer.streets)} streets, "
+            f"{len(gazetteer.neighborhoods)} neighborhoods"
+        )
+        return gazetteer
+    
     def _load_sites_config(self) -> Dict:
         try:
             with open("/app/configs/sites_config.json", "r") as f:
-                data = json.load(f)
-                return data.get('sites', {})  # Добавлено: берем поле 'sites'
+                return json.load(f)
         except Exception as e:
             logger.error(f"Failed to load sites config: {e}")
             return {}
     
-    async def scrape_single_site(self, site_name: str) -> List[Dict]:
+    async def scrape_single_site(self, site_name: str, search_keys: List[str] = None) -> List[Dict]:
+        records, _ = await self._scrape(site_name, search_keys)
+        return records
+    
+    async def _scrape(
+        self, site_name: str, search_keys: List[str] = None
+    ) -> Tuple[List[Dict], Optional[ScrapeRunStats]]:
+        """Проход по сайту (или его лентам search_keys); stats=None, если проход пропущен"""
         if site_name not in self.sites_config:
             raise ValueError(f"Site {site_name} not configured")
         
-        config = self.sites_config[site_name]
+        if site_name not in self.html_extractors and not self.http.available("crawl4ai"):
+            # Crawl4AI недавно падал - не тратим таймауты на каждую страницу
+            logger.warning(f"Skipping {site_name}: crawl4ai circuit is open")
+            return [], None
+        
         logger.info(f"Starting scraping {site_name}")
         
+        started = time.monotonic()
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.crawl4ai_url}/crawl",
-                    json={
-                        "urls": [config["url"]],
-                        "crawler_config": config["crawler_config"]
-                    }
+            # robots.txt из кеша (скачивается раз в ROBOTS_TXT_TTL_SECONDS) - до plan,
+            # чтобы закрытые страницы отсеялись ещё при планировании
+            rules = await self.robots.refresh(site_name)
+            crawl_delay = rules.crawl_delay
+            if crawl_delay and crawl_delay > settings.ROBOTS_MAX_CRAWL_DELAY_SECONDS:
+                logger.warning(
+                    f"{site_name}: Crawl-delay {crawl_delay}s capped to {settings.ROBOTS_MAX_CRAWL_DELAY_SECONDS}s"
                 )
-                
-                if response.status_code != 200:
-                    logger.error(f"Crawl4AI error: {response.text}")
-                    return []
-                
-                data = response.json()
-                extracted_data = data.get("results", [{}])[0].get("extracted_content", [])
-                
-                processed_properties = await self._process_with_ai(extracted_data, site_name)
-                await self._save_properties(processed_properties, site_name)
-                
-                logger.info(f"Successfully scraped {len(processed_properties)} properties from {site_name}")
-                return processed_properties
-                
+                crawl_delay = settings.ROBOTS_MAX_CRAWL_DELAY_SECONDS
+            self.scheduler.controller(site_name).set_crawl_delay(crawl_delay)
+            
+            run_started = datetime.utcnow()
+            # Краулинг, LLM и запись в БД идут параллельно стадиями конвейера
+            # Страницы сайтов через Crawl4AI уходят пачками в задачи /crawl/job
+            batched = settings.CRAWL4AI_BATCH_JOBS and site_name not in self.html_extractors
+            jobs = self.planner.plan(site_name, search_keys)
+            result = await self.pipeline.run(site_name, jobs, batched=batched)
+            
+            removed = 0
+            sweep_seconds = 0.0
+            # Пропавшие считаем только по полному и безошибочному обходу,
+            # иначе упавшая страница "снимет" с публикации живые объявления
+            # (ленты, закрытые robots.txt, тоже делают обход неполным)
+            complete = (
+                search_keys is None
+                and len(jobs) == len(self.sites_config[site_name].get("search_urls", {}))
+                and not any(s.errors for s in result.stages.values())
+            )
+            if complete and result.records:
+                sweep_started = time.monotonic()
+                removed = await self.writer.sweep_missing(
+                    site_name, run_started, settings.SCRAPE_MISSED_CYCLES_TO_DEACTIVATE
+                )
+                sweep_seconds = time.monotonic() - sweep_started
+            
+            stats = ScrapeRunStats.from_pipeline(site_name, result, removed)
+            stats.db_seconds += sweep_seconds
+            stats.duration_seconds = time.monotonic() - started
+            await stats.record()
+            
+            logger.info(
+                f"Successfully scraped {len(result.records)} properties from {site_name} "
+                f"({result.saved.new} new, {result.saved.updated} updated, "
+                f"{result.saved.price_changes} price changes, {removed} removed) "
+                f"in {stats.duration_seconds:.1f}s: crawl {stats.crawl_seconds:.1f}s, "
+                f"llm {stats.llm_seconds:.1f}s, db {stats.db_seconds:.1f}s"
+            )
+            return result.records, stats
+            
         except Exception as e:
             logger.error(f"Error scraping {site_name}: {e}")
+            stats = ScrapeRunStats.failed(site_name, e, time.monotonic() - started)
+            await stats.record()
+            return [], stats
+    
+    async def _crawl_page(self, job: CrawlJob) -> List[Dict]:
+        if job.site in self.html_extractors:
+            return await self._fetch_native(job)
+        config = self.sites_config[job.site]
+        self.http.ensure_available("crawl4ai")
+        crawler_config = dict(config.get("crawler_config", {}))
+        async with self.scheduler.slot(job.site) as controller:
+            proxy = self.proxies.acquire(job.site) if self.proxies else None
+            if proxy:
+                crawler_config["proxy_config"] = self.proxies.crawler_proxy_config(proxy)
+            proxy_ok = None
+            started = time.monotonic()
+            try:
+                # Тело читается потоком: отрендеренный html/markdown страницы
+                # проматывается парсером, в память попадают только карточки.
+                # feed() остаётся на loop'е: кусок 64 КБ разбирается за ~1 мс,
+                # а в CPUPool его пришлось бы ещё и пиклить вместе с состоянием
+                # парсера (замеры - scripts/benchmarks/bench_crawl_result_memory.py)
+                parser = CrawlResultStreamParser()
+                items: List[Dict] = []
+                try:
+                    async with self.http.stream(
+                        "crawl4ai", "POST", "/crawl",
+                        json={
+                            "urls": [job.url],
+                            "crawler_config": crawler_config
+                        }
+                    ) as response:
+                        if response.status_code != 200:
+                            # 429/503 от самого Crawl4AI тоже означает "притормози"
+                            await response.aread()
+                            controller.record_status(response.status_code, time.monotonic() - started)
+                            logger.error(f"Crawl4AI error for {job.url}: {response.text}")
+                            return []
+                        async for chunk in response.aiter_bytes():
+                            items.extend(parser.feed(chunk))
+                except httpx.TimeoutException:
+                    controller.record_congestion("timeout")
+                    proxy_ok = False
+                    raise
+                parser.close()
+                result = parser.result
+                # status_code - ответ портала, который Crawl4AI пробрасывает в результате
+                controller.record_status(result.get("status_code"), time.monotonic() - started)
+                proxy_ok = crawl_succeeded(result)
+                return items
+            finally:
+                if self.proxies:
+                    self.proxies.release(proxy, proxy_ok, time.monotonic() - started)
+    
+    async def _crawl_batch(self, jobs: List[CrawlJob]) -> AsyncIterator[Tuple[CrawlJob, List[Dict]]]:
+        """
+        Пачка страниц одного сайта одной задачей Crawl4AI; (job, карточки)
+        отдаются по мере готовности каждого URL. Задача занимает один слот
+        сайта, а параллелизм и паузу внутри неё Crawl4AI берёт из AIMD, поэтому
+        у сайта в работе не больше одной задачи (max_batches=1 в конвейере).
+        """
+        site = jobs[0].site
+        config = self.sites_config[site]
+        by_url = {job.url: job for job in jobs}
+        crawler_config = dict(config.get("crawler_config", {}))
+        async with self.scheduler.slot(site) as controller:
+            crawler_config["semaphore_count"] = max(1, int(controller.limit))
+            crawler_config["mean_delay"] = controller.interval
+            proxy = self.proxies.acquire(site) if self.proxies else None
+            if proxy:
+                crawler_config["proxy_config"] = self.proxies.crawler_proxy_config(proxy)
+            proxy_ok = None
+            started = time.monotonic()
+            try:
+                # aclosing: слот задачи освобождается сразу, даже если нас бросили посреди пачки
+                async with aclosing(self.crawl4ai_jobs.crawl(list(by_url), crawler_config)) as results:
+                    async for result in results:
+                        job = by_url.get(result.get("url"))
+                        if job is None:
+                            logger.warning(f"Crawl4AI job returned unknown URL {result.get('url')}")
+                            continue
+                        controller.record_status(result.get("status_code"), time.monotonic() - started)
+                        proxy_ok = crawl_succeeded(result) and proxy_ok is not False
+                        if not result.get("success", True):
+                            logger.error(f"Crawl4AI error for {job.url}: {result.get('error_message')}")
+                        yield job, result.get("extracted_content") or []
+            except httpx.TimeoutException:
+                controller.record_congestion("timeout")
+                proxy_ok = False
+                raise
+            finally:
+                if self.proxies:
+                    self.proxies.release(proxy, proxy_ok, time.monotonic() - started)
+
+    async def _fetch_native(self, job: CrawlJob) -> List[Dict]:
+        """Страница выдачи напрямую с сайта; карточки - в формате extracted_content Crawl4AI"""
+        upstream = f"site:{job.site}"
+        self.http.ensure_available(upstream)
+        async with self.scheduler.slot(job.site) as controller:
+            started = time.monotonic()
+            try:
+                response = await self.http.request(upstream, "GET", job.url, follow_redirects=True)
+            except httpx.TimeoutException:
+                controller.record_congestion("timeout")
+                raise
+            controller.record_status(response.status_code, time.monotonic() - started)
+        
+        if response.status_code != 200:
+            logger.error(f"{job.site} returned HTTP {response.status_code} for {job.url}")
             return []
+        items = await self.cpu_pool.parse_html(job.site, response.text, str(response.url))
+        if not items:
+            # Пустая выдача или селекторы устарели / страница рендерится JS
+            logger.warning(f"No listings matched selectors on {job.url}")
+        return items
     
-    async def _process_with_ai(self, raw_data: List[Dict], site_name: str) -> List[Dict]:
+    async def _extract_properties(
+        self, raw_data: List[Dict], site_name: str, on_record: RecordCallback = None
+    ) -> List[Dict]:
+        """Regex fast-path для всех записей, LLM - только для неполных"""
+        records, incomplete = await self.cpu_pool.regex_split(raw_data)
+        pending = dict(incomplete)
+        
+        if on_record:
+            for index, record in enumerate(records):
+                if index not in pending:
+                    await on_record(record)
+        if not incomplete:
+            return records
+        
+        indexes = [index for index, _ in incomplete]
+        
+        async def on_result(position: int, ai_result: Dict):
+            index = indexes[position]
+            record = pending.pop(index, None)
+            if record is None:
+                return
+            merged = {**record, **{key: value for key, value in ai_result.items() if value not in (None, "")}}
+            # Значения, найденные regex, детерминированы - LLM их не перетирает
+            merged.update({field: record[field] for field in REGEX_FIELDS if record.get(field) is not None})
+            records[index] = merged
+            if on_record:
+                await on_record(merged)
+        
+        await self._process_with_ai([record for _, record in incomplete], site_name, on_result=on_result)
+        
+        # Что не обработал ни LLM, ни fallback - сохраняем как есть
+        for record in pending.values():
+            if on_record:
+                await on_record(record)
+        return records
+    
+    async def _process_with_ai(
+        self, raw_data: List[Dict], site_name: str, on_result: ResultCallback = None
+    ) -> List[Optional[Dict]]:
+        """
+        Результаты выровнены по raw_data (None - запись не удалось обработать).
+        on_result(индекс, результат) вызывается по мере готовности каждой записи.
+        """
         if not raw_data:
             return []
         
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{self.ollama_url}/api/generate",
-                json={
-                    "model": settings.AI_MODEL,
-                    "prompt": self._generate_ai_prompt(raw_data, site_name),
-                    "stream": False
+        # В LLM уходят только объявления, которых нет в кеше
+        keys = [self.extraction_cache.key(item) for item in raw_data]
+        results = await self.extraction_cache.get_many(keys)
+        
+        pending_indexes: Dict[str, List[int]] = {}
+        for index, key in enumerate(keys):
+            if key in results:
+                if on_result:
+                    await on_result(index, results[key])
+            else:
+                pending_indexes.setdefault(key, []).append(index)
+        
+        if pending_indexes:
+            pending_keys = list(pending_indexes)
+            pending_items = [raw_data[pending_indexes[key][0]] for key in pending_keys]
+            
+            async def on_item(position: int, result: Dict, from_llm: bool):
+                key = pending_keys[position]
+                results[key] = result
+                if from_llm:
+                    await self.extraction_cache.set_many({key: result})
+                if on_result:
+                    for index in pending_indexes[key]:
+                        await on_result(index, result)
+            
+            await self.extraction_engine.extract(pending_items, site_name, on_item=on_item)
+        
+        return [results.get(key) for key in keys]
+    
+    async def _extract_with_llm(self, items: List[Dict], site_name: str, emit: Emit) -> List[Optional[Dict]]:
+        """
+        Один чанк через потоковый /api/generate: каждый объект массива отдаётся
+        в emit, как только парсер увидел его закрывающую скобку.
+        Результаты выровнены по items (None - не извлечено).
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+        positions: Dict[str, int] = {}
+        for position, item in enumerate(items):
+            for key in (item.get("external_id"), item.get("url")):
+                if key:
+                    positions.setdefault(str(key), position)
+        parser = JSONArrayStreamParser()
+        next_position = 0
+        
+        def match_position(obj: Dict) -> Optional[int]:
+            # Сначала по external_id / url, иначе - следующая свободная позиция
+            nonlocal next_position
+            for key in (obj.get("external_id"), obj.get("url")):
+                position = positions.get(str(key)) if key else None
+                if position is not None and results[position] is None:
+                    return position
+            while next_position < len(items) and results[next_position] is not None:
+                next_position += 1
+            return next_position if next_position < len(items) else None
+        
+        async with self.http.stream(
+            "ollama", "POST", "/api/generate",
+            json={
+                "model": settings.AI_MODEL,
+                "prompt": self._generate_ai_prompt(items, site_name),
+                "stream": True,
+                "options": {
+                    "temperature": settings.AI_TEMPERATURE,
+                    "num_predict": settings.AI_MAX_TOKENS
                 }
-            )
+            }
+        ) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error(f"AI processing error: {response.status_code} - {body.decode(errors='replace')}")
+                return results
             
-            if response.status_code == 200:
-                return response.json()
-            else:
-                logger.error(f"AI processing error: {response.status_code} - {response.text}")
-                return self._simple_process(raw_data)
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                for obj in parser.feed(chunk.get("response", "")):
+                    if not isinstance(obj, dict):
+                        continue
+                    position = match_position(obj)
+                    if position is None:
+                        continue
+                    results[position] = obj
+                    await emit(position, obj)
+                if chunk.get("done") or parser.finished:
+                    break
+        
+        return results
     
     def _generate_ai_prompt(self, raw_data: List[Dict], site_name: str) -> str:
         return f"""
@@ -104,9 +569,9 @@ class PropertyScraper:
         - photos (array of urls)
         - published_at (datetime)
         
-        Raw data: {json.dumps(raw_data[:3], ensure_ascii=False)}
+        Raw data: {json.dumps(raw_data, ensure_ascii=False)}
         
-        Return structured JSON array.
+        Return structured JSON array with exactly one object per raw item, in the same order.
         """
     
     def _simple_process(self, raw_data: List[Dict]) -> List[Dict]:
@@ -135,46 +600,55 @@ class PropertyScraper:
                 })
         return processed
     
-    async def _save_properties(self, properties: List[Dict], site_name: str):
-        for prop in properties:
-            await database.execute(
-                insert(Property).values(
-                    external_id=prop["external_id"],
-                    source=site_name,
-                    url=prop["url"],
-                    neighborhood=prop["neighborhood"],
-                    price_usd=prop["price_usd"],
-                    price_ars=prop["price_ars"],
-                    rooms=prop["rooms"],
-                    area=prop["area"],
-                    address=prop["address"],
-                    floor=prop["floor"], 
-                    elevator=prop["elevator"],
-                    parking=prop["parking"],
-                    balcony=prop["balcony"], 
-                    terrace=prop["terrace"],
-                    furnished=prop["furnished"],
-                    phone=prop["phone"],
-                    description=prop["description"],
-                    photos=prop["photos"],
-                    published_at=prop["published_at"],
-                    scraped_at=datetime.utcnow(),
-                    status="active",
-                    first_seen_at=datetime.utcnow(),
-                    last_updated_at=datetime.utcnow()
-                )
-            )
-    
     async def start_continuous_scraping(self):
+        """
+        Ленты обходятся по мере готовности (RecrawlScheduler): активные чаще,
+        спокойные реже, в сумме - как один цикл в SCRAPE_INTERVAL_SECONDS.
+        """
         while True:
-            logger.info("Starting scraping cycle...")
+            due = self.recrawl.pop_due()
+            if not due:
+                await asyncio.sleep(self.recrawl.seconds_until_next())
+                continue
             
-            for site_name in self.sites_config.keys():
+            logger.info(f"Recrawling {sum(map(len, due.values()))} feeds on {len(due)} sites...")
+            started = time.monotonic()
+            # Сайты парсятся параллельно, лимиты - в SiteScheduler
+            await self.scheduler.run_cycle(
+                lambda site_name: self._scrape_feeds(site_name, due[site_name]),
+                site_names=list(due),
+            )
+            logger.info(
+                f"Recrawl completed in {time.monotonic() - started:.1f}s, "
+                f"next in {self.recrawl.seconds_until_next():.0f}s"
+            )
+    
+    async def _scrape_feeds(self, site_name: str, search_keys: List[str]):
+        """Ленты по одной: частота новых объявлений нужна для каждой отдельно"""
+        for search_key in search_keys:
+            started_at = datetime.utcnow()
+            _, stats = await self._scrape(site_name, [search_key])
+            # Пустая лента и лента, закрытая robots.txt (plan не дал страниц), -
+            # тоже полный обход: иначе круг сайта не замкнётся и sweep не запустится
+            complete = bool(stats and not stats.errors_count)
+            seen_since = self.recrawl.record(
+                site_name, search_key, stats.properties_new if stats else 0, started_at, complete
+            )
+            if seen_since:
+                # Все ленты сайта обойдены - можно искать пропавшие объявления
                 try:
-                    await self.scrape_single_site(site_name)
-                    await asyncio.sleep(5)  # Small pause between sites
+                    await self.writer.sweep_missing(
+                        site_name, seen_since, settings.SCRAPE_MISSED_CYCLES_TO_DEACTIVATE
+                    )
                 except Exception as e:
-                    logger.error(f"Error in continuous scraping {site_name}: {e}")
-            
-            logger.info("Scraping cycle completed. Waiting 1 hour...")
-            await asyncio.sleep(3600)  # 1 hour between cycles
+                    logger.error(f"Missing-listing sweep failed for {site_name}: {e}")
+    
+    async def start_continuous_enqueue(self, queue: ScrapeJobQueue):
+        """Режим queue: API только ставит циклы в Redis Streams, парсят воркеры"""
+        await queue.ensure_group()
+        while True:
+            try:
+                await queue.enqueue_cycle(list(self.sites_config), settings.SCRAPE_INTERVAL_SECONDS)
+            except Exception as e:
+                logger.error(f"Failed to enqueue scraping cycle: {e}")
+            await asyncio.sleep(settings.SCRAPE_INTERVAL_SECONDS)
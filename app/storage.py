@@ -0,0 +1,506 @@
+# app/storage.py - Пакетная запись объявлений в properties (upsert)
+import asyncio
+import json
+import logging
+import re
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import case, column, func, literal_column, select, table, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from .config import settings
+from .cpu_pool import CPUPool
+from .dedup import DuplicateIndex
+from .exchange_rates import ExchangeRates
+from .geocoder import BatchGeocoder
+from .models import PriceHistory, Property, database
+from .neighborhoods import NeighborhoodIndex
+from .regex_extractor import parse_number
+
+logger = logging.getLogger(__name__)
+
+# Колонки, которые пишет парсер (порядок важен для COPY)
+WRITE_COLUMNS = [
+    "site", "external_id", "url", "title", "description",
+    "price", "currency", "price_usd",
+    "bedrooms", "bathrooms", "area",
+    "location", "neighborhood", "neighborhood_id", "address", "latitude", "longitude", "floor",
+    "images", "features",
+    "is_active", "first_seen_at", "last_seen_at", "missed_cycles",
+    "canonical_id",
+]
+
+# При конфликте (site, external_id) обновляем всё, кроме ключа и first_seen_at;
+# canonical_id однажды проставленный не перезаписываем. Поле, которое повторный
+# обход не нашёл (NULL), сохранённое значение не затирает (COALESCE); цена,
+# валюта и price_usd - тройкой, по excluded.price
+KEEP_EXISTING_COLUMNS = ("canonical_id",)
+KEEP_ON_NULL_COLUMNS = (
+    "url", "description", "bedrooms", "bathrooms", "area",
+    "location", "neighborhood", "neighborhood_id", "address", "latitude", "longitude", "floor",
+)
+PRICE_COLUMNS = ("price", "currency", "price_usd")
+UPDATE_COLUMNS = [
+    c for c in WRITE_COLUMNS
+    if c not in ("site", "external_id", "first_seen_at", *KEEP_EXISTING_COLUMNS, *KEEP_ON_NULL_COLUMNS, *PRICE_COLUMNS)
+]
+
+# Лёгкая проекция таблицы только с нашими колонками: Python-default'ы модели
+# (Enum property_type и т.п.) не должны попадать в INSERT
+properties_write_table = table(
+    "properties",
+    *(column(name, Property.__table__.c[name].type) for name in ["id"] + WRITE_COLUMNS + ["updated_at"]),
+)
+
+FEATURE_FLAGS = ["elevator", "parking", "balcony", "terrace", "furnished"]
+
+# JSONB-колонки: COPY (в отличие от INSERT через SQLAlchemy) принимает их только текстом
+JSON_COLUMNS = ("images", "features")
+
+
+def _copy_record(row: Dict) -> tuple:
+    return tuple(
+        json.dumps(row[column], ensure_ascii=False) if column in JSON_COLUMNS else row[column]
+        for column in WRITE_COLUMNS
+    )
+
+
+@dataclass
+class UpsertResult:
+    new: int = 0
+    updated: int = 0
+    price_changes: int = 0
+
+    def __add__(self, other: "UpsertResult") -> "UpsertResult":
+        return UpsertResult(
+            self.new + other.new,
+            self.updated + other.updated,
+            self.price_changes + other.price_changes,
+        )
+
+
+# Первое число в строке: "USD 120.000", "45,5 m²"
+NUMBER_RE = re.compile(r"\d[\d.,]*")
+
+
+def _to_float(value: Any) -> Optional[float]:
+    if value in (None, "") or isinstance(value, bool):
+        return None
+    if isinstance(value, str):
+        # Строки от LLM/Crawl4AI - в аргентинском формате: "120.000" = 120000
+        match = NUMBER_RE.search(value)
+        return parse_number(match.group()) if match else None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+# Валюта в сырой цене с сайта: "USD 109.000", "U$S 95.000", "$ 180.000.000"
+USD_RE = re.compile(r"u\$s|us\$|\busd\b|u\$d", re.IGNORECASE)
+ARS_RE = re.compile(r"\$|\bars\b", re.IGNORECASE)
+
+
+def _price_currency(value: Any) -> Optional[str]:
+    if not isinstance(value, str):
+        return None
+    # "$" есть и внутри "U$S", поэтому доллар проверяем первым
+    if USD_RE.search(value):
+        return "USD"
+    if ARS_RE.search(value):
+        return "ARS"
+    return None
+
+
+def _to_int(value: Any) -> Optional[int]:
+    number = _to_float(value)
+    return int(number) if number is not None else None
+
+
+def listing_to_row(prop: Dict, site_name: str, now: datetime) -> Optional[Dict]:
+    """Приводит объявление (после AI / simple_process) к колонкам Property"""
+    external_id = str(prop.get("external_id") or prop.get("url") or "").strip()
+    if not external_id:
+        return None
+
+    price_usd = _to_float(prop.get("price_usd")) or None
+    price_ars = _to_float(prop.get("price_ars")) or None
+    # price_usd/price_ars разобраны regex/LLM вместе с валютой - им верим больше,
+    # чем сырой строке price, где валюта только в тексте
+    if price_usd:
+        price, currency = price_usd, "USD"
+    elif price_ars:
+        price, currency = price_ars, "ARS"
+    else:
+        raw_price = prop.get("price")
+        price = _to_float(raw_price)
+        currency = prop.get("currency") or _price_currency(raw_price)
+        if price is not None and currency == "USD":
+            price_usd = price
+
+    neighborhood = prop.get("neighborhood") or None
+    address = prop.get("address") or None
+    title = prop.get("title") or address or neighborhood or prop.get("url") or external_id
+
+    url = prop.get("url")
+    floor = prop.get("floor")
+    bedrooms = prop.get("bedrooms", prop.get("rooms"))
+
+    return {
+        "site": site_name,
+        "external_id": external_id[:200],
+        "url": str(url)[:1000] if url else None,
+        "title": str(title)[:500],
+        "description": prop.get("description") or None,
+        "price": price,
+        "currency": (currency or settings.DEFAULT_CURRENCY)[:3],
+        "price_usd": price_usd,
+        "bedrooms": _to_int(bedrooms),
+        "bathrooms": _to_int(prop.get("bathrooms")),
+        "area": _to_float(prop.get("area")),
+        "location": prop.get("location") or neighborhood,
+        "neighborhood": neighborhood,
+        "neighborhood_id": None,
+        "address": address,
+        "latitude": None,
+        "longitude": None,
+        "floor": str(floor)[:20] if floor not in (None, "") else None,
+        "images": list(prop.get("photos") or prop.get("images") or []),
+        "features": [flag for flag in FEATURE_FLAGS if prop.get(flag) is True],
+        "is_active": True,
+        "first_seen_at": now,
+        "last_seen_at": now,
+        "missed_cycles": 0,
+        "canonical_id": None,
+    }
+
+
+class PropertyWriter:
+    """
+    Пишет объявления пачками: multi-row INSERT ... ON CONFLICT (site, external_id)
+    DO UPDATE по SCRAPE_BATCH_SIZE строк, а большие пачки - через COPY во
+    временную таблицу и один INSERT ... SELECT. С dedup перед записью каждой
+    строке ищется дубль на других сайтах (canonical_id), с geocoder -
+    проставляются latitude/longitude, с neighborhoods - neighborhood_id,
+    с exchange_rates - price_usd по текущему курсу.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = None,
+        copy_threshold: int = None,
+        dedup: DuplicateIndex = None,
+        cpu_pool: CPUPool = None,
+        geocoder: BatchGeocoder = None,
+        neighborhoods: NeighborhoodIndex = None,
+        exchange_rates: ExchangeRates = None,
+    ):
+        self.batch_size = max(1, batch_size or settings.SCRAPE_BATCH_SIZE)
+        self.copy_threshold = copy_threshold or settings.SCRAPE_COPY_THRESHOLD
+        self.dedup = dedup
+        self.cpu_pool = cpu_pool
+        self.geocoder = geocoder
+        self.neighborhoods = neighborhoods
+        self.exchange_rates = exchange_rates
+
+    def prepare_rows(self, properties: List[Dict], site_name: str) -> List[Dict]:
+        now = datetime.utcnow()
+        rows: Dict[str, Dict] = {}
+        for prop in properties:
+            if not isinstance(prop, dict):
+                continue
+            row = listing_to_row(prop, site_name, now)
+            # Одна строка на ключ: ON CONFLICT не может обновить строку дважды
+            if row:
+                rows[row["external_id"]] = row
+        return list(rows.values())
+
+    @asynccontextmanager
+    async def batch(self, site_name: str):
+        """Потоковая запись: add() по одному объявлению, flush каждые batch_size"""
+        batch = PropertyBatch(self, site_name)
+        try:
+            yield batch
+        finally:
+            await batch.flush()
+            logger.info(f"Saved {site_name}: {batch.result.new} new, {batch.result.updated} updated")
+
+    async def upsert(self, properties: List[Dict], site_name: str) -> UpsertResult:
+        rows = self.prepare_rows(properties, site_name)
+        if not rows:
+            return UpsertResult()
+
+        result = await self._write(rows)
+        logger.info(f"Saved {site_name}: {result.new} new, {result.updated} updated")
+        return result
+
+    async def _write(self, rows: List[Dict]) -> UpsertResult:
+        """Пачка от copy_threshold строк - через COPY, меньше - VALUES по batch_size"""
+        if len(rows) >= self.copy_threshold:
+            return await self._upsert_via_copy(rows)
+        result = UpsertResult()
+        for start in range(0, len(rows), self.batch_size):
+            result += await self._upsert_chunk(rows[start:start + self.batch_size])
+        return result
+
+    def _upsert_statement(self, insert, keys):
+        """
+        Upsert пачки, который возвращает и прежние цену/валюту строк (CTE
+        previous видит строки до апдейта) - по ним _price_changes решает,
+        что писать в price_history. keys - выборка/список (site, external_id)
+        записываемых строк.
+        """
+        target = properties_write_table
+        upserted = insert.on_conflict_do_update(
+            index_elements=["site", "external_id"],
+            set_={
+                **{column: insert.excluded[column] for column in UPDATE_COLUMNS},
+                **{
+                    column: func.coalesce(insert.excluded[column], target.c[column])
+                    for column in KEEP_ON_NULL_COLUMNS
+                },
+                # "Consultar precio" - оставляем прежнюю цену вместе с её валютой
+                **{
+                    column: case((insert.excluded.price.is_(None), target.c[column]), else_=insert.excluded[column])
+                    for column in PRICE_COLUMNS
+                },
+                "canonical_id": func.coalesce(target.c.canonical_id, insert.excluded.canonical_id),
+                "updated_at": func.now(),
+            },
+        ).returning(
+            target.c.id,
+            target.c.external_id,
+            target.c.canonical_id,
+            target.c.price,
+            target.c.currency,
+            literal_column("(xmax = 0)").label("inserted"),
+        ).cte("upserted")
+
+        previous = (
+            select(target.c.id, target.c.price, target.c.currency)
+            .where(tuple_(target.c.site, target.c.external_id).in_(keys))
+            .cte("previous")
+        )
+        # Только колонки CTE: databases строит по ним карту результата через
+        # str(column), и подзапрос с INSERT ... ON CONFLICT там не компилируется
+        return select(
+            upserted.c.id,
+            upserted.c.external_id,
+            upserted.c.canonical_id,
+            upserted.c.inserted,
+            upserted.c.price,
+            upserted.c.currency,
+            previous.c.price.label("old_price"),
+            previous.c.currency.label("old_currency"),
+        ).select_from(upserted.outerjoin(previous, previous.c.id == upserted.c.id))
+
+    @staticmethod
+    def _price_changes(records) -> List[Dict]:
+        """Строки price_history для объявлений, у которых сменилась цена или валюта"""
+        changes = []
+        for record in records:
+            old_price, new_price = record["old_price"], record["price"]
+            if old_price is None or new_price is None:
+                continue
+            currency_changed = record["old_currency"] != record["currency"]
+            change = new_price - old_price
+            if not change and not currency_changed:
+                continue
+            percentage = None
+            if not currency_changed and old_price > 0:
+                # DECIMAL(5, 2) в price_history
+                percentage = max(-999.99, min(999.99, round(change / old_price * 100, 2)))
+            changes.append({
+                "property_id": record["id"],
+                "old_price": old_price,
+                "new_price": new_price,
+                "old_currency": record["old_currency"],
+                "new_currency": record["currency"],
+                "change_type": "currency_change" if currency_changed else ("increase" if change > 0 else "decrease"),
+                "change_percentage": percentage,
+            })
+        return changes
+
+    async def _link(self, rows: List[Dict]):
+        # is None, а не not: у DuplicateIndex есть __len__, и пустой индекс ложен
+        if self.dedup is None:
+            return None, {}
+        # Нормализация текста и MinHash - в пуле процессов, поиск по индексу - здесь
+        signatures = await self.cpu_pool.signatures(rows) if self.cpu_pool else None
+        return self.dedup.link(rows, signatures)
+
+    @staticmethod
+    def _batch_canonical(rows: List[Dict], records, batch_links: Dict[int, int]) -> Dict[Any, Any]:
+        """{id записанной строки: canonical_id} для дублей внутри пачки - по id, выданным БД"""
+        by_key = {record["external_id"]: record for record in records}
+        canonical: Dict[Any, Any] = {}
+        # j < i: каноническая строка более ранней уже разрешена
+        for index, earlier in sorted(batch_links.items()):
+            record = by_key[rows[index]["external_id"]]
+            if record["canonical_id"]:
+                continue
+            target = by_key[rows[earlier]["external_id"]]
+            canonical[record["id"]] = canonical.get(target["id"]) or target["canonical_id"] or target["id"]
+        return canonical
+
+    def _canonical_updates(self, canonical: Dict[Any, Any]) -> List:
+        target = properties_write_table
+        return [
+            update(target)
+            .where(target.c.id == property_id, target.c.canonical_id.is_(None))
+            .values(canonical_id=canonical_id)
+            for property_id, canonical_id in canonical.items()
+        ]
+
+    async def _geocode(self, rows: List[Dict]):
+        if not self.geocoder:
+            return
+        try:
+            await self.geocoder.fill(rows)
+        except Exception as e:
+            # Без координат объявление всё равно нужно сохранить
+            logger.error(f"Geocoding failed for {len(rows)} rows: {e}")
+
+    def _canonicalize(self, rows: List[Dict]):
+        if not self.neighborhoods:
+            return
+        for row in rows:
+            row["neighborhood_id"] = self.neighborhoods.resolve_row(row)
+
+    async def _convert_prices(self, rows: List[Dict]):
+        if not self.exchange_rates:
+            return
+        await self.exchange_rates.refresh()
+        self.exchange_rates.fill(rows)
+
+    async def _upsert_chunk(self, rows: List[Dict]) -> UpsertResult:
+        self._canonicalize(rows)
+        await self._convert_prices(rows)
+        await self._geocode(rows)
+        signatures, batch_links = await self._link(rows)
+        query = self._upsert_statement(
+            pg_insert(properties_write_table).values(rows),
+            [(row["site"], row["external_id"]) for row in rows],
+        )
+        # Upsert и price_history - два запроса в одной транзакции
+        async with database.transaction():
+            records = await database.fetch_all(query)
+            changes = self._price_changes(records)
+            if changes:
+                await database.execute(pg_insert(PriceHistory.__table__).values(changes))
+            canonical = self._batch_canonical(rows, records, batch_links)
+            for statement in self._canonical_updates(canonical):
+                await database.execute(statement)
+        self._index(rows, signatures, records, canonical)
+        return self._count(records, changes)
+
+    async def _upsert_via_copy(self, rows: List[Dict]) -> UpsertResult:
+        self._canonicalize(rows)
+        await self._convert_prices(rows)
+        await self._geocode(rows)
+        signatures, batch_links = await self._link(rows)
+        staging = table("properties_staging", *(column(name) for name in WRITE_COLUMNS))
+        query = self._upsert_statement(
+            pg_insert(properties_write_table).from_select(
+                WRITE_COLUMNS, select(*(staging.c[name] for name in WRITE_COLUMNS))
+            ),
+            select(staging.c.site, staging.c.external_id),
+        )
+
+        async with database.connection() as connection:
+            async with connection.transaction():
+                raw = connection.raw_connection  # asyncpg.Connection
+                await raw.execute(
+                    "CREATE TEMP TABLE properties_staging "
+                    "(LIKE properties INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                await raw.copy_records_to_table(
+                    "properties_staging",
+                    records=[_copy_record(row) for row in rows],
+                    columns=WRITE_COLUMNS,
+                )
+                records = await connection.fetch_all(query)
+                changes = self._price_changes(records)
+                if changes:
+                    await connection.execute(pg_insert(PriceHistory.__table__).values(changes))
+                canonical = self._batch_canonical(rows, records, batch_links)
+                for statement in self._canonical_updates(canonical):
+                    await connection.execute(statement)
+        self._index(rows, signatures, records, canonical)
+        return self._count(records, changes)
+
+    async def sweep_missing(self, site_name: str, seen_since: datetime, max_missed: int) -> int:
+        """
+        Объявления сайта, не встреченные в обходе с seen_since: missed_cycles + 1,
+        после max_missed пропусков подряд - is_active = false. Один UPDATE на сайт.
+        """
+        target = properties_write_table
+        missed_cycles = target.c.missed_cycles + 1
+        stmt = (
+            update(target)
+            .where(
+                target.c.site == site_name,
+                target.c.is_active.is_(True),
+                target.c.last_seen_at < seen_since,
+            )
+            .values(missed_cycles=missed_cycles, is_active=missed_cycles < max_missed)
+            .returning(target.c.id, target.c.is_active)
+        )
+        records = await database.fetch_all(stmt)
+        removed = [record["id"] for record in records if not record["is_active"]]
+        if self.dedup is not None:
+            for property_id in removed:
+                self.dedup.remove(property_id)
+        logger.info(f"Sweep {site_name}: {len(records)} listings missing, {len(removed)} deactivated")
+        return len(removed)
+
+    def _index(self, rows: List[Dict], signatures, records, canonical: Dict[Any, Any]):
+        """Записанные строки - в индекс дублей, с canonical_id из БД (и из пачки)"""
+        if self.dedup is None:
+            return
+        by_key = {row["external_id"]: (row, signature) for row, signature in zip(rows, signatures)}
+        for record in records:
+            row, signature = by_key[record["external_id"]]
+            self.dedup.add(record["id"], row, canonical.get(record["id"], record["canonical_id"]), signature)
+
+    @staticmethod
+    def _count(records, changes: List[Dict]) -> UpsertResult:
+        new = sum(1 for record in records if record["inserted"])
+        return UpsertResult(new=new, updated=len(records) - new, price_changes=len(changes))
+
+
+class PropertyBatch:
+    """Буфер PropertyWriter.batch(): копит строки и сбрасывает их пачками"""
+
+    def __init__(self, writer: PropertyWriter, site_name: str):
+        self.writer = writer
+        self.site_name = site_name
+        self.result = UpsertResult()
+        self.db_seconds = 0.0
+        self._rows: Dict[str, Dict] = {}
+        self._lock = asyncio.Lock()
+
+    async def add(self, prop: Dict):
+        if not isinstance(prop, dict):
+            return
+        row = listing_to_row(prop, self.site_name, datetime.utcnow())
+        if row is None:
+            return
+        self._rows[row["external_id"]] = row
+        if len(self._rows) >= self.writer.batch_size:
+            await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._rows:
+                return
+            rows, self._rows = list(self._rows.values()), {}
+            started = time.monotonic()
+            try:
+                self.result += await self.writer._write(rows)
+            finally:
+                self.db_seconds += time.monotonic() - started
@@ -0,0 +1,293 @@
+# app/streaming.py - Инкрементальный разбор JSON из потоковых ответов
+import json
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Из результата Crawl4AI нужны только эти поля; html/markdown/links не разбираем
+CRAWL_RESULT_FIELDS = ("url", "status_code", "success", "error_message", "extracted_content")
+# Поля статуса асинхронной задачи (GET /crawl/job/{task_id})
+CRAWL_JOB_FIELDS = ("task_id", "status", "error")
+
+# Остаток строки до закрывающей кавычки; possessive-квантификаторы (3.11+)
+# не дают откатываться, если кавычка ещё не пришла
+_STRING_END_RE = re.compile(rb'(?:[^"\\]++|\\.)*+"', re.S)
+_VALUE_STOP_RE = re.compile(rb'["{}\[\],]')
+_WHITESPACE = b" \t\r\n"
+# Роли открытых контейнеров ответа /crawl
+_OBJECTS = {"top", "result"}
+
+
+class JSONArrayStreamParser:
+    """
+    Принимает текст кусками (токены генерации Ollama) и отдаёт элементы
+    верхнеуровневого JSON-массива, как только каждый из них закрыт.
+    Текст до первой "[" (```json и т.п.) пропускается.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._depth = 0          # 0 - вне массива, 1 - внутри массива, >1 - внутри элемента
+        self._in_string = False
+        self._escape = False
+        self._started = False
+        self.finished = False
+
+    def feed(self, text: str) -> List[Any]:
+        items: List[Any] = []
+        if self.finished:
+            return items
+
+        for char in text:
+            if not self._started:
+                if char == "[":
+                    self._started = True
+                    self._depth = 1
+                continue
+
+            if self._depth > 1:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 1:
+                    self._buffer = [char]
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1:
+                    items.append(self._decode())
+                elif self._depth == 0:
+                    self.finished = True
+                    break
+
+        return [item for item in items if item is not None]
+
+    def _decode(self) -> Any:
+        raw = "".join(self._buffer)
+        self._buffer = []
+        try:
+            return json.loads(raw)
+        except json.JSONDecodeError as e:
+            logger.warning(f"Skipping malformed streamed item: {e}")
+            return None
+
+
+class CrawlResultStreamParser:
+    """
+    Разбирает ответ Crawl4AI /crawl ({"results": [{...}]}) или статус задачи
+    /crawl/job ({"status": ..., "result": {"results": [...]}}) кусками байт,
+    не собирая тело целиком. По каждому результату в self.results попадают
+    поля CRAWL_RESULT_FIELDS (extracted_content - списком карточек), поля
+    задачи - в self.job, а карточки feed() отдаёт ещё и по мере закрытия.
+    Остальное (html, cleaned_html, markdown, links, media - основной объём
+    ответа) проматывается поиском кавычек и скобок: в памяти остаётся только
+    текущий кусок. Первые skip_results результатов (уже разобранные в
+    прошлом опросе задачи) проматываются целиком и в self.results не попадают.
+    """
+
+    def __init__(self, skip_results: int = 0):
+        self.skip_results = skip_results
+        self.skipped = 0
+        self.results: List[Dict[str, Any]] = []
+        self.job: Dict[str, Any] = {}
+        self.finished = False
+        self._buf = bytearray()
+        self._pos = 0
+        self._stack: List[str] = []
+        self._expect = "value"  # value | key | colon | next
+        self._key: Optional[str] = None
+        # Значение, которое проматываем (target=None) или копим для json.loads
+        self._raw = False
+        self._raw_target: Optional[str] = None
+        self._raw_start = 0
+        self._raw_depth = 0
+        self._raw_in_string = False
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        items: List[Dict] = []
+        if self.finished:
+            return items
+        self._buf += chunk
+        while not self.finished:
+            if self._raw:
+                if not self._scan_raw(items):
+                    break
+                continue
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos >= len(self._buf):
+                break
+            self._step(chr(self._buf[self._pos]))
+
+        # Прочитанное выбрасываем; копящееся значение держим с его начала
+        keep = self._raw_start if self._raw and self._raw_target else self._pos
+        del self._buf[:keep]
+        self._pos -= keep
+        self._raw_start -= keep
+        return items
+
+    @property
+    def result(self) -> Dict[str, Any]:
+        """Первый результат (в /crawl с одним URL он единственный)"""
+        return self.results[0] if self.results else {}
+
+    def close(self):
+        if not self.finished:
+            raise ValueError("Truncated Crawl4AI response")
+
+    def _step(self, char: str):
+        context = self._stack[-1] if self._stack else None
+        if self._expect == "key":
+            if char == '"':
+                self._start_raw("key")
+            elif char == "}":
+                self._close()
+            else:
+                raise ValueError(f"Unexpected {char!r} in Crawl4AI response")
+        elif self._expect == "colon":
+            if char != ":":
+                raise ValueError(f"Unexpected {char!r} in Crawl4AI response")
+            self._pos += 1
+            self._expect = "value"
+        elif self._expect == "next":
+            if char == ",":
+                self._pos += 1
+                self._expect = "key" if context in _OBJECTS else "value"
+            elif char in "}]":
+                self._close()
+            else:
+                raise ValueError(f"Unexpected {char!r} in Crawl4AI response")
+        elif char == "]" and context in ("results", "items"):
+            self._close()
+        elif context is None:
+            self._open("top", char)
+        elif context == "top" and self._key == "results" and char == "[":
+            self._open("results", char)
+        elif context == "top" and self._key == "result" and char == "{":
+            # Статус задачи: результаты вложены в "result"
+            self._open("top", char)
+        elif context == "top" and self._key in CRAWL_JOB_FIELDS:
+            self._start_raw("job:" + self._key)
+        elif context == "results" and char == "{" and self.skipped < self.skip_results:
+            self.skipped += 1
+            self._start_raw(None)
+        elif context == "results" and char == "{":
+            self.results.append({})
+            self._open("result", char)
+        elif context == "result" and self._key == "extracted_content" and char == "[":
+            self.results[-1]["extracted_content"] = []
+            self._open("items", char)
+        elif context == "result" and self._key in CRAWL_RESULT_FIELDS:
+            self._start_raw(self._key)
+        elif context == "items":
+            self._start_raw("item")
+        else:
+            self._start_raw(None)
+
+    def _open(self, role: str, char: str):
+        if char != ("{" if role in _OBJECTS else "["):
+            raise ValueError(f"Unexpected {char!r} in Crawl4AI response")
+        self._stack.append(role)
+        self._pos += 1
+        self._expect = "key" if role in _OBJECTS else "value"
+
+    def _close(self):
+        self._stack.pop()
+        self._pos += 1
+        self._expect = "next"
+        if not self._stack:
+            self.finished = True
+
+    def _start_raw(self, target: Optional[str]):
+        self._raw = True
+        self._raw_target = target
+        self._raw_start = self._pos
+        self._raw_depth = 0
+        self._raw_in_string = False
+
+    def _scan_raw(self, items: List[Dict]) -> bool:
+        """Дойти до конца значения; False - значение ещё не пришло целиком"""
+        buf, pos = self._buf, self._pos
+        while True:
+            if self._raw_in_string:
+                match = _STRING_END_RE.match(buf, pos)
+                if not match:
+                    # Кавычки в куске нет; висящий \ дочитаем со следующим куском
+                    end = len(buf)
+                    backslashes = 0
+                    while end - backslashes > pos and buf[end - backslashes - 1] == 0x5C:
+                        backslashes += 1
+                    self._pos = end - backslashes % 2
+                    return False
+                pos = match.end()
+                self._raw_in_string = False
+                if self._raw_depth == 0:
+                    break
+                continue
+
+            match = _VALUE_STOP_RE.search(buf, pos)
+            if not match:
+                self._pos = len(buf)
+                return False
+            pos = match.start()
+            char = buf[pos]
+            if char == 0x22:  # "
+                self._raw_in_string = True
+                pos += 1
+            elif char in b"{[":
+                self._raw_depth += 1
+                pos += 1
+            elif self._raw_depth and char in b"}]":
+                self._raw_depth -= 1
+                pos += 1
+                if self._raw_depth == 0:
+                    break
+            elif self._raw_depth == 0:
+                # Число/true/null заканчивается перед , } ]
+                break
+            else:
+                pos += 1
+
+        self._pos = pos
+        self._raw = False
+        target = self._raw_target
+        if target is None:
+            self._expect = "next"
+            return True
+        value = json.loads(bytes(buf[self._raw_start:pos]))
+        if target == "key":
+            self._key = value
+            self._expect = "colon"
+            return True
+        self._expect = "next"
+        if target == "item":
+            if isinstance(value, dict):
+                items.append(value)
+                self.results[-1]["extracted_content"].append(value)
+        elif target == "extracted_content":
+            # Crawl4AI отдаёт extracted_content и строкой с JSON внутри
+            if isinstance(value, str):
+                value = json.loads(value) if value.strip() else []
+            if isinstance(value, dict):
+                value = [value]
+            cards = [item for item in value or [] if isinstance(item, dict)]
+            items.extend(cards)
+            self.results[-1]["extracted_content"] = cards
+        elif target.startswith("job:"):
+            self.job[target[4:]] = value
+        else:
+            self.results[-1][target] = value
+        return True
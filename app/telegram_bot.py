@@ -513,11 +513,12 @@ async def fetch_properties(search_params: Dict[str, Any]) -> List[Dict]:
             if search_params.get('location') and search_params['location'] != 'any':
                 params['location'] = search_params['location'].replace('_', ' ').title()
             
+            # Бот спрашивает цену в USD - фильтруем по price_usd, а не по price в валюте объявления
             if search_params.get('min_price', 0) > 0:
-                params['min_price'] = search_params['min_price']
+                params['min_price_usd'] = search_params['min_price']
             
             if search_params.get('max_price', 0) > 0:
-                params['max_price'] = search_params['max_price']
+                params['max_price_usd'] = search_params['max_price']
             
             # Запрос к API
             response = await client.get(
@@ -881,7 +882,7 @@ async def process_property_type(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data.startswith("loc_"))
 async def process_location(callback: CallbackQuery, state: FSMContext):
     """Обработка выбора района"""
-    location = callback.data.split("_")[1]
+    location = callback.data.split("_", 1)[1]
     await state.update_data(location=location)
     
     data = await state.get_data()
@@ -0,0 +1,85 @@
+# app/worker.py - Отдельный воркер парсинга: забирает задачи из Redis Streams
+#
+# Запуск: python -m app.worker (можно поднять N копий на разных нодах)
+import asyncio
+import logging
+import signal
+
+from .config import settings
+from .job_queue import ScrapeJob, ScrapeJobQueue
+from .models import database
+from .scraper import PropertyScraper
+
+logging.basicConfig(level=settings.LOG_LEVEL, format=settings.LOG_FORMAT)
+logger = logging.getLogger(__name__)
+
+
+async def _heartbeat(queue: ScrapeJobQueue, job: ScrapeJob):
+    # Долгий сайт не должен выглядеть зависшим для XAUTOCLAIM
+    interval = queue.claim_idle_ms / 3000
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await queue.touch(job)
+        except Exception as e:
+            logger.warning(f"Heartbeat for job {job.id} failed: {e}")
+
+
+async def process_job(scraper: PropertyScraper, queue: ScrapeJobQueue, job: ScrapeJob):
+    if job.site not in scraper.sites_config:
+        logger.error(f"Job {job.id}: site {job.site} not configured, dropping")
+        await queue.ack(job)
+        return
+
+    heartbeat = asyncio.create_task(_heartbeat(queue, job))
+    try:
+        _, stats = await scraper._scrape(job.site, job.search_keys)
+        if stats is None or stats.aborted:
+            # Без XACK задача останется в pending: после claim_idle_ms её заберёт
+            # XAUTOCLAIM, после max_deliveries попыток - dead-letter
+            logger.warning(f"Job {job.id} ({job.site}) not completed, leaving it for retry")
+            return
+        await queue.ack(job)
+    finally:
+        heartbeat.cancel()
+        await asyncio.gather(heartbeat, return_exceptions=True)
+
+
+async def run_worker(concurrency: int = None):
+    concurrency = concurrency or settings.SCRAPE_WORKER_CONCURRENCY
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await database.connect()
+    scraper = PropertyScraper()
+    await scraper.start()
+    queue = ScrapeJobQueue.from_url()
+    await queue.ensure_group()
+    logger.info(f"Scrape worker {queue.consumer} started (concurrency={concurrency})")
+
+    running = set()
+    try:
+        while not stop.is_set():
+            free = concurrency - len(running)
+            if free <= 0:
+                await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            for job in await queue.claim(count=free, block_ms=2000):
+                task = asyncio.create_task(process_job(scraper, queue, job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+    finally:
+        # Недоделанные задачи не подтверждены - их заберёт другой воркер
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        await queue.close()
+        await scraper.close()
+        await database.disconnect()
+        logger.info(f"Scrape worker {queue.consumer} stopped")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
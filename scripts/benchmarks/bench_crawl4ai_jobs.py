@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# scripts/benchmarks/bench_crawl4ai_jobs.py - POST /crawl на каждый URL против пакетных задач /crawl/job
+#
+# Оба режима ходят в заглушку scripts/crawl4ai_stub.py (в процессе, через
+# httpx.ASGITransport) с одинаковой задержкой рендера страницы и одинаковым
+# потолком --renders страниц в рендере одновременно:
+#   per-url - POST /crawl с одним URL, не больше --renders запросов сразу
+#             (как _crawl_page под лимитом сайта)
+#   jobs    - Crawl4AIJobClient: по --batch-size URL в задаче, не больше
+#             --jobs задач сразу, у каждой semaphore_count = renders // jobs
+# Печатает время, число HTTP-запросов, время до первого результата и пик
+# одновременных рендеров в заглушке (должен совпадать у обоих режимов).
+#
+# Запуск из корня репозитория:
+#   python scripts/benchmarks/bench_crawl4ai_jobs.py --urls 200 --delay 0.5
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import aclosing
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+import httpx  # noqa: E402
+
+from app.crawl4ai_jobs import Crawl4AIJobClient  # noqa: E402
+from app.http_clients import HTTPClientRegistry, UpstreamConfig  # noqa: E402
+from app.streaming import CrawlResultStreamParser  # noqa: E402
+from crawl4ai_stub import create_app  # noqa: E402
+
+
+def make_registry(app) -> HTTPClientRegistry:
+    http = HTTPClientRegistry()
+    http.register("crawl4ai", UpstreamConfig(base_url="http://crawl4ai", max_connections=100, timeout=60.0))
+    # Вместо open(): клиент поверх ASGI-приложения заглушки, без сети
+    http._clients["crawl4ai"] = httpx.AsyncClient(base_url="http://crawl4ai", transport=httpx.ASGITransport(app=app))
+    return http
+
+
+async def run_per_url(http: HTTPClientRegistry, urls, renders: int):
+    semaphore = asyncio.Semaphore(renders)
+    first = None
+    started = time.monotonic()
+
+    async def crawl(url: str) -> int:
+        nonlocal first
+        async with semaphore:
+            parser = CrawlResultStreamParser()
+            items = []
+            async with http.stream("crawl4ai", "POST", "/crawl", json={"urls": [url], "crawler_config": {}}) as response:
+                async for chunk in response.aiter_bytes():
+                    items.extend(parser.feed(chunk))
+            parser.close()
+            first = first or time.monotonic() - started
+            return len(items)
+
+    counts = await asyncio.gather(*(crawl(url) for url in urls))
+    return sum(counts), first
+
+
+async def run_jobs(http: HTTPClientRegistry, urls, renders: int, jobs: int, batch_size: int, poll_interval: float):
+    client = Crawl4AIJobClient(http, max_in_flight=jobs, poll_interval=poll_interval, poll_max_interval=poll_interval * 4)
+    # Потолок рендеров делится между задачами, как лимит сайта в _crawl_batch
+    semaphore_count = max(1, renders // jobs)
+    first = None
+    started = time.monotonic()
+
+    async def crawl(batch) -> int:
+        nonlocal first
+        items = 0
+        async with aclosing(client.crawl(batch, {"semaphore_count": semaphore_count})) as results:
+            async for result in results:
+                first = first or time.monotonic() - started
+                items += len(result.get("extracted_content") or [])
+        return items
+
+    batches = [urls[i:i + batch_size] for i in range(0, len(urls), batch_size)]
+    counts = await asyncio.gather(*(crawl(batch) for batch in batches))
+    return sum(counts), first
+
+
+async def bench(args):
+    urls = [f"https://www.example.com/propiedades/pagina-{i}" for i in range(args.urls)]
+    print(f"{'mode':<9}{'items':>8}{'seconds':>10}{'first s':>10}{'requests':>10}{'renders':>9}")
+    for mode in ("per-url", "jobs"):
+        # Заглушка сама не ограничивает рендер сильнее --renders
+        app = create_app(delay=args.delay, jitter=args.delay / 5, listings=args.listings, html_kb=args.html_kb,
+                         concurrency=args.renders)
+        http = make_registry(app)
+        started = time.perf_counter()
+        if mode == "per-url":
+            items, first = await run_per_url(http, urls, args.renders)
+        else:
+            items, first = await run_jobs(http, urls, args.renders, args.jobs, args.batch_size, args.poll_interval)
+        elapsed = time.perf_counter() - started
+        crawler = app.state.crawler
+        requests = sum(crawler.requests.values())
+        print(f"{mode:<9}{items:>8}{elapsed:>10.2f}{first:>10.2f}{requests:>10}{crawler.peak_rendering:>9}")
+        await http.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=200)
+    parser.add_argument("--delay", type=float, default=0.5, help="Секунд рендера одной страницы в заглушке")
+    parser.add_argument("--listings", type=int, default=20)
+    parser.add_argument("--html-kb", type=int, default=100)
+    parser.add_argument("--renders", type=int, default=4, help="Страниц в рендере одновременно (оба режима)")
+    parser.add_argument("--jobs", type=int, default=1, help="Задач одновременно в режиме jobs")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--poll-interval", type=float, default=0.2)
+    args = parser.parse_args()
+    if args.renders % args.jobs:
+        parser.error("--renders must be a multiple of --jobs")
+    asyncio.run(bench(args))
+
+
+if __name__ == "__main__":
+    main()
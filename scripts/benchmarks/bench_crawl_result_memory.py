@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# scripts/benchmarks/bench_crawl_result_memory.py - Пиковая память разбора ответа Crawl4AI
+#
+# Генерирует ответ /crawl заданного размера (по умолчанию 50 МБ: html,
+# cleaned_html, markdown, links, media и extracted_content со строкой JSON,
+# как отдаёт Crawl4AI) и разбирает его двумя способами, каждый в отдельном
+# процессе:
+#   full   - response.json() по всему телу (как было в scrape_single_site)
+#   stream - aiter_bytes() + CrawlResultStreamParser (как сейчас в _crawl_page)
+# Тело отдаётся через httpx.MockTransport кусками из файла, как из сети.
+# Заодно EventLoopMonitor меряет, насколько разбор задерживает event loop:
+# парсер кормится на loop'е, и самый долгий feed() - это опоздание API.
+#
+# Запуск из корня репозитория:
+#   python scripts/benchmarks/bench_crawl_result_memory.py --size-mb 50
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+import httpx  # noqa: E402
+
+from app.loop_monitor import EventLoopMonitor  # noqa: E402
+from app.streaming import CrawlResultStreamParser  # noqa: E402
+
+CHUNK_SIZE = 64 * 1024
+
+
+def generate_fixture(path: Path, size_mb: int, listings: int, seed: int = 7):
+    """Ответ /crawl: большие html/markdown и небольшой extracted_content"""
+    rnd = random.Random(seed)
+    cards = [
+        {
+            "title": f"Departamento {i} ambientes en Palermo",
+            "price": f"USD {rnd.randint(50, 900)}.000",
+            "location": "Av. Santa Fe 3200, Palermo, Capital Federal",
+            "details": f"{rnd.randint(30, 200)} m² · {rnd.randint(1, 4)} dorm. · {rnd.randint(1, 3)} baños",
+            "url": f"/propiedades/departamento-{i}",
+        }
+        for i in range(listings)
+    ]
+    card_html = (
+        '<div class="listing-card"><h2 class="card-title">Departamento en venta</h2>'
+        '<span class="price">USD 120.000</span><p class="address">Av. Santa Fe 3200</p>'
+        '<a href="/propiedades/1">Ver "ficha"</a></div>\n'
+    )
+    card_markdown = "## Departamento en venta\n**USD 120.000** · Av. Santa Fe 3200\n[Ver ficha](/propiedades/1)\n\n"
+    # Доли тела примерно как в реальных ответах: html и cleaned_html основные
+    budget = size_mb * 1024 * 1024
+    html = card_html * (budget * 45 // 100 // len(card_html))
+    cleaned_html = card_html * (budget * 30 // 100 // len(card_html))
+    markdown = card_markdown * (budget * 20 // 100 // len(card_markdown))
+    links = [{"href": f"/propiedades/{i}", "text": "Ver ficha"} for i in range(budget // 2 // 100 // 40)]
+    body = {
+        "success": True,
+        "results": [{
+            "url": "https://www.example.com/departamentos/venta/palermo",
+            "html": html,
+            "cleaned_html": cleaned_html,
+            "markdown": markdown,
+            "links": {"internal": links, "external": []},
+            "media": {"images": [{"src": f"/img/{i}.jpg", "alt": ""} for i in range(len(links) // 4)]},
+            "status_code": 200,
+            "success": True,
+            "error_message": None,
+            "extracted_content": json.dumps(cards, ensure_ascii=False),
+        }],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(body, f, ensure_ascii=False)
+
+
+def memory_kb(field: str) -> int:
+    """VmRSS/VmHWM из /proc: ru_maxrss переживает exec и показал бы пик родителя"""
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    raise RuntimeError(f"{field} not found in /proc/self/status")
+
+
+async def parse(mode: str, fixture: Path):
+    monitor = EventLoopMonitor(interval=0.001, window=100_000)
+    monitor.start()
+    try:
+        items = await parse_body(mode, fixture)
+        # Замер, проспавший последний синхронный кусок, должен успеть записаться
+        await asyncio.sleep(monitor.interval * 5)
+    finally:
+        await monitor.stop()
+    return items, monitor.stats()
+
+
+async def parse_body(mode: str, fixture: Path):
+    async def body():
+        with open(fixture, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                # Отдаём loop между кусками, как при чтении из сокета
+                await asyncio.sleep(0)
+                yield chunk
+
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=body()))
+    async with httpx.AsyncClient(base_url="http://crawl4ai", transport=transport) as client:
+        if mode == "full":
+            response = await client.post("/crawl", json={"urls": ["x"]})
+            result = (response.json().get("results") or [{}])[0]
+            items = result.get("extracted_content") or []
+            if isinstance(items, str):
+                items = json.loads(items)
+            return len(items)
+        parser = CrawlResultStreamParser()
+        items = []
+        async with client.stream("POST", "/crawl", json={"urls": ["x"]}) as response:
+            async for chunk in response.aiter_bytes():
+                items.extend(parser.feed(chunk))
+        parser.close()
+        return len(items)
+
+
+def run_child(mode: str, fixture: Path):
+    baseline = memory_kb("VmRSS")
+    started = time.perf_counter()
+    items, lag = asyncio.run(parse(mode, fixture))
+    elapsed = time.perf_counter() - started
+    peak = memory_kb("VmHWM")
+    print(json.dumps({
+        "items": items, "seconds": elapsed, "baseline_kb": baseline, "peak_kb": peak,
+        "lag_p99_ms": lag.get("p99_ms", 0.0), "lag_max_ms": lag.get("max_ms", 0.0),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=50)
+    parser.add_argument("--listings", type=int, default=500, help="Карточек в extracted_content")
+    parser.add_argument("--fixture", type=Path, help="Готовый ответ /crawl вместо сгенерированного")
+    parser.add_argument("--child", choices=["full", "stream"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.fixture)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fixture = args.fixture
+        if fixture is None:
+            fixture = Path(tmp) / "crawl_result.json"
+            generate_fixture(fixture, args.size_mb, args.listings)
+        print(f"fixture: {fixture.stat().st_size / 1024 / 1024:.1f} MB")
+        print(
+            f"{'mode':<8}{'items':>8}{'seconds':>10}{'peak RSS MB':>14}{'over baseline MB':>18}"
+            f"{'lag p99 ms':>12}{'lag max ms':>12}"
+        )
+        for mode in ("full", "stream"):
+            # Отдельный процесс на режим: VmHWM - пик за всю жизнь процесса
+            output = subprocess.run(
+                [sys.executable, __file__, "--child", mode, "--fixture", str(fixture)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            stats = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"{mode:<8}{stats['items']:>8}{stats['seconds']:>10.2f}{stats['peak_kb'] / 1024:>14.1f}"
+                f"{(stats['peak_kb'] - stats['baseline_kb']) / 1024:>18.1f}"
+                f"{stats['lag_p99_ms']:>12.1f}{stats['lag_max_ms']:>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
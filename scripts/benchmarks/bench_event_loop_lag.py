@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# scripts/benchmarks/bench_event_loop_lag.py - Задержка event loop: разбор inline vs CPUPool
+#
+# Гоняет CPU-bound часть прохода по сайту (разбор HTML из fixtures/html,
+# regex, MinHash-сигнатуры) и параллельно меряет EventLoopMonitor'ом, насколько
+# опаздывает loop. Эту задержку получает каждый запрос к API (/properties и т.д.),
+# пока в том же процессе идёт парсинг.
+#
+# Запуск из корня репозитория:
+#   python scripts/benchmarks/bench_event_loop_lag.py --pages 60 --workers 2
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+from app.cpu_pool import CPUPool  # noqa: E402
+from app.loop_monitor import EventLoopMonitor  # noqa: E402
+from app.storage import listing_to_row  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+async def scrape_pages(pool: CPUPool, pages, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(site, html, url):
+        async with semaphore:
+            items = await pool.parse_html(site, html, url)
+            records, _ = await pool.regex_split([dict(item, site=site) for item in items])
+            now = datetime.utcnow()
+            await pool.signatures([row for row in (listing_to_row(r, site, now) for r in records) if row])
+            # Сетевое ожидание между страницами, как при реальном краулинге
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(*(one(*page) for page in pages))
+
+
+async def measure(name: str, pool: CPUPool, pages, concurrency: int):
+    pool.start()
+    # Прогрев: старт процессов пула не должен попасть в замер
+    await scrape_pages(pool, pages[:concurrency], concurrency)
+    monitor = EventLoopMonitor(interval=0.01, window=100000)
+    monitor.start()
+    started = time.perf_counter()
+    await scrape_pages(pool, pages, concurrency)
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+    pool.close()
+    lag = monitor.stats()
+    print(f"{name:<10}{elapsed:>10.2f}{lag['p50_ms']:>10.2f}{lag['p99_ms']:>10.2f}{lag['max_ms']:>10.2f}")
+
+
+async def run(args):
+    config = json.loads((ROOT / "configs" / "sites_config.json").read_text())
+    manifest = json.loads((FIXTURES / "html_pages.json").read_text())
+    sites = list(manifest["pages"])
+    pages = [
+        (site, (FIXTURES / manifest["pages"][site]["file"]).read_text(), manifest["pages"][site]["url"])
+        for site in sites
+    ] * args.pages
+
+    print(f"pages: {len(pages)}, concurrency: {args.concurrency}, pool workers: {args.workers}")
+    print(f"{'mode':<10}{'seconds':>10}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    await measure("inline", CPUPool(config, sites, workers=0, chunk_size=args.chunk_size), pages, args.concurrency)
+    await measure(
+        "pool", CPUPool(config, sites, workers=args.workers, chunk_size=args.chunk_size), pages, args.concurrency
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20, help="Сколько раз разобрать каждую страницу-фикстуру")
+    parser.add_argument("--concurrency", type=int, default=4, help="Страниц в работе одновременно")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+# scripts/benchmarks/bench_extraction.py - Сравнение regex-only / LLM-only / tiered извлечения
+#
+# LLM не вызывается: ответы Ollama и их латентность берутся из записанной
+# фикстуры, поэтому бенчмарк воспроизводим офлайн.
+#
+# Запуск из корня репозитория:
+#   python scripts/benchmarks/bench_extraction.py --repeat 20 --latency-scale 0.05
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+from app.extraction import ExtractionEngine  # noqa: E402
+from app.regex_extractor import RegexExtractor  # noqa: E402
+
+FIXTURE = Path(__file__).parent / "fixtures" / "extraction_listings.json"
+
+
+def load_fixture(repeat: int):
+    data = json.loads(FIXTURE.read_text())
+    raw, recorded = [], {}
+    for copy in range(repeat):
+        for entry in data["items"]:
+            item = dict(entry["raw"], url=f"{entry['raw']['url']}#{copy}")
+            raw.append(item)
+            recorded[item["url"]] = entry["llm"]
+    return data, raw, recorded
+
+
+def make_llm(recorded, latency, scale):
+    async def extract_chunk(items, site_name, emit):
+        await asyncio.sleep((latency["per_request"] + latency["per_item"] * len(items)) * scale)
+        return [recorded.get(item.get("url")) for item in items]
+
+    return extract_chunk
+
+
+async def run(args):
+    data, raw, recorded = load_fixture(args.repeat)
+    config = json.loads((ROOT / "configs" / "sites_config.json").read_text())
+    regex = RegexExtractor(config["data_processing"])
+    engine = ExtractionEngine(
+        make_llm(recorded, data["llm_latency_seconds"], args.latency_scale),
+        fallback=lambda items: [dict(item) for item in items],
+        concurrency=args.concurrency,
+    )
+
+    results = {}
+
+    started = time.perf_counter()
+    records, incomplete = regex.split(raw)
+    results["regex-only"] = (time.perf_counter() - started, len(raw) - len(incomplete))
+
+    started = time.perf_counter()
+    await engine.extract(raw, "benchmark")
+    results["llm-only"] = (time.perf_counter() - started, len(raw))
+
+    started = time.perf_counter()
+    records, incomplete = regex.split(raw)
+    if incomplete:
+        await engine.extract([record for _, record in incomplete], "benchmark")
+    results["tiered"] = (time.perf_counter() - started, len(raw))
+
+    print(f"items: {len(raw)}, llm latency scale: {args.latency_scale}, concurrency: {args.concurrency}")
+    print(f"regex resolved {len(raw) - len(incomplete)}/{len(raw)} items without LLM")
+    print(f"{'mode':<12}{'seconds':>10}{'complete':>10}{'items/s':>12}")
+    for mode, (elapsed, complete) in results.items():
+        print(f"{mode:<12}{elapsed:>10.3f}{complete:>10}{complete / elapsed:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=10, help="Сколько раз размножить фикстуру")
+    parser.add_argument(
+        "--latency-scale", type=float, default=0.05,
+        help="Множитель записанной латентности Ollama (1.0 - как в проде)",
+    )
+    parser.add_argument("--concurrency", type=int, default=2, help="Параллельных запросов к LLM")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
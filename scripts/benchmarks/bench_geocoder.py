@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# scripts/benchmarks/bench_geocoder.py - Скорость и точность офлайн-геокодера
+#
+# Генерирует адреса по справочнику configs/caba_gazetteer.json в том виде, в
+# каком их пишут в объявлениях: сокращения, "al 3.200", этаж/квартира, баррио,
+# "CABA", опечатки в названии улицы. Ожидаемая точка - интерполяция по той же
+# улице без шума, так что меряется устойчивость нормализации и нечёткого поиска.
+#
+# Запуск из корня репозитория:
+#   python scripts/benchmarks/bench_geocoder.py --addresses 20000
+import argparse
+import math
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+from app.geocoder import Gazetteer, Geocoder, normalize_address  # noqa: E402
+
+UNITS = ["", ", 4°B", " piso 3 dto A", ", PB", ", depto 12", " entre Gorriti y Honduras"]
+SUFFIXES = ["", ", CABA", ", Capital Federal", ", Ciudad de Buenos Aires, Argentina"]
+ALPHABET = "abcdefghijklmnopqrstuvwxyz"
+
+
+def typo(name: str, rnd: random.Random) -> str:
+    """Одна опечатка в длинном слове: замена, пропуск или перестановка букв"""
+    words = name.split()
+    candidates = [i for i, word in enumerate(words) if len(word) > 5]
+    if not candidates:
+        return name
+    i = rnd.choice(candidates)
+    word = words[i]
+    pos = rnd.randrange(1, len(word) - 1)
+    kind = rnd.randrange(3)
+    if kind == 0:
+        word = word[:pos] + rnd.choice(ALPHABET) + word[pos + 1:]
+    elif kind == 1:
+        word = word[:pos] + word[pos + 1:]
+    else:
+        word = word[:pos - 1] + word[pos] + word[pos - 1] + word[pos + 1:]
+    words[i] = word
+    return " ".join(words)
+
+
+def make_addresses(gazetteer: Gazetteer, count: int, typo_share: float, seed: int):
+    rnd = random.Random(seed)
+    streets = list(gazetteer.streets.values())
+    neighborhoods = list(gazetteer.neighborhoods)
+    samples = []
+    for _ in range(count):
+        street = rnd.choice(streets)
+        number = rnd.randint(street.numbers[0], street.numbers[-1])
+        name = street.name
+        if name.startswith("Avenida ") and rnd.random() < 0.5:
+            name = rnd.choice(["Av. ", "Av ", "Avda. "]) + name[len("Avenida "):]
+        if rnd.random() < typo_share:
+            name = typo(name, rnd)
+        number_text = f"{number:,}".replace(",", ".") if rnd.random() < 0.3 else str(number)
+        if rnd.random() < 0.2:
+            number_text = "al " + number_text
+        neighborhood = f", {rnd.choice(neighborhoods)}" if rnd.random() < 0.5 else ""
+        text = f"{name} {number_text}{rnd.choice(UNITS)}{neighborhood}{rnd.choice(SUFFIXES)}"
+        samples.append((text, street.locate(number)))
+    return samples
+
+
+def distance_m(a, b) -> float:
+    lat = math.radians((a[0] + b[0]) / 2)
+    dy = (a[0] - b[0]) * 111_320
+    dx = (a[1] - b[1]) * 111_320 * math.cos(lat)
+    return math.hypot(dx, dy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--addresses", type=int, default=20000)
+    parser.add_argument("--typos", type=float, default=0.3, help="Доля адресов с опечаткой в улице")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    gazetteer = Gazetteer.load(str(ROOT / "configs" / "caba_gazetteer.json"))
+    geocoder = Geocoder(gazetteer)
+    print(f"gazetteer {gazetteer.version}: {len(gazetteer.streets)} streets, "
+          f"{len(gazetteer.neighborhoods)} neighborhoods, loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    samples = make_addresses(gazetteer, args.addresses, args.typos, args.seed)
+    started = time.perf_counter()
+    keys = [normalize_address(text) for text, _ in samples]
+    normalized = time.perf_counter() - started
+    started = time.perf_counter()
+    points = geocoder.geocode_many(keys)
+    geocoded = time.perf_counter() - started
+
+    by_address = [(point, expected) for point, (_, expected) in zip(points, samples)
+                  if point and point.precision == "address"]
+    fallback = sum(1 for point in points if point and point.precision == "neighborhood")
+    within_100m = sum(1 for point, expected in by_address
+                      if distance_m((point.latitude, point.longitude), expected) <= 100)
+
+    total = normalized + geocoded
+    print(f"addresses: {len(samples)}, typo share: {args.typos}")
+    print(f"normalize: {len(samples) / normalized:,.0f}/s, geocode: {len(samples) / geocoded:,.0f}/s, "
+          f"end to end: {len(samples) / total:,.0f}/s")
+    print(f"street+number: {len(by_address) / len(samples):.1%} "
+          f"(within 100 m of expected: {within_100m / max(1, len(by_address)):.1%}), "
+          f"neighborhood only: {fallback / len(samples):.1%}, "
+          f"unresolved: {sum(1 for point in points if not point) / len(samples):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# scripts/benchmarks/bench_html_extraction.py - Нативный разбор по selectors vs Crawl4AI
+#
+# Страницы выдачи сохранены в fixtures/html; меряется разбор lxml и точность -
+# доля полей, совпавших с ожидаемыми карточками из fixtures/html_pages.json.
+# С --crawl4ai-url та же сохранённая страница рендерится локальным Crawl4AI
+# (POST /crawl с raw:-URL и crawler_config сайта) - время рендера и точность
+# его extracted_content для сравнения. Сеть до порталов не нужна ни в одном режиме.
+#
+# Запуск из корня репозитория:
+#   python scripts/benchmarks/bench_html_extraction.py --repeat 50
+#   docker compose up -d crawl4ai
+#   python scripts/benchmarks/bench_html_extraction.py --crawl4ai-url http://localhost:11235
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+import httpx  # noqa: E402
+
+from app.html_extractor import HTMLExtractor  # noqa: E402
+from app.regex_extractor import RegexExtractor  # noqa: E402
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def accuracy(items, expected):
+    """(совпавших полей, всего полей) - карточки сопоставляются по url"""
+    by_url = {item.get("url"): item for item in items}
+    matched = total = 0
+    for card in expected:
+        item = by_url.get(card["url"], {})
+        for field, value in card.items():
+            total += 1
+            matched += item.get(field) == value
+    return matched, total
+
+
+def render_crawl4ai(
+    client: httpx.Client, html: str, crawler_config: Dict, repeat: int
+) -> Tuple[float, Optional[List[Dict]]]:
+    """Среднее время POST /crawl сохранённой страницы и карточки последнего рендера"""
+    items = None
+    started = time.perf_counter()
+    for _ in range(repeat):
+        response = client.post("/crawl", json={"urls": [f"raw:{html}"], "crawler_config": crawler_config})
+        response.raise_for_status()
+        result = (response.json().get("results") or [{}])[0]
+        content = result.get("extracted_content")
+        items = json.loads(content) if isinstance(content, str) else content
+    return (time.perf_counter() - started) / repeat, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50, help="Разборов каждой страницы")
+    parser.add_argument("--crawl4ai-url", help="Crawl4AI для сравнения, например http://localhost:11235")
+    parser.add_argument("--crawl4ai-repeat", type=int, default=3, help="Рендеров каждой страницы в Crawl4AI")
+    args = parser.parse_args()
+
+    client = None
+    if args.crawl4ai_url:
+        headers = {}
+        if os.environ.get("CRAWL4AI_API_TOKEN"):
+            headers["Authorization"] = f"Bearer {os.environ['CRAWL4AI_API_TOKEN']}"
+        client = httpx.Client(base_url=args.crawl4ai_url, headers=headers, timeout=120.0)
+
+    manifest = json.loads((FIXTURES / "html_pages.json").read_text())
+    config = json.loads((ROOT / "configs" / "sites_config.json").read_text())
+    regex = RegexExtractor(config["data_processing"])
+
+    header = f"{'site':<14}{'cards':>7}{'parse ms':>10}{'fields':>12}{'no-LLM':>8}"
+    if client:
+        header += f"{'crawl4ai s':>12}{'c4ai fields':>13}"
+    print(header)
+    totals = {"native": 0.0, "crawl4ai": 0.0}
+    for site, page in manifest["pages"].items():
+        html = (FIXTURES / page["file"]).read_text()
+        site_config = config["sites"][site]
+        extractor = HTMLExtractor(site, site_config["selectors"])
+
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            items = extractor.extract(html, page["url"])
+        parse = (time.perf_counter() - started) / args.repeat
+
+        totals["native"] += parse
+
+        matched, total = accuracy(items, page["expected"])
+        _, incomplete = regex.split([dict(item, site=site) for item in items])
+        line = f"{site:<14}{len(items):>7}{parse * 1000:>10.2f}{f'{matched}/{total}':>12}{len(items) - len(incomplete):>8}"
+        if client:
+            render, rendered = render_crawl4ai(
+                client, html, dict(site_config.get("crawler_config", {})), args.crawl4ai_repeat
+            )
+            totals["crawl4ai"] += render
+            c4ai_matched, c4ai_total = accuracy(rendered or [], page["expected"])
+            line += f"{render:>12.2f}{f'{c4ai_matched}/{c4ai_total}':>13}"
+        print(line)
+
+    # Время сети до портала сюда не входит: у нативного пути это один GET,
+    # у Crawl4AI - загрузка страницы со всеми ресурсами в браузере
+    summary = f"per-page total: native parse {totals['native'] * 1000:.1f}ms"
+    if client:
+        client.close()
+        summary += f", crawl4ai render {totals['crawl4ai']:.2f}s"
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
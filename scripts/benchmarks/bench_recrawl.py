@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# scripts/benchmarks/bench_recrawl.py - Фиксированный цикл vs адаптивный RecrawlScheduler
+#
+# Симуляция без сети: новые объявления в лентах появляются пуассоновским
+# потоком с заданной частотой, обход ленты мгновенный. Сравниваются число
+# обходов и среднее время от появления объявления до его обнаружения.
+#
+# Запуск из корня репозитория:
+#   python scripts/benchmarks/bench_recrawl.py --hours 72
+import argparse
+import os
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "benchmark")
+
+from app.recrawl import RecrawlScheduler  # noqa: E402
+
+# Новых объявлений в час: горячие ленты аренды и спокойные ленты продажи
+FEED_RATES = {
+    "zonaprop": {"alquiler_caba": 40, "venta_caba": 12, "alquiler_palermo": 15, "alquiler_recoleta": 6},
+    "argenprop": {"alquiler_caba": 25, "venta_caba": 8, "alquiler_palermo": 9, "alquiler_recoleta": 4},
+    "properati": {"alquiler_caba": 10, "venta_caba": 5, "casas_alquiler": 0.5},
+    "remax": {"alquiler_caba": 2, "venta_caba": 1},
+    "mercadolibre": {"alquiler_caba": 20, "venta_caba": 6, "departamentos": 10},
+}
+
+
+def arrivals(rate_per_hour: float, horizon: float, rng: random.Random):
+    t, result = 0.0, []
+    while rate_per_hour > 0:
+        t += rng.expovariate(rate_per_hour / 3600)
+        if t > horizon:
+            return result
+        result.append(t)
+    return result
+
+
+def detection_delays(crawl_times, listing_times):
+    """Объявление обнаруживается ближайшим обходом после появления"""
+    delays, crawls = [], sorted(crawl_times)
+    i = 0
+    for t in listing_times:
+        while i < len(crawls) and crawls[i] < t:
+            i += 1
+        if i < len(crawls):
+            delays.append(crawls[i] - t)
+    return delays
+
+
+def simulate(scheduler, horizon, listings):
+    crawls = {key: [] for key in listings}
+    now = 0.0
+    while now <= horizon:
+        due = scheduler.pop_due(now=now)
+        for site, keys in due.items():
+            for key in keys:
+                previous = crawls[(site, key)][-1] if crawls[(site, key)] else 0.0
+                new = sum(1 for t in listings[(site, key)] if previous < t <= now)
+                crawls[(site, key)].append(now)
+                scheduler.record(site, key, new, datetime.utcnow(), complete=True, now=now)
+        now += max(scheduler.seconds_until_next(now=now), 1.0)
+    return crawls
+
+
+def report(name, crawls, listings, warmup):
+    delays = []
+    for key, times in listings.items():
+        delays += detection_delays(crawls[key], [t for t in times if t > warmup])
+    total = sum(len([t for t in times if t > warmup]) for times in crawls.values())
+    print(f"{name:10} crawls={total:5d}  mean time-to-detect={sum(delays) / len(delays) / 60:6.1f} min")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hours", type=float, default=72)
+    parser.add_argument("--interval", type=float, default=3600)
+    parser.add_argument("--min-interval", type=float, default=600)
+    parser.add_argument("--max-interval", type=float, default=14400)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    horizon = args.hours * 3600
+    warmup = 6 * 3600
+    sites_config = {site: {"search_urls": {key: "" for key in feeds}} for site, feeds in FEED_RATES.items()}
+    listings = {
+        (site, key): arrivals(rate, horizon, rng)
+        for site, feeds in FEED_RATES.items()
+        for key, rate in feeds.items()
+    }
+
+    fixed = {key: [t for t in range(0, int(horizon) + 1, int(args.interval))] for key in listings}
+    report("fixed", fixed, listings, warmup)
+
+    scheduler = RecrawlScheduler(sites_config, args.interval, args.min_interval, args.max_interval, now=0.0)
+    adaptive = simulate(scheduler, horizon, listings)
+    report("adaptive", adaptive, listings, warmup)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# scripts/crawl4ai_stub.py - Локальная заглушка Crawl4AI для проверки краулера без браузеров
+#
+# Отвечает как Crawl4AI: POST /crawl (синхронно), POST /crawl/job -> task_id,
+# GET /crawl/job/{task_id} - статус с уже готовыми результатами. Каждый URL
+# "рендерится" --delay секунд (±--jitter), одновременно не больше
+# --concurrency страниц на задачу; в результате html-балласт и extracted_content
+# с --listings карточками. URL, содержащие --fail-marker, отдают 503.
+#
+# Запуск:
+#   python scripts/crawl4ai_stub.py --port 11235 --delay 1.0
+#   CRAWL4AI_URL=http://localhost:11235 python -m app.main ...
+# В бенчмарках/проверках - без сети через httpx.ASGITransport(app=create_app(...)).
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, List
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse
+
+
+class StubCrawler:
+    def __init__(self, delay: float, jitter: float, listings: int, html_kb: int, concurrency: int, fail_marker: str):
+        self.delay = delay
+        self.jitter = jitter
+        self.listings = listings
+        self.html = "<div class='listing-card'>...</div>" * (html_kb * 1024 // 36)
+        self.concurrency = concurrency
+        self.fail_marker = fail_marker
+        self.jobs: Dict[str, Dict] = {}
+        self.requests = {"crawl": 0, "submit": 0, "poll": 0}
+        # Страниц в рендере сейчас и максимум за всё время - по всем запросам и задачам
+        self.rendering = 0
+        self.peak_rendering = 0
+
+    async def render(self, url: str, semaphore: asyncio.Semaphore) -> Dict:
+        async with semaphore:
+            self.rendering += 1
+            self.peak_rendering = max(self.peak_rendering, self.rendering)
+            try:
+                await asyncio.sleep(max(0.0, self.delay + random.uniform(-self.jitter, self.jitter)))
+            finally:
+                self.rendering -= 1
+        if self.fail_marker and self.fail_marker in url:
+            return {"url": url, "status_code": 503, "success": False, "error_message": "stub failure",
+                    "html": "", "extracted_content": None}
+        cards = [
+            {
+                "title": f"Departamento {i} en {url.rsplit('/', 1)[-1]}",
+                "price": f"USD {100 + i}.000",
+                "location": "Palermo, Capital Federal",
+                "url": f"{url}/ficha-{i}",
+            }
+            for i in range(self.listings)
+        ]
+        return {
+            "url": url,
+            "html": self.html,
+            "markdown": self.html,
+            "status_code": 200,
+            "success": True,
+            "error_message": None,
+            "extracted_content": json.dumps(cards),
+        }
+
+    async def run_job(self, task_id: str, urls: List[str], semaphore_count: int):
+        job = self.jobs[task_id]
+        job["status"] = "processing"
+        semaphore = asyncio.Semaphore(max(1, min(self.concurrency, semaphore_count)))
+
+        async def one(url: str):
+            # Результаты видны в статусе по мере готовности, как у arun_many(stream=True)
+            job["results"].append(await self.render(url, semaphore))
+
+        await asyncio.gather(*(one(url) for url in urls))
+        job["status"] = "completed"
+        job["completed_at"] = time.time()
+
+
+def create_app(
+    delay: float = 1.0,
+    jitter: float = 0.2,
+    listings: int = 20,
+    html_kb: int = 200,
+    concurrency: int = 8,
+    fail_marker: str = "fail",
+) -> FastAPI:
+    crawler = StubCrawler(delay, jitter, listings, html_kb, concurrency, fail_marker)
+    app = FastAPI(title="Crawl4AI stub")
+    app.state.crawler = crawler
+
+    @app.post("/crawl")
+    async def crawl(body: Dict):
+        crawler.requests["crawl"] += 1
+        semaphore = asyncio.Semaphore(crawler.concurrency)
+        results = await asyncio.gather(*(crawler.render(url, semaphore) for url in body.get("urls", [])))
+        return {"success": True, "results": list(results)}
+
+    @app.post("/crawl/job", status_code=202)
+    async def submit(body: Dict):
+        crawler.requests["submit"] += 1
+        urls = body.get("urls") or []
+        if not urls:
+            raise HTTPException(400, "urls required")
+        task_id = uuid.uuid4().hex
+        crawler.jobs[task_id] = {"task_id": task_id, "status": "pending", "results": [], "created_at": time.time()}
+        semaphore_count = int((body.get("crawler_config") or {}).get("semaphore_count") or crawler.concurrency)
+        asyncio.create_task(crawler.run_job(task_id, urls, semaphore_count))
+        return {"task_id": task_id}
+
+    @app.get("/crawl/job/{task_id}")
+    async def status(task_id: str):
+        crawler.requests["poll"] += 1
+        job = crawler.jobs.get(task_id)
+        if job is None:
+            raise HTTPException(404, "task not found")
+        return JSONResponse({
+            "task_id": task_id,
+            "status": job["status"],
+            "result": {"success": True, "results": list(job["results"])},
+        })
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "jobs": len(crawler.jobs), "requests": crawler.requests}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl4AI stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11235)
+    parser.add_argument("--delay", type=float, default=1.0, help="Секунд на страницу")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--listings", type=int, default=20, help="Карточек на страницу")
+    parser.add_argument("--html-kb", type=int, default=200, help="Размер html-балласта в результате")
+    parser.add_argument("--concurrency", type=int, default=8, help="Страниц одновременно в задаче")
+    parser.add_argument("--fail-marker", default="fail", help="URL с этой подстрокой отдают 503")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    uvicorn.run(
+        create_app(args.delay, args.jitter, args.listings, args.html_kb, args.concurrency, args.fail_marker),
+        host=args.host, port=args.port,
+    )
+
+
+if __name__ == "__main__":
+    main()
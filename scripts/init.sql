@@ -31,6 +31,7 @@ CREATE TABLE IF NOT EXISTS properties (
     -- Местоположение
     location VARCHAR(200),
     neighborhood VARCHAR(100),
+    neighborhood_id VARCHAR(50), -- каноническое баррио: palermo, villa_crespo, ...
     address TEXT,
     latitude DECIMAL(10, 8),
     longitude DECIMAL(11, 8),
@@ -47,11 +48,17 @@ CREATE TABLE IF NOT EXISTS properties (
     -- Дополнительные характеристики
     features JSONB, -- гараж, терраса, лифт и т.д.
     amenities JSONB, -- удобства: бассейн, спортзал и т.д.
+    floor VARCHAR(20),
+    total_floors INTEGER,
+    building_age INTEGER,
     
     -- Мета-информация
     listing_type VARCHAR(20) DEFAULT 'rent', -- rent, sale
     is_active BOOLEAN DEFAULT true,
     is_featured BOOLEAN DEFAULT false,
+    views_count INTEGER DEFAULT 0,
+    missed_cycles INTEGER DEFAULT 0, -- обходов подряд без этого объявления
+    canonical_id UUID REFERENCES properties(id) ON DELETE SET NULL, -- дубль объявления с другого сайта
     
     -- Временные метки
     first_seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -175,6 +182,9 @@ CREATE TABLE IF NOT EXISTS scraping_stats (
     
     -- Производительность
     duration_seconds INTEGER,
+    crawl_seconds DECIMAL(10, 2), -- суммарное время стадий: Crawl4AI
+    llm_seconds DECIMAL(10, 2), -- Ollama
+    db_seconds DECIMAL(10, 2), -- upsert'ы в Postgres
     errors_count INTEGER DEFAULT 0,
     success_rate DECIMAL(5, 2),
     
@@ -184,6 +194,29 @@ CREATE TABLE IF NOT EXISTS scraping_stats (
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Кеш офлайн-геокодера (ключ - нормализованный адрес)
+CREATE TABLE IF NOT EXISTS geocoded_addresses (
+    address_key TEXT PRIMARY KEY,
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    precision VARCHAR(20), -- address, neighborhood, none
+    neighborhood VARCHAR(100),
+    gazetteer_version VARCHAR(20) NOT NULL,
+    
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Курсы валют к USD по датам (configs/exchange_rates.json, POST /admin/exchange-rates)
+CREATE TABLE IF NOT EXISTS exchange_rates (
+    currency VARCHAR(3) NOT NULL,
+    rate_date DATE NOT NULL,
+    units_per_usd DECIMAL(14, 4) NOT NULL, -- единиц валюты за 1 USD
+    source VARCHAR(50), -- file, admin
+    
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (currency, rate_date)
+);
+
 -- =========================================
 -- ИНДЕКСЫ ДЛЯ ПРОИЗВОДИТЕЛЬНОСТИ
 -- =========================================
@@ -193,11 +226,16 @@ CREATE INDEX IF NOT EXISTS idx_properties_site ON properties(site);
 CREATE INDEX IF NOT EXISTS idx_properties_price ON properties(price);
 CREATE INDEX IF NOT EXISTS idx_properties_location ON properties(location);
 CREATE INDEX IF NOT EXISTS idx_properties_neighborhood ON properties(neighborhood);
+CREATE INDEX IF NOT EXISTS idx_properties_neighborhood_id ON properties(neighborhood_id, price_usd) WHERE is_active = true;
+CREATE INDEX IF NOT EXISTS idx_properties_price_usd ON properties(price_usd) WHERE is_active = true;
 CREATE INDEX IF NOT EXISTS idx_properties_type ON properties(property_type);
 CREATE INDEX IF NOT EXISTS idx_properties_active ON properties(is_active);
 CREATE INDEX IF NOT EXISTS idx_properties_created_at ON properties(created_at);
 CREATE INDEX IF NOT EXISTS idx_properties_url ON properties(url);
 CREATE INDEX IF NOT EXISTS idx_properties_external_id ON properties(external_id);
+-- Ключ для upsert парсера (INSERT ... ON CONFLICT (site, external_id))
+CREATE UNIQUE INDEX IF NOT EXISTS idx_properties_site_external_id ON properties(site, external_id);
+CREATE INDEX IF NOT EXISTS idx_properties_canonical_id ON properties(canonical_id);
 
 -- Составные индексы для сложных запросов
 CREATE INDEX IF NOT EXISTS idx_properties_search ON properties(price, bedrooms, neighborhood, property_type) WHERE is_active = true;
@@ -294,17 +332,20 @@ ON CONFLICT DO NOTHING;
 -- ПОЛЕЗНЫЕ ФУНКЦИИ
 -- =========================================
 
--- Функция для конвертации валют (упрощённая)
-CREATE OR REPLACE FUNCTION convert_to_usd(amount DECIMAL, currency VARCHAR)
+-- Конвертация по последнему курсу из exchange_rates (для ручных запросов;
+-- properties.price_usd парсер считает при записи и пересчитывает при новом курсе)
+CREATE OR REPLACE FUNCTION convert_to_usd(amount DECIMAL, p_currency VARCHAR)
 RETURNS DECIMAL AS $$
-BEGIN
-    CASE currency
-        WHEN 'USD' THEN RETURN amount;
-        WHEN 'ARS' THEN RETURN amount / 1000; -- Примерный курс, нужно обновлять
-        ELSE RETURN NULL;
-    END CASE;
-END;
-$$ language 'plpgsql';
+    SELECT CASE
+        WHEN p_currency = 'USD' THEN amount
+        ELSE ROUND(amount / (
+            SELECT units_per_usd FROM exchange_rates
+            WHERE currency = p_currency
+            ORDER BY rate_date DESC
+            LIMIT 1
+        ), 2)
+    END;
+$$ LANGUAGE sql STABLE;
 
 -- Функция для поиска дубликатов
 CREATE OR REPLACE FUNCTION find_duplicate_properties(
@@ -340,12 +381,13 @@ $$ language 'plpgsql';
 CREATE OR REPLACE VIEW active_properties AS
 SELECT 
     p.*,
-    convert_to_usd(p.price, p.currency) as price_usd_calculated,
+    p.price_usd as price_usd_calculated, -- колонка, а не convert_to_usd на каждой строке
     EXTRACT(days FROM (CURRENT_TIMESTAMP - p.created_at)) as days_since_created,
     CASE 
-        WHEN p.price < 200000 THEN 'budget'
-        WHEN p.price < 500000 THEN 'mid_range'
-        WHEN p.price < 1000000 THEN 'premium'
+        WHEN p.price_usd IS NULL THEN NULL
+        WHEN p.price_usd < 200000 THEN 'budget'
+        WHEN p.price_usd < 500000 THEN 'mid_range'
+        WHEN p.price_usd < 1000000 THEN 'premium'
         ELSE 'luxury'
     END as price_category
 FROM properties p
@@ -0,0 +1,96 @@
+-- =========================================
+-- PROPERTY SCRAPER - ОБНОВЛЕНИЕ СУЩЕСТВУЮЩЕЙ БАЗЫ
+-- =========================================
+-- init.sql выполняется только при создании тома postgres_data; базы,
+-- созданные его старой версией, доводятся до текущей схемы этим скриптом.
+-- Скрипт идемпотентен - можно запускать повторно:
+--   docker compose exec -T postgres psql -U scraper -d property_scraper < scripts/migrate.sql
+
+BEGIN;
+
+-- Колонки модели Property, которых не было в init.sql
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS floor VARCHAR(20);
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS total_floors INTEGER;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS building_age INTEGER;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS views_count INTEGER DEFAULT 0;
+
+-- Запись парсера: ключ upsert, снятие с публикации, дубли, баррио
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS neighborhood_id VARCHAR(50);
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS missed_cycles INTEGER DEFAULT 0;
+ALTER TABLE properties ADD COLUMN IF NOT EXISTS canonical_id UUID REFERENCES properties(id) ON DELETE SET NULL;
+
+-- Старые версии писали объявления без ключа: оставляем последнюю копию
+-- каждого (site, external_id), иначе уникальный индекс не создать
+DELETE FROM properties p
+USING properties newer
+WHERE p.external_id IS NOT NULL
+  AND p.site = newer.site
+  AND p.external_id = newer.external_id
+  AND (p.updated_at, p.id::text) < (newer.updated_at, newer.id::text);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_properties_site_external_id ON properties(site, external_id);
+CREATE INDEX IF NOT EXISTS idx_properties_canonical_id ON properties(canonical_id);
+CREATE INDEX IF NOT EXISTS idx_properties_neighborhood_id ON properties(neighborhood_id, price_usd) WHERE is_active = true;
+CREATE INDEX IF NOT EXISTS idx_properties_price_usd ON properties(price_usd) WHERE is_active = true;
+
+-- Время стадий в статистике проходов
+ALTER TABLE scraping_stats ADD COLUMN IF NOT EXISTS crawl_seconds DECIMAL(10, 2);
+ALTER TABLE scraping_stats ADD COLUMN IF NOT EXISTS llm_seconds DECIMAL(10, 2);
+ALTER TABLE scraping_stats ADD COLUMN IF NOT EXISTS db_seconds DECIMAL(10, 2);
+
+-- Кеш геокодера и курсы валют
+CREATE TABLE IF NOT EXISTS geocoded_addresses (
+    address_key TEXT PRIMARY KEY,
+    latitude DECIMAL(10, 8),
+    longitude DECIMAL(11, 8),
+    precision VARCHAR(20),
+    neighborhood VARCHAR(100),
+    gazetteer_version VARCHAR(20) NOT NULL,
+    
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS exchange_rates (
+    currency VARCHAR(3) NOT NULL,
+    rate_date DATE NOT NULL,
+    units_per_usd DECIMAL(14, 4) NOT NULL,
+    source VARCHAR(50),
+    
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (currency, rate_date)
+);
+
+-- convert_to_usd читает exchange_rates; у старой версии другое имя параметра,
+-- поэтому пересоздаём её вместе с зависящим представлением (p.* - с новыми колонками)
+DROP VIEW IF EXISTS active_properties;
+DROP FUNCTION IF EXISTS convert_to_usd(DECIMAL, VARCHAR);
+
+CREATE FUNCTION convert_to_usd(amount DECIMAL, p_currency VARCHAR)
+RETURNS DECIMAL AS $$
+    SELECT CASE
+        WHEN p_currency = 'USD' THEN amount
+        ELSE ROUND(amount / (
+            SELECT units_per_usd FROM exchange_rates
+            WHERE currency = p_currency
+            ORDER BY rate_date DESC
+            LIMIT 1
+        ), 2)
+    END;
+$$ LANGUAGE sql STABLE;
+
+CREATE VIEW active_properties AS
+SELECT 
+    p.*,
+    p.price_usd as price_usd_calculated,
+    EXTRACT(days FROM (CURRENT_TIMESTAMP - p.created_at)) as days_since_created,
+    CASE 
+        WHEN p.price_usd IS NULL THEN NULL
+        WHEN p.price_usd < 200000 THEN 'budget'
+        WHEN p.price_usd < 500000 THEN 'mid_range'
+        WHEN p.price_usd < 1000000 THEN 'premium'
+        ELSE 'luxury'
+    END as price_category
+FROM properties p
+WHERE p.is_active = true;
+
+COMMIT;
@@ -0,0 +1,57 @@
+# tests/conftest.py - Общие фикстуры: окружение приложения и тестовая БД из scripts/init.sql
+import asyncio
+import os
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit
+
+import pytest
+import pytest_asyncio
+
+ROOT = Path(__file__).resolve().parents[1]
+
+# Тесты с Postgres запускаются, только если задан TEST_DATABASE_URL (пользователь
+# с правом CREATE DATABASE): база property_scraper_test пересоздаётся из init.sql
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+TEST_DATABASE_NAME = "property_scraper_test"
+
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test")
+if TEST_DATABASE_URL:
+    parts = urlsplit(TEST_DATABASE_URL)
+    os.environ["DATABASE_URL"] = urlunsplit(parts._replace(path=f"/{TEST_DATABASE_NAME}"))
+
+
+async def _create_schema():
+    import asyncpg
+
+    admin = await asyncpg.connect(TEST_DATABASE_URL)
+    try:
+        await admin.execute(f"DROP DATABASE IF EXISTS {TEST_DATABASE_NAME} WITH (FORCE)")
+        await admin.execute(f"CREATE DATABASE {TEST_DATABASE_NAME}")
+    finally:
+        await admin.close()
+    connection = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        await connection.execute((ROOT / "scripts" / "init.sql").read_text(encoding="utf-8"))
+    finally:
+        await connection.close()
+
+
+@pytest.fixture(scope="session")
+def postgres_schema():
+    """Пустая база со схемой из scripts/init.sql - той, что создаёт docker-compose"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    asyncio.run(_create_schema())
+    return os.environ["DATABASE_URL"]
+
+
+@pytest_asyncio.fixture
+async def database(postgres_schema):
+    from app.models import database
+
+    await database.connect()
+    try:
+        await database.execute("TRUNCATE properties, price_history, exchange_rates CASCADE")
+        yield database
+    finally:
+        await database.disconnect()
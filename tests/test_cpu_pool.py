@@ -0,0 +1,44 @@
+# tests/test_cpu_pool.py - CPUPool: перезапуск пула после падения процесса-воркера
+import asyncio
+import json
+import os
+import signal
+
+import pytest
+
+from app.cpu_pool import CPUPool
+
+from .conftest import ROOT
+
+
+@pytest.fixture
+def pool():
+    config = json.loads((ROOT / "configs" / "sites_config.json").read_text(encoding="utf-8"))
+    pool = CPUPool(config, [], workers=2, chunk_size=1)
+    pool.start()
+    yield pool
+    pool.close()
+
+
+@pytest.mark.asyncio
+async def test_broken_pool_is_restarted_once(pool):
+    items = [{"title": f"Departamento {i} ambientes", "price": "USD 120.000"} for i in range(200)]
+    expected = await pool.regex_split(items)
+
+    started = []
+    start = pool.start
+    pool.start = lambda: (started.append(1), start())
+    broken = pool._executor
+
+    # Пачки уже отправлены в пул, когда его процессы погибают - все они
+    # получат BrokenProcessPool, пересоздать пул должна только первая
+    running = asyncio.create_task(pool.regex_split(items))
+    await asyncio.sleep(0)
+    for process in list(broken._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+    assert await running == expected
+
+    assert started == [1]
+    assert pool._executor is not broken
+    assert broken._shutdown_thread
+    assert await pool.regex_split(items) == expected
@@ -0,0 +1,107 @@
+# tests/test_crawl4ai_jobs.py - Crawl4AIJobClient и бенчмарк против заглушки scripts/crawl4ai_stub.py
+import asyncio
+import sys
+from contextlib import aclosing
+
+import pytest
+
+from app import crawl4ai_jobs
+from app.crawl4ai_jobs import Crawl4AIJobClient
+from app.streaming import CrawlResultStreamParser
+
+from .conftest import ROOT
+
+sys.path.insert(0, str(ROOT / "scripts"))
+sys.path.insert(0, str(ROOT / "scripts" / "benchmarks"))
+
+from bench_crawl4ai_jobs import make_registry, run_jobs, run_per_url  # noqa: E402
+from crawl4ai_stub import create_app  # noqa: E402
+
+URLS = [f"https://www.example.com/propiedades/pagina-{i}" for i in range(12)]
+
+
+def stub(concurrency: int = 8):
+    return create_app(delay=0.02, jitter=0.0, listings=2, html_kb=1, concurrency=concurrency)
+
+
+@pytest.mark.asyncio
+async def test_job_client_yields_every_url_once():
+    app = stub()
+    http = make_registry(app)
+    client = Crawl4AIJobClient(http, max_in_flight=1, poll_interval=0.01, poll_max_interval=0.02)
+    urls = URLS[:5] + ["https://www.example.com/propiedades/fail-1"]
+
+    results = [result async for result in client.crawl(urls, {"semaphore_count": 3})]
+    await http.close()
+
+    assert sorted(result["url"] for result in results) == sorted(urls)
+    by_url = {result["url"]: result for result in results}
+    assert by_url[urls[-1]]["status_code"] == 503
+    assert len(by_url[urls[0]]["extracted_content"]) == 2
+    assert app.state.crawler.requests["submit"] == 1
+    assert app.state.crawler.peak_rendering <= 3
+
+
+@pytest.mark.asyncio
+async def test_poll_does_not_reparse_seen_results(monkeypatch):
+    parsed = []
+
+    class CountingParser(CrawlResultStreamParser):
+        def _scan_raw(self, items):
+            done = super()._scan_raw(items)
+            if done and self._raw_target == "extracted_content":
+                parsed.append(self.results[-1]["url"])
+            return done
+
+    monkeypatch.setattr(crawl4ai_jobs, "CrawlResultStreamParser", CountingParser)
+    app = create_app(delay=0.03, jitter=0.0, listings=2, html_kb=1, concurrency=8)
+    http = make_registry(app)
+    client = Crawl4AIJobClient(http, max_in_flight=1, poll_interval=0.01, poll_max_interval=0.01)
+
+    async with aclosing(client.crawl(URLS[:6], {"semaphore_count": 1})) as results:
+        urls = [result["url"] async for result in results]
+    await http.close()
+
+    assert sorted(urls) == sorted(URLS[:6])
+    # Опросов больше, чем страниц, но каждая разобрана один раз
+    assert app.state.crawler.requests["poll"] > 6
+    assert sorted(parsed) == sorted(URLS[:6])
+
+
+@pytest.mark.asyncio
+async def test_abandoned_crawl_releases_slot():
+    app = stub()
+    http = make_registry(app)
+    client = Crawl4AIJobClient(http, max_in_flight=1, poll_interval=0.01, poll_max_interval=0.02)
+
+    async with aclosing(client.crawl(URLS[:4], {"semaphore_count": 1})) as results:
+        async for _ in results:
+            break
+    assert client._in_flight == 0
+
+    # Единственный слот свободен: следующая задача не ждёт брошенную
+    results = [result async for result in client.crawl(URLS[4:6], {"semaphore_count": 2})]
+    # Брошенная задача в заглушке дорендеривается сама - не оставляем её loop'у теста
+    while any(job["status"] != "completed" for job in app.state.crawler.jobs.values()):
+        await asyncio.sleep(0.01)
+    await http.close()
+    assert len(results) == 2
+
+
+@pytest.mark.parametrize("renders, jobs", [(4, 1), (4, 2)])
+@pytest.mark.asyncio
+async def test_benchmark_modes_share_render_cap(renders, jobs):
+    peaks = []
+    for mode in ("per-url", "jobs"):
+        # Заглушка пускает больше, чем просит бенчмарк - ограничивать должен он сам
+        app = stub(concurrency=renders * 4)
+        http = make_registry(app)
+        if mode == "per-url":
+            items, _ = await run_per_url(http, URLS, renders)
+        else:
+            items, _ = await run_jobs(http, URLS, renders, jobs, batch_size=4, poll_interval=0.01)
+        await http.close()
+        assert items == len(URLS) * 2
+        peaks.append(app.state.crawler.peak_rendering)
+
+    assert peaks == [renders, renders]
@@ -0,0 +1,79 @@
+# tests/test_dedup.py - MinHash/LSH-индекс дублей и связывание дублей в PropertyWriter
+import uuid
+
+import pytest
+
+from app.dedup import DuplicateIndex
+from app.storage import PropertyWriter
+
+
+def listing(site: str, external_id: str, title: str = "Departamento 3 ambientes con balcón en Palermo Soho",
+            address: str = "Gorriti 4500", area: float = 75.0, price_usd: float = 185000.0):
+    return {
+        "site": site, "external_id": external_id, "title": title, "address": address,
+        "area": area, "price": price_usd, "currency": "USD", "price_usd": price_usd,
+    }
+
+
+OTHER = dict(title="Casa 5 ambientes con jardín y pileta en Villa Devoto", address="Nueva York 4100",
+             area=220.0, price_usd=420000.0)
+
+
+def test_empty_index_matches_nothing():
+    index = DuplicateIndex()
+    assert len(index) == 0
+    assert index.match(listing("zonaprop", "zp-1")) is None
+
+
+def test_same_listing_on_another_site_matches():
+    index = DuplicateIndex()
+    index.add("11111111-1111-1111-1111-111111111111", listing("zonaprop", "zp-1"))
+
+    assert index.match(listing("argenprop", "ap-7", title="Departamento 3 ambientes con balcon en Palermo Soho!")) \
+        == "11111111-1111-1111-1111-111111111111"
+    assert index.match(listing("argenprop", "ap-8", **OTHER)) is None
+    # Похожий текст, но площадь отличается больше допуска
+    assert index.match(listing("argenprop", "ap-9", area=120.0)) is None
+
+
+def test_link_matches_duplicates_inside_one_batch():
+    index = DuplicateIndex()
+    existing = uuid.uuid4()
+    index.add(str(existing), listing("zonaprop", "zp-1", **OTHER))
+    rows = [
+        listing("argenprop", "ap-1"),
+        listing("argenprop", "ap-2", **OTHER),
+        listing("argenprop", "ap-3"),
+        listing("argenprop", "ap-4"),
+    ]
+
+    _, batch_links = index.link(rows)
+
+    assert [row["canonical_id"] for row in rows] == [None, existing, None, None]
+    # Ссылки идут на первую строку группы, а не по цепочке
+    assert batch_links == {2: 0, 3: 0}
+    # Временные записи пачки из индекса убраны
+    assert len(index) == 1
+
+
+@pytest.mark.parametrize("copy_threshold", [1000, 1], ids=["values", "copy"])
+@pytest.mark.asyncio
+async def test_writer_links_duplicates_from_empty_index(database, copy_threshold):
+    index = DuplicateIndex()
+    writer = PropertyWriter(dedup=index, copy_threshold=copy_threshold)
+
+    # Повтор внутри одной пачки - ещё без id в БД
+    await writer.upsert([listing("zonaprop", "zp-1"), listing("zonaprop", "zp-2"), listing("zonaprop", "zp-3", **OTHER)],
+                        "zonaprop")
+    await writer.upsert([listing("argenprop", "ap-1")], "argenprop")
+
+    rows = {
+        record["external_id"]: record
+        for record in await database.fetch_all("SELECT id, external_id, canonical_id FROM properties")
+    }
+    canonical = rows["zp-1"]["id"]
+    assert rows["zp-1"]["canonical_id"] is None
+    assert rows["zp-2"]["canonical_id"] == canonical
+    assert rows["ap-1"]["canonical_id"] == canonical
+    assert rows["zp-3"]["canonical_id"] is None
+    assert len(index) == 4
@@ -0,0 +1,51 @@
+# tests/test_exchange_rates.py - Курсы к USD: пересчёт price_usd между процессами и доступ к /admin/exchange-rates
+from datetime import date
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.exchange_rates import ExchangeRates
+from app.main import app
+from app.storage import PropertyWriter
+
+
+def listing(external_id: str, price: str):
+    return {
+        "external_id": external_id,
+        "url": f"https://www.zonaprop.com.ar/propiedades/{external_id}.html",
+        "title": "Departamento en Palermo",
+        "price": price,
+        "currency": "ARS",
+    }
+
+
+@pytest.mark.asyncio
+async def test_reload_recomputes_listings_written_at_stale_rate(database):
+    api, worker = ExchangeRates(path="/nonexistent"), ExchangeRates(path="/nonexistent")
+    await api.add([{"currency": "ARS", "units_per_usd": 1000, "rate_date": date(2024, 1, 1)}], source="test")
+    await worker.load()
+
+    # API записал новый курс и пересчитал; воркер ещё не перечитал таблицу
+    await api.add([{"currency": "ARS", "units_per_usd": 1250, "rate_date": date(2024, 1, 2)}], source="test")
+    writer = PropertyWriter(exchange_rates=worker)
+    await writer.upsert([listing("zp-1", "100.000.000")], "zonaprop")
+    assert await database.fetch_val("SELECT price_usd FROM properties") == 100000
+
+    await worker.load()
+    assert worker.rates["ARS"] == (date(2024, 1, 2), 1250.0)
+    assert await database.fetch_val("SELECT price_usd FROM properties") == 80000
+
+
+@pytest.mark.parametrize("token, header, status", [
+    (None, None, 403),
+    (None, "anything", 403),
+    ("secret", "wrong", 403),
+])
+def test_admin_exchange_rates_denied(monkeypatch, token, header, status):
+    monkeypatch.setattr(settings, "ADMIN_API_TOKEN", token)
+    headers = {"X-Admin-Token": header} if header else {}
+    response = TestClient(app).post(
+        "/admin/exchange-rates", json=[{"currency": "ARS", "units_per_usd": 1000}], headers=headers
+    )
+    assert response.status_code == status
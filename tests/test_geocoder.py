@@ -0,0 +1,46 @@
+# tests/test_geocoder.py - normalize_address и Geocoder по configs/caba_gazetteer.json
+import pytest
+
+from app.geocoder import Gazetteer, Geocoder, normalize_address
+
+from .conftest import ROOT
+
+
+@pytest.fixture(scope="module")
+def geocoder():
+    return Geocoder(Gazetteer.load(str(ROOT / "configs" / "caba_gazetteer.json")))
+
+
+@pytest.mark.parametrize("text, key", [
+    ("Av. Santa Fe al 3.200, 4°B, Palermo, CABA", "avenida santa fe 3200, palermo"),
+    ("Santa Fe 3200 piso 4, Palermo", "santa fe 3200, palermo"),
+    ("Departamento 3 ambientes en Recoleta", "ambientes en recoleta"),
+    ("Gorriti 4500 dto 2 entre Scalabrini y Armenia", "gorriti 4500"),
+])
+def test_normalize_address_strips_only_unit_tokens(text, key):
+    assert normalize_address(text) == key
+
+
+def test_neighborhood_after_unit_is_kept(geocoder):
+    point = geocoder.geocode(normalize_address("Departamento 3 ambientes en Recoleta"))
+    assert (point.precision, point.neighborhood) == ("neighborhood", "Recoleta")
+
+
+@pytest.mark.parametrize("text", [
+    "Sarmiento 400, Quilmes",
+    "Sarmiento 400, Quilmes Oeste, Buenos Aires",
+    "Av. Maipú 1200, Vicente López",
+    "Belgrano 300, GBA",
+])
+def test_address_outside_caba_is_not_geocoded(geocoder, text):
+    assert geocoder.geocode(normalize_address(text)) is None
+
+
+def test_caba_neighborhood_named_like_partido(geocoder):
+    point = geocoder.geocode(normalize_address("Parque Avellaneda, CABA"))
+    assert point.neighborhood == "Parque Avellaneda"
+
+
+def test_caba_address_still_geocoded(geocoder):
+    point = geocoder.geocode(normalize_address("Sarmiento 400, San Nicolás, Capital Federal"))
+    assert point.precision == "address"
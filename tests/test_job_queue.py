@@ -0,0 +1,122 @@
+# tests/test_job_queue.py - ScrapeJobQueue и worker.process_job поверх fakeredis
+import asyncio
+
+import pytest
+import pytest_asyncio
+from fakeredis import aioredis
+
+from app.job_queue import ScrapeJobQueue
+from app.run_stats import ScrapeRunStats
+from app.worker import process_job
+
+CLAIM_IDLE_MS = 50
+
+
+@pytest_asyncio.fixture
+async def redis():
+    client = aioredis.FakeRedis(decode_responses=True)
+    yield client
+    await client.aclose()
+
+
+def make_queue(redis, consumer: str, max_deliveries: int = 3) -> ScrapeJobQueue:
+    return ScrapeJobQueue(
+        redis, stream="test:jobs", group="test", consumer=consumer,
+        claim_idle_ms=CLAIM_IDLE_MS, max_deliveries=max_deliveries,
+    )
+
+
+async def idle():
+    await asyncio.sleep(CLAIM_IDLE_MS / 1000 * 2)
+
+
+class FakeScraper:
+    sites_config = {"zonaprop": {}}
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.calls = 0
+
+    async def _scrape(self, site_name, search_keys=None):
+        self.calls += 1
+        return [], self.stats
+
+
+@pytest.mark.asyncio
+async def test_claim_delivers_each_job_once(redis):
+    first, second = make_queue(redis, "a"), make_queue(redis, "b")
+    await first.ensure_group()
+    await first.enqueue("zonaprop", search_keys=["venta_departamentos"])
+
+    jobs = await first.claim(count=5, block_ms=10)
+    assert [(job.site, job.search_keys) for job in jobs] == [("zonaprop", ["venta_departamentos"])]
+    assert await second.claim(count=5, block_ms=10) == []
+
+    await first.ack(jobs[0])
+    assert (await first.stats())["pending"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stuck_job_is_reclaimed_by_another_worker(redis):
+    first, second = make_queue(redis, "a"), make_queue(redis, "b")
+    await first.ensure_group()
+    job_id = await first.enqueue("zonaprop")
+    await first.claim(block_ms=10)
+
+    # Пока нет простоя, задача остаётся за первым воркером
+    assert await second.claim(block_ms=10) == []
+    await idle()
+    assert [job.id for job in await second.claim(block_ms=10)] == [job_id]
+
+
+@pytest.mark.asyncio
+async def test_job_is_dead_lettered_after_max_deliveries(redis):
+    queue = make_queue(redis, "a", max_deliveries=2)
+    await queue.ensure_group()
+    job_id = await queue.enqueue("zonaprop")
+
+    assert len(await queue.claim(block_ms=10)) == 1
+    await idle()
+    assert len(await queue.claim(block_ms=10)) == 1
+    await idle()
+    assert await queue.claim(block_ms=10) == []
+
+    dead = await redis.xrange(queue.dead_letter_stream)
+    assert [(fields["original_id"], fields["deliveries"]) for _, fields in dead] == [(job_id, "3")]
+    assert await queue.stats() == {"length": 1, "pending": 0, "dead": 1}
+
+
+@pytest.mark.asyncio
+async def test_process_job_acks_successful_run(redis):
+    queue = make_queue(redis, "a")
+    await queue.ensure_group()
+    await queue.enqueue("zonaprop")
+    job, = await queue.claim(block_ms=10)
+
+    await process_job(FakeScraper(ScrapeRunStats(site="zonaprop", pages_scraped=3)), queue, job)
+    assert (await queue.stats())["pending"] == 0
+
+
+@pytest.mark.parametrize("stats", [
+    ScrapeRunStats.failed("zonaprop", RuntimeError("db down"), 1.0),
+    None,  # crawl4ai circuit open - проход пропущен
+], ids=["failed", "skipped"])
+@pytest.mark.asyncio
+async def test_process_job_leaves_failed_run_for_retry(redis, stats):
+    first, second = make_queue(redis, "a", max_deliveries=2), make_queue(redis, "b", max_deliveries=2)
+    await first.ensure_group()
+    await first.enqueue("zonaprop")
+    scraper = FakeScraper(stats)
+
+    job, = await first.claim(block_ms=10)
+    await process_job(scraper, first, job)
+    assert (await first.stats())["pending"] == 1
+
+    await idle()
+    job, = await second.claim(block_ms=10)
+    await process_job(scraper, second, job)
+    await idle()
+    assert await second.claim(block_ms=10) == []
+
+    assert scraper.calls == 2
+    assert await first.stats() == {"length": 1, "pending": 0, "dead": 1}
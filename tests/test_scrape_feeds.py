@@ -0,0 +1,59 @@
+# tests/test_scrape_feeds.py - PropertyScraper._scrape_feeds: когда круг лент сайта замыкается и идёт sweep
+from types import SimpleNamespace
+
+import pytest
+
+from app.recrawl import RecrawlScheduler
+from app.run_stats import ScrapeRunStats
+from app.scraper import PropertyScraper
+
+SITES = {"zonaprop": {"search_urls": {"venta": "https://z/venta", "alquiler": "https://z/alquiler"}}}
+
+
+class FakeWriter:
+    def __init__(self):
+        self.sweeps = []
+
+    async def sweep_missing(self, site, seen_since, missed_cycles):
+        self.sweeps.append(site)
+        return 0
+
+
+def make_scraper(results):
+    async def scrape(site_name, search_keys):
+        return [], results[search_keys[0]]
+
+    return SimpleNamespace(
+        _scrape=scrape,
+        recrawl=RecrawlScheduler(SITES, interval_seconds=3600, min_interval=600, max_interval=14400),
+        writer=FakeWriter(),
+    )
+
+
+@pytest.mark.parametrize("alquiler", [
+    ScrapeRunStats(site="zonaprop", pages_scraped=1),  # пустая лента
+    ScrapeRunStats(site="zonaprop"),  # первая страница закрыта robots.txt - обхода не было
+], ids=["empty", "robots-disallowed"])
+@pytest.mark.asyncio
+async def test_clean_feed_without_listings_completes_round(alquiler):
+    scraper = make_scraper({
+        "venta": ScrapeRunStats(site="zonaprop", pages_scraped=2, properties_found=40),
+        "alquiler": alquiler,
+    })
+    await PropertyScraper._scrape_feeds(scraper, "zonaprop", ["venta", "alquiler"])
+    assert scraper.writer.sweeps == ["zonaprop"]
+
+
+@pytest.mark.parametrize("alquiler", [
+    ScrapeRunStats(site="zonaprop", pages_scraped=1, pages_failed=1, errors_count=1),
+    ScrapeRunStats.failed("zonaprop", RuntimeError("db down"), 1.0),
+    None,  # crawl4ai circuit open
+], ids=["page-error", "failed", "skipped"])
+@pytest.mark.asyncio
+async def test_failed_feed_keeps_round_open(alquiler):
+    scraper = make_scraper({
+        "venta": ScrapeRunStats(site="zonaprop", pages_scraped=2, properties_found=40),
+        "alquiler": alquiler,
+    })
+    await PropertyScraper._scrape_feeds(scraper, "zonaprop", ["venta", "alquiler"])
+    assert scraper.writer.sweeps == []
@@ -0,0 +1,138 @@
+# tests/test_storage.py - PropertyWriter против схемы scripts/init.sql
+from datetime import date, datetime
+
+import pytest
+
+from app.exchange_rates import ExchangeRates
+from app.storage import PropertyWriter, _to_float, listing_to_row
+
+SITE = "zonaprop"
+
+
+def listings(count: int, price: str):
+    return [
+        {
+            "external_id": f"zp-{i}",
+            "url": f"https://www.zonaprop.com.ar/propiedades/zp-{i}.html",
+            "title": f"Departamento {i} en Palermo",
+            "price": price,
+            "currency": "USD",
+            "area": "45,5 m²",
+            "floor": "3",
+            "images": [f"https://img.example/{i}.jpg"],
+            "elevator": True,
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("120.000", 120000.0),
+    ("1.500.000", 1500000.0),
+    ("USD 120.000", 120000.0),
+    ("45,5 m²", 45.5),
+    ("45.5", 45.5),
+    (98000, 98000.0),
+    ("", None),
+    ("consultar", None),
+])
+def test_to_float_parses_argentine_numbers(value, expected):
+    assert _to_float(value) == expected
+
+
+@pytest.mark.parametrize("listing, currency, price, price_usd", [
+    ({"price": "USD 109.000"}, "USD", 109000.0, 109000.0),
+    ({"price": "U$S 95.000"}, "USD", 95000.0, 95000.0),
+    ({"price": "$ 180.000.000"}, "ARS", 180000000.0, None),
+    # regex уже разобрал цену с валютой - сырая строка не нужна
+    ({"price": "USD 109.000", "price_usd": 109000.0}, "USD", 109000.0, 109000.0),
+    ({"price": "Consultar precio", "price_ars": 250000000.0}, "ARS", 250000000.0, None),
+    ({"price": 120000, "currency": "USD"}, "USD", 120000.0, 120000.0),
+])
+def test_listing_currency_from_price_text(listing, currency, price, price_usd):
+    row = listing_to_row(dict(listing, external_id="ap-1"), "argenprop", datetime.utcnow())
+    assert (row["currency"], row["price"], row["price_usd"]) == (currency, price, price_usd)
+
+
+@pytest.mark.asyncio
+async def test_usd_price_text_is_stored_in_usd(database):
+    rates = ExchangeRates(path="/nonexistent")
+    await rates.add([{"currency": "ARS", "units_per_usd": 1000, "rate_date": date(2024, 1, 1)}], source="test")
+    writer = PropertyWriter(exchange_rates=rates)
+
+    await writer.upsert([{"external_id": "ap-1", "title": "Departamento", "price": "USD 109.000"}], "argenprop")
+
+    row = await database.fetch_one("SELECT price, currency, price_usd FROM properties")
+    assert (float(row["price"]), row["currency"], float(row["price_usd"])) == (109000.0, "USD", 109000.0)
+
+
+# copy_threshold=1000 - пачки VALUES по batch_size, copy_threshold=1 - COPY во временную таблицу
+@pytest.mark.parametrize("copy_threshold", [1000, 1], ids=["values", "copy"])
+@pytest.mark.asyncio
+async def test_upsert_against_init_sql(database, copy_threshold):
+    writer = PropertyWriter(batch_size=10, copy_threshold=copy_threshold)
+
+    result = await writer.upsert(listings(25, "120.000"), SITE)
+    assert (result.new, result.updated, result.price_changes) == (25, 0, 0)
+
+    row = await database.fetch_one(
+        "SELECT price, area, floor, images, features FROM properties WHERE site = :site AND external_id = 'zp-1'",
+        {"site": SITE},
+    )
+    assert float(row["price"]) == 120000.0
+    assert float(row["area"]) == 45.5
+    assert row["floor"] == "3"
+    assert row["images"] == '["https://img.example/1.jpg"]'
+    assert row["features"] == '["elevator"]'
+
+    result = await writer.upsert(listings(25, "132.000"), SITE)
+    assert (result.new, result.updated, result.price_changes) == (0, 25, 25)
+
+    history = await database.fetch_all("SELECT change_type, old_price, new_price, change_percentage FROM price_history")
+    assert len(history) == 25
+    assert {(h["change_type"], float(h["old_price"]), float(h["new_price"]), float(h["change_percentage"]))
+            for h in history} == {("increase", 120000.0, 132000.0, 10.0)}
+
+    # Повтор без изменений - ни новых строк, ни истории цен
+    result = await writer.upsert(listings(25, "132.000"), SITE)
+    assert (result.new, result.updated, result.price_changes) == (0, 25, 0)
+
+
+@pytest.mark.parametrize("copy_threshold", [1000, 1], ids=["values", "copy"])
+@pytest.mark.asyncio
+async def test_rescrape_without_fields_keeps_stored_values(database, copy_threshold):
+    writer = PropertyWriter(copy_threshold=copy_threshold)
+    await writer.upsert(listings(1, "120.000"), SITE)
+
+    # Повторный обход: цена "Consultar", площади и этажа на карточке нет
+    rescraped = [dict(listings(1, "Consultar")[0], area=None, floor=None, currency=None)]
+    result = await writer.upsert(rescraped, SITE)
+    assert (result.updated, result.price_changes) == (1, 0)
+
+    row = await database.fetch_one("SELECT price, currency, price_usd, area, floor FROM properties")
+    assert (float(row["price"]), row["currency"], float(row["price_usd"])) == (120000.0, "USD", 120000.0)
+    assert (float(row["area"]), row["floor"]) == (45.5, "3")
+
+
+@pytest.mark.parametrize("batch_size, copy_threshold, path", [
+    (10, 500, "_upsert_chunk"),
+    (20, 20, "_upsert_via_copy"),
+], ids=["values", "copy"])
+@pytest.mark.asyncio
+async def test_streaming_batch_flush_uses_copy_threshold(database, monkeypatch, batch_size, copy_threshold, path):
+    writer = PropertyWriter(batch_size=batch_size, copy_threshold=copy_threshold)
+    calls = []
+    original = getattr(writer, path)
+
+    async def spy(rows):
+        calls.append(len(rows))
+        return await original(rows)
+
+    monkeypatch.setattr(writer, path, spy)
+    async with writer.batch(SITE) as batch:
+        for row in listings(40, "120.000"):
+            await batch.add(row)
+
+    assert sum(calls) == 40
+    assert batch.result.new == 40
+    assert await database.fetch_val("SELECT count(*) FROM properties") == 40